@@ -0,0 +1,343 @@
+# app/analytics.py
+"""
+Модуль `analytics` ведёт сводки простоев и собирает по ним аналитические отчёты.
+
+Сводки хранятся в двух таблицах (миграция 0009):
+- `downtime_rollup_hourly` — количество и суммарная длительность закрытых простоев по
+  (equipment_id, час UTC, answer_id);
+- `downtime_rollup_monthly` — то же по месяцам UTC, для отчётов за длинные периоды.
+
+Простой целиком относится к часу своего начала; незакрытые простои (stop_id NULL) входят
+в сводки, когда сборщик данных их закроет.
+
+Фоновая задача `advance_downtime_rollup` (app/scheduler.py) сворачивает простои,
+начавшиеся до начала текущего часа, и сдвигает отметку `rollup_watermarks` — start_id, до
+которого сводки готовы. Изменения workflow ниже отметки (закрытие простоя, новая причина
+из `/update-downtime` и `/update-downtimes`, запоздавшая запись сборщика) триггер
+миграции 0009 сразу переносит в сводки. Задача берёт рекомендательную блокировку
+`ROLLUP_LOCK_CLASS` монопольно, триггер — разделяемо, поэтому изменение попадает в сводки
+ровно один раз: либо его учтёт задача, либо триггер после сдвига отметки.
+
+Отчёт за период собирается из месячных сводок за целые месяцы, часовых — за остальные
+часы до отметки и строк workflow после отметки, поэтому учитывает простои вплоть до
+текущего момента. Чтобы пересчитать сводки, очистите обе таблицы и удалите отметку.
+
+Параметры задаются переменными окружения:
+- `ROLLUP_INTERVAL` — интервал сворачивания, сек (по умолчанию 60);
+- `ROLLUP_BATCH_HOURS` — сколько часов сворачивать за одну транзакцию (по умолчанию 24);
+- `SHIFT_START_HOURS` — часы начала смен по местному времени киоска (по умолчанию `0,8,16`).
+"""
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.answers_cache import answer_catalog
+from app.groups import GROUP_SUBTREE
+from app.locks import ROLLUP_LOCK_CLASS
+from app.partitions import month_start, to_start_id
+
+ROLLUP_INTERVAL = float(os.getenv("ROLLUP_INTERVAL", "60"))
+ROLLUP_BATCH_HOURS = int(os.getenv("ROLLUP_BATCH_HOURS", "24"))
+SHIFT_START_HOURS = sorted(int(hour) for hour in os.getenv("SHIFT_START_HOURS", "0,8,16").split(","))
+
+ROLLUP_NAME = "downtime_rollup"
+ROLLUP_LOCK_KEY = 0
+SECONDS_PER_HOUR = 3600
+
+ROLLUP_LOCK_QUERY = text("SELECT pg_advisory_xact_lock(:lock_class, :lock_key)")
+WATERMARK_QUERY = text("SELECT watermark FROM rollup_watermarks WHERE name = :name")
+
+# Начальная отметка — самый ранний простой; по первичному ключу каждого станка
+FIRST_START_QUERY = text("""
+    SELECT MIN(f.start_id)
+    FROM equipment e
+    CROSS JOIN LATERAL (
+        SELECT w.start_id
+        FROM workflow w
+        WHERE w.equipment_id = e.equipment_id
+        ORDER BY w.start_id
+        LIMIT 1
+    ) f
+""")
+
+# Простои [lower, upper) читаются по первичному ключу каждого станка и добавляются в обе
+# сводки; отметка сдвигается в том же запросе
+ADVANCE_ROLLUP_QUERY = text("""
+    WITH d AS (
+        SELECT w.equipment_id, w.start_id - w.start_id % 3600 AS hour_start,
+               COALESCE(w.answer_id, 0) AS answer_id, w.stop_id - w.start_id AS seconds
+        FROM equipment e
+        JOIN workflow w ON w.equipment_id = e.equipment_id
+         AND w.start_id >= :lower AND w.start_id < :upper
+        WHERE w.stop_id IS NOT NULL
+    ),
+    hourly AS (
+        INSERT INTO downtime_rollup_hourly AS r
+            (equipment_id, hour_start, answer_id, downtimes, downtime_seconds)
+        SELECT equipment_id, hour_start, answer_id, COUNT(*), SUM(seconds)
+        FROM d
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (equipment_id, hour_start, answer_id) DO UPDATE
+            SET downtimes = r.downtimes + EXCLUDED.downtimes,
+                downtime_seconds = r.downtime_seconds + EXCLUDED.downtime_seconds
+    ),
+    monthly AS (
+        INSERT INTO downtime_rollup_monthly AS r
+            (equipment_id, month_start, answer_id, downtimes, downtime_seconds)
+        SELECT equipment_id,
+               extract(epoch FROM date_trunc('month', to_timestamp(hour_start) AT TIME ZONE 'UTC'))::bigint,
+               answer_id, COUNT(*), SUM(seconds)
+        FROM d
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (equipment_id, month_start, answer_id) DO UPDATE
+            SET downtimes = r.downtimes + EXCLUDED.downtimes,
+                downtime_seconds = r.downtime_seconds + EXCLUDED.downtime_seconds
+    )
+    INSERT INTO rollup_watermarks (name, watermark)
+    VALUES (:name, :upper)
+    ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark
+""")
+
+
+def hour_floor(seconds: int) -> int:
+    """Начало часа, в который попадает время `seconds` (секунды Unix)."""
+    return seconds - seconds % SECONDS_PER_HOUR
+
+
+def hour_ceil(seconds: int) -> int:
+    """Ближайшее начало часа не раньше `seconds`."""
+    return -hour_floor(-seconds)
+
+
+async def advance_downtime_rollup(db: AsyncSession, batch_size: int) -> int:
+    """
+    Сворачивает простои следующих `batch_size` часов после отметки, но не дальше начала
+    текущего часа. Возвращает число свёрнутых часов.
+    """
+    await db.execute(ROLLUP_LOCK_QUERY, {'lock_class': ROLLUP_LOCK_CLASS, 'lock_key': ROLLUP_LOCK_KEY})
+    current_hour = hour_floor(int(time.time()))
+    watermark = (await db.execute(WATERMARK_QUERY, {'name': ROLLUP_NAME})).scalar()
+    if watermark is None:
+        first_start = (await db.execute(FIRST_START_QUERY)).scalar()
+        watermark = hour_floor(first_start) if first_start is not None else current_hour
+
+    upper = min(watermark + batch_size * SECONDS_PER_HOUR, current_hour)
+    if upper <= watermark:
+        return 0
+    await db.execute(
+        ADVANCE_ROLLUP_QUERY, {'name': ROLLUP_NAME, 'lower': watermark, 'upper': upper}
+    )
+    return (upper - watermark) // SECONDS_PER_HOUR
+
+
+# Строки сводки `table` с началом периода в [:{segment}_lower, :{segment}_upper)
+ROLLUP_ROWS = """
+        SELECT r.equipment_id, r.answer_id, r.{column} AS period_start,
+               r.downtimes, r.downtime_seconds
+        FROM e
+        JOIN {table} r ON r.equipment_id = e.equipment_id
+         AND r.{column} >= :{segment}_lower AND r.{column} < :{segment}_upper
+"""
+
+# Количество и длительность закрытых простоев станков {equipment_filter} по причинам
+# (и сменам): месячные сводки за целые месяцы, часовые — за остальные часы до отметки,
+# строки workflow — после неё. Станки без простоев возвращаются с answer_id NULL.
+DOWNTIME_REPORT_QUERY = """
+    WITH e AS (
+        SELECT equipment_id, equipment_name
+        FROM equipment
+        WHERE {equipment_filter}
+    ),
+    d AS (
+        {head_hours}
+        UNION ALL
+        {months}
+        UNION ALL
+        {tail_hours}
+        UNION ALL
+        SELECT w.equipment_id, COALESCE(w.answer_id, 0), w.start_id - w.start_id % 3600,
+               1, w.stop_id - w.start_id
+        FROM e
+        JOIN workflow w ON w.equipment_id = e.equipment_id
+         AND w.start_id >= :raw_lower AND w.start_id < :raw_upper
+        WHERE w.stop_id IS NOT NULL
+    )
+    SELECT e.equipment_id, e.equipment_name, d.answer_id, {shift} AS shift,
+           COALESCE(SUM(d.downtimes), 0) AS downtimes,
+           COALESCE(SUM(d.downtime_seconds), 0) AS downtime_seconds
+    FROM e
+    LEFT JOIN d ON d.equipment_id = e.equipment_id
+    GROUP BY 1, 2, 3, 4
+"""
+# Номер смены часа начала простоя по местному времени киоска
+SHIFT_EXPRESSION = (
+    "(CAST(:shift_of_hour AS integer[]))[(d.period_start + :utc_offset) % 86400 / 3600 + 1]"
+)
+DOWNTIME_REPORT_QUERIES = {
+    (equipment_filter, by_shift): text(DOWNTIME_REPORT_QUERY.format(
+        equipment_filter=condition,
+        head_hours=ROLLUP_ROWS.format(table="downtime_rollup_hourly", column="hour_start", segment="head"),
+        months=ROLLUP_ROWS.format(table="downtime_rollup_monthly", column="month_start", segment="months"),
+        tail_hours=ROLLUP_ROWS.format(table="downtime_rollup_hourly", column="hour_start", segment="tail"),
+        shift=SHIFT_EXPRESSION if by_shift else "NULL::integer"
+    ))
+    for equipment_filter, condition in (
+        ("equipment_ids", "equipment_id = ANY(:equipment_ids)"),
+        ("group_id", f"group_id IN ({GROUP_SUBTREE})"),
+    )
+    for by_shift in (False, True)
+}
+
+
+def report_segments(lower: int, upper: int, watermark: int, months: bool = True) -> dict:
+    """
+    Границы частей отчёта за [lower, upper), выровненные по часам: часовые сводки до
+    первого целого месяца (`head`), месячные сводки (`months`), часовые сводки после
+    последнего целого месяца (`tail`) и строки workflow после отметки (`raw`).
+    Пустая часть имеет равные границы. Без `months` все сводки берутся часовые.
+    """
+    rollup_upper = max(lower, min(upper, watermark))
+    first_month = month_start(datetime.fromtimestamp(lower, timezone.utc))
+    if to_start_id(first_month) < lower:
+        first_month = month_start(first_month, 1)
+    months_lower = to_start_id(first_month)
+    months_upper = to_start_id(month_start(datetime.fromtimestamp(rollup_upper, timezone.utc)))
+
+    if months and months_lower < months_upper:
+        bounds = {
+            'head': (lower, months_lower),
+            'months': (months_lower, months_upper),
+            'tail': (months_upper, rollup_upper),
+        }
+    else:
+        bounds = {'head': (lower, rollup_upper), 'months': (0, 0), 'tail': (0, 0)}
+    bounds['raw'] = (max(lower, watermark), upper)
+
+    params = {}
+    for segment, (segment_lower, segment_upper) in bounds.items():
+        params[f'{segment}_lower'] = segment_lower
+        params[f'{segment}_upper'] = max(segment_lower, segment_upper)
+    return params
+
+
+def shift_of_hour() -> List[int]:
+    """Номер смены (с 1) для каждого часа местных суток по `SHIFT_START_HOURS`."""
+    shifts = []
+    for hour in range(24):
+        started = [index for index, start in enumerate(SHIFT_START_HOURS, 1) if start <= hour]
+        # Часы до первой смены суток относятся к последней смене предыдущих суток
+        shifts.append(started[-1] if started else len(SHIFT_START_HOURS))
+    return shifts
+
+
+def shift_name(shift: int) -> str:
+    """Название смены по часам её начала и окончания."""
+    start = SHIFT_START_HOURS[shift - 1]
+    end = SHIFT_START_HOURS[shift % len(SHIFT_START_HOURS)]
+    return f"{start:02d}:00–{end:02d}:00"
+
+
+async def load_downtime_report(
+    db: AsyncSession,
+    lower: int,
+    upper: int,
+    equipment_ids: Optional[List[int]] = None,
+    group_id: Optional[int] = None,
+    by_shift: bool = False,
+    utc_offset: int = 0
+):
+    """
+    Строки отчёта о простоях за [lower, upper) (границы выровнены по часам):
+    equipment_id, equipment_name, answer_id, shift, downtimes, downtime_seconds.
+
+    Смены вычисляются по часу начала простоя, поэтому с `by_shift` месячные сводки не
+    используются. `utc_offset` — смещение местного времени киоска от UTC, сек.
+    """
+    watermark = (await db.execute(WATERMARK_QUERY, {'name': ROLLUP_NAME})).scalar() or 0
+    params = report_segments(lower, upper, watermark, months=not by_shift)
+    if equipment_ids is not None:
+        query = DOWNTIME_REPORT_QUERIES[("equipment_ids", by_shift)]
+        params['equipment_ids'] = equipment_ids
+    else:
+        query = DOWNTIME_REPORT_QUERIES[("group_id", by_shift)]
+        params['group_id'] = group_id
+    if by_shift:
+        params.update({'shift_of_hour': shift_of_hour(), 'utc_offset': utc_offset})
+    return (await db.execute(query, params)).all()
+
+
+# Название строки отчёта для простоев без причины
+NO_ANSWER_NAME = "Причина не указана"
+
+
+def report_key(row, by: str):
+    """Ключ и название строки отчёта о простоях в разрезе `by`."""
+    if by == "equipment":
+        return row.equipment_id, row.equipment_name
+    if by == "shift":
+        return row.shift, shift_name(row.shift)
+    if by == "answer":
+        return row.answer_id, answer_catalog.answer_text(row.answer_id) or NO_ANSWER_NAME
+    category = answer_catalog.answer_category(row.answer_id)
+    return category, answer_catalog.category_name(category) or NO_ANSWER_NAME
+
+
+def summarize(rows, by: str) -> list:
+    """
+    Складывает строки `load_downtime_report()` в разрезе `by` (equipment, answer,
+    category или shift), по убыванию длительности. Станки без простоев остаются только
+    в разрезе по оборудованию.
+    """
+    items = {}
+    for row in rows:
+        if row.answer_id is None and by != "equipment":
+            continue
+        key, name = report_key(row, by)
+        item = items.get(key)
+        if item is None:
+            item = items[key] = {"key": key, "name": name, "downtimes": 0, "downtime_seconds": 0}
+        item["downtimes"] += row.downtimes
+        item["downtime_seconds"] += row.downtime_seconds
+    return sorted(items.values(), key=lambda item: item["downtime_seconds"], reverse=True)
+
+
+def reliability(rows, observed_seconds: int) -> list:
+    """
+    Показатели надёжности станков за наблюдаемый период `observed_seconds`:
+    MTTR — средняя длительность простоя, MTBF — среднее время работы между простоями.
+    Для станков без простоев оба показателя не определены (None).
+    """
+    items = []
+    for item in summarize(rows, "equipment"):
+        downtimes = item["downtimes"]
+        uptime = max(observed_seconds - item["downtime_seconds"], 0)
+        items.append({
+            "equipment_id": item["key"],
+            "equipment_name": item["name"],
+            "downtimes": downtimes,
+            "downtime_seconds": item["downtime_seconds"],
+            "mttr_seconds": item["downtime_seconds"] / downtimes if downtimes else None,
+            "mtbf_seconds": uptime / downtimes if downtimes else None,
+        })
+    return items
+
+
+def pareto(rows, metric: str) -> list:
+    """
+    Диаграмма Парето по категориям причин: категории по убыванию `metric`
+    (downtime_seconds или downtimes) с долей и накопленной долей.
+    """
+    items = sorted(summarize(rows, "category"), key=lambda item: item[metric], reverse=True)
+    total = sum(item[metric] for item in items)
+    cumulative = 0
+    for item in items:
+        cumulative += item[metric]
+        item["share"] = item[metric] / total if total else 0
+        item["cumulative_share"] = cumulative / total if total else 0
+    return items
@@ -0,0 +1,132 @@
+# app/answers_cache.py
+"""
+Модуль `answers_cache` хранит справочник причин простоев в памяти рабочего процесса.
+
+Справочник (`answers_list` и `answers_categories`) меняется редко, а читается при каждом
+открытии формы причины простоя и при каждой выдаче журнала простоев. Поэтому он
+загружается при старте приложения и отдаётся из памяти.
+
+Актуальность поддерживается двумя способами:
+- триггер из миграции `0002_kiosk_events` публикует событие `answers_changed`, и каждый рабочий
+  процесс сбрасывает свою копию (см. `app/events.py`);
+- копия в любом случае перечитывается не реже, чем раз в `ANSWERS_CACHE_MAX_AGE` секунд,
+  на случай потерянного уведомления.
+
+Для ответов HTTP вычисляется сильный ETag — хэш содержимого справочника, одинаковый
+во всех рабочих процессах при одинаковых данных.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+from app.events import event_broker
+from app.logging_config import logger
+
+ANSWERS_CACHE_MAX_AGE = int(os.getenv("ANSWERS_CACHE_MAX_AGE", "300"))
+
+
+class AnswerCatalog:
+    """
+    Кэш справочника причин простоев.
+
+    Атрибуты:
+        answers (list): Список причин в формате ответа `/answers`.
+        categories (list): Список категорий причин.
+        etag (str): Сильный ETag текущего содержимого.
+    """
+
+    def __init__(self, max_age: int = ANSWERS_CACHE_MAX_AGE):
+        self.max_age = max_age
+        self.answers = []
+        self.categories = []
+        self.etag = None
+        self._texts = {}
+        self._answer_categories = {}
+        self._category_names = {}
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_fresh(self) -> bool:
+        """Загружен ли справочник и не истёк ли срок его жизни."""
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.max_age
+        )
+
+    async def load(self):
+        """Перечитывает справочник из базы данных."""
+        answers_query = text("""
+            SELECT answer_id, answer_text, answer_category
+            FROM answers_list
+            ORDER BY answer_id
+        """)
+        categories_query = text("""
+            SELECT answer_category, name
+            FROM answers_categories
+            ORDER BY answer_category
+        """)
+        async with SessionLocal() as db:
+            async with db.begin():
+                answers = (await db.execute(answers_query)).all()
+                categories = (await db.execute(categories_query)).all()
+
+        self.answers = [
+            {'answer_id': ans.answer_id, 'answer_text': ans.answer_text} for ans in answers
+        ]
+        self.categories = [
+            {'answer_category': cat.answer_category, 'name': cat.name} for cat in categories
+        ]
+        self._texts = {ans.answer_id: ans.answer_text for ans in answers}
+        self._answer_categories = {ans.answer_id: ans.answer_category for ans in answers}
+        self._category_names = {cat.answer_category: cat.name for cat in categories}
+        content = json.dumps(
+            {'answers': self.answers, 'categories': self.categories},
+            ensure_ascii=False, sort_keys=True
+        )
+        self.etag = '"%s"' % hashlib.sha256(content.encode()).hexdigest()[:32]
+        self._loaded_at = time.monotonic()
+        logger.info(
+            "Справочник причин простоев загружен: %d причин, %d категорий",
+            len(self.answers),
+            len(self.categories)
+        )
+
+    async def ensure_loaded(self):
+        """Загружает справочник, если он ещё не загружен или устарел."""
+        if self.is_fresh:
+            return
+        async with self._lock:
+            # Пока ждали блокировку, справочник мог загрузить другой запрос
+            if not self.is_fresh:
+                await self.load()
+
+    def invalidate(self, event: Optional[dict] = None):
+        """Помечает справочник устаревшим; следующий запрос перечитает его."""
+        logger.info("Справочник причин простоев сброшен: %s", event)
+        self._loaded_at = None
+
+    def answer_text(self, answer_id: Optional[int]) -> Optional[str]:
+        """Текст причины простоя по её идентификатору."""
+        return self._texts.get(answer_id)
+
+    def answer_category(self, answer_id: Optional[int]) -> Optional[int]:
+        """Категория причины простоя по её идентификатору."""
+        return self._answer_categories.get(answer_id)
+
+    def category_name(self, answer_category: Optional[int]) -> Optional[str]:
+        """Название категории причин простоев по её идентификатору."""
+        return self._category_names.get(answer_category)
+
+
+answer_catalog = AnswerCatalog()
+# Сброс во всех рабочих процессах по уведомлению из базы данных, а также после
+# переподключения LISTEN-соединения, когда уведомления могли быть потеряны
+event_broker.add_handler("answers_changed", answer_catalog.invalidate)
+event_broker.add_handler("resync", answer_catalog.invalidate)
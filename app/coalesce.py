@@ -0,0 +1,132 @@
+# app/coalesce.py
+"""
+Модуль `coalesce` объединяет одинаковые одновременные запросы к базе данных.
+
+Киоски одного цеха обновляют данные почти одновременно и выполняют одинаковые запросы
+(`/equipment/{group_id}?page=1&page_size=4`, список операторов группы). В рабочем
+процессе первый такой запрос запускает загрузку отдельной задачей, остальные ждут её
+результат. Результат ещё `COALESCE_TTL_MS` миллисекунд отдаётся новым запросам, поэтому
+N киосков группы обходятся примерно одним запросом к базе за период обновления.
+
+Загрузка выполняется в своей сессии базы данных (`read_session()` из app/replica.py):
+она переживает отмену запроса, который её начал, и не зависит от сессии маршрута.
+Основная база и реплика отдают данные разной свежести, поэтому база входит в ключ.
+
+Ключ загрузки — кортеж `(имя, область, идентификатор, ...параметры)`, где область —
+`GROUP_SCOPE` или `EQUIPMENT_SCOPE` из app/versions.py. Результаты, в ключ которых
+входит версия данных, не устаревают; прочие (сами версии, списки операторов)
+устаревают не дольше чем на `COALESCE_TTL_MS`. Чтобы изменение, сделанное на киоске,
+было видно сразу, события из `app/events.py` сбрасывают результаты своей группы, её
+групп-предков (app/groups.py) и станков.
+
+Параметры задаются переменными окружения:
+- `COALESCE_TTL_MS` — сколько миллисекунд отдавать готовый результат (по умолчанию 250;
+  0 — только объединение одновременных запросов).
+"""
+import asyncio
+import functools
+import os
+from typing import Awaitable, Callable, Tuple
+
+from app.events import event_broker
+from app.groups import group_tree
+from app.metrics import Counter
+from app.versions import EQUIPMENT_SCOPE, GROUP_SCOPE
+
+COALESCE_TTL_MS = int(os.getenv("COALESCE_TTL_MS", "250"))
+
+# События, после которых результаты группы и станков надо перечитать
+INVALIDATING_EVENTS = (
+    "occupancy", "downtime", "answer", "answers_bulk", "answers_changed", "groups_changed", "resync"
+)
+
+coalesced_loads_total = Counter(
+    "kiosk_coalesced_loads_total",
+    "Загрузки данных маршрутов: выполненные (executed) и полученные готовыми (shared)",
+    ("name", "result")
+)
+
+
+class SingleFlight:
+    """
+    Одна загрузка на ключ для всех одновременных запросов рабочего процесса.
+
+    Атрибуты:
+        ttl (float): Сколько секунд отдавать готовый результат.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._flights = {}
+
+    def start(self, key: tuple, load: Callable[[], Awaitable]) -> Tuple[asyncio.Task, bool]:
+        """
+        Задача загрузки ключа `key` и признак того, что она только что запущена:
+        уже выполняющаяся или недавно завершённая загрузка используется повторно.
+        """
+        task = self._flights.get(key)
+        if task is not None:
+            coalesced_loads_total.inc(key[0], "shared")
+            return task, False
+        task = asyncio.ensure_future(load())
+        self._flights[key] = task
+        task.add_done_callback(functools.partial(self._finished, key))
+        coalesced_loads_total.inc(key[0], "executed")
+        return task, True
+
+    async def run(self, key: tuple, load: Callable[[], Awaitable]):
+        """
+        Результат `load()` для ключа `key`, общий для одновременных запросов. Ошибку
+        загрузки получают все её ожидающие, но не следующие запросы.
+        """
+        task, _ = self.start(key, load)
+        # Отмена одного запроса не должна отменять загрузку остальных
+        return await asyncio.shield(task)
+
+    def _finished(self, key: tuple, task: asyncio.Task):
+        if self._flights.get(key) is not task:
+            return
+        if self.ttl > 0 and not task.cancelled() and task.exception() is None:
+            asyncio.get_running_loop().call_later(self.ttl, self._forget, key, task)
+        else:
+            del self._flights[key]
+
+    def _forget(self, key: tuple, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+
+    def invalidate(self, scope: str, scope_ids: set):
+        """
+        Забывает результаты и выполняющиеся загрузки области `scope` с идентификаторами
+        `scope_ids`: следующий запрос выполнит загрузку заново.
+        """
+        for key in [k for k in self._flights if k[1] == scope and k[2] in scope_ids]:
+            del self._flights[key]
+
+    def clear(self):
+        """Забывает все результаты и выполняющиеся загрузки."""
+        self._flights.clear()
+
+    def on_event(self, event: dict):
+        """
+        Сбрасывает результаты группы события, её предков и станков; событие без группы
+        и станков сбрасывает всё.
+        """
+        equipment_ids = set(event.get("equipment_ids") or ())
+        equipment_ids.update(item[0] for item in event.get("items") or ())
+        if event.get("equipment_id") is not None:
+            equipment_ids.add(event["equipment_id"])
+        group_id = event.get("group_id")
+        if group_id is None and not equipment_ids:
+            self.clear()
+            return
+        if group_id is not None:
+            self.invalidate(GROUP_SCOPE, set(group_tree.ancestors(group_id)))
+        if equipment_ids:
+            self.invalidate(EQUIPMENT_SCOPE, equipment_ids)
+
+
+request_flights = SingleFlight(COALESCE_TTL_MS / 1000)
+
+for event_type in INVALIDATING_EVENTS:
+    event_broker.add_handler(event_type, request_flights.on_event)
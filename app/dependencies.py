@@ -1,18 +1,32 @@
 # app/dependencies
-from sqlalchemy.ext.asyncio import AsyncSession  # , create_async_engine
-from sqlalchemy.orm import sessionmaker
+from fastapi import Request
 
-from app.database import engine
+from app.database import SessionLocal
 from app.logging_config import logger
+from app.replica import read_session, replica_router
 
 
 async def get_db():
-    """Генератор, предоставляющий асинхронную сессию базы данных."""
+    """Генератор, предоставляющий асинхронную сессию базы данных из общей фабрики сессий."""
     logger.info("Создание новой сессии базы данных")
-    SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     db = SessionLocal()
     try:
         yield db
     finally:
         await db.close()
         logger.info("Сессия базы данных закрыта")
+
+
+async def get_read_db(request: Request):
+    """
+    Генератор, предоставляющий сессию для чтения: с реплики, если она не отстаёт
+    и киоск недавно ничего не изменял, иначе с основной базы (app/replica.py).
+    """
+    target = await replica_router.read_target(request)
+    logger.info("Создание новой сессии базы данных (%s)", target)
+    db = read_session(target)
+    try:
+        yield db
+    finally:
+        await db.close()
+        logger.info("Сессия базы данных закрыта")
@@ -0,0 +1,221 @@
+# app/events.py
+"""
+Модуль `events` отвечает за доставку изменений на киоски в реальном времени.
+
+Изменения публикуются в канал PostgreSQL (`NOTIFY`) в той же транзакции, в которой
+они записываются, и доходят до подписчиков только после фиксации транзакции.
+Каждый рабочий процесс приложения держит одно общее соединение с `LISTEN` и
+раздаёт полученные события всем клиентам, подписанным на соответствующую группу (цех)
+или на любую из групп-предков (app/groups.py).
+
+Источники событий:
+- `occupancy` — изменение занятости оборудования (`toggle_equipment`);
+- `downtime` — открытие или закрытие простоя в `workflow` (триггер из миграции `0002_kiosk_events`);
+- `answer` — назначение причины простоя (`update_downtime`);
+- `answers_bulk` — пакетное назначение причин (`update_downtimes`), одно событие на группу;
+- `answers_changed` — изменился справочник причин простоев (триггер из миграции `0002_kiosk_events`);
+- `groups_changed` — изменилась иерархия групп (триггер из миграции `0010_group_closure`);
+- `resync` — служебное событие: клиент должен перечитать данные целиком.
+
+Кроме клиентов, на события могут подписываться модули самого приложения
+(`EventBroker.add_handler`), например для сброса кэшей во всех рабочих процессах.
+"""
+import asyncio
+import json
+from collections import defaultdict
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine
+from app.logging_config import logger
+
+EVENTS_CHANNEL = "kiosk_events"
+# Размер очереди событий одного клиента; при переполнении клиент получает resync
+SUBSCRIBER_QUEUE_SIZE = 100
+# Интервал проверки LISTEN-соединения и пауза перед переподключением, сек
+LISTENER_PING_INTERVAL = 30
+LISTENER_RECONNECT_DELAY = 5
+
+PUBLISH_EVENT_QUERY = text("SELECT pg_notify(:channel, :payload)")
+
+ANSWER_EVENT_QUERY = text("""
+    SELECT pg_notify(:channel, json_build_object(
+        'type', 'answer',
+        'group_id', e.group_id,
+        'equipment_id', w.equipment_id,
+        'start_id', w.start_id,
+        'answer_id', w.answer_id,
+        'answer_text', al.answer_text
+    )::text)
+    FROM workflow w
+    JOIN equipment e ON e.equipment_id = w.equipment_id
+    LEFT JOIN answers_list al ON w.answer_id = al.answer_id
+    WHERE w.equipment_id = :equipment_id AND w.start_id = :start_id
+""")
+
+
+async def publish_event(db: AsyncSession, event: dict):
+    """Публикует готовое событие в рамках текущей транзакции."""
+    await db.execute(
+        PUBLISH_EVENT_QUERY,
+        {'channel': EVENTS_CHANNEL, 'payload': json.dumps(event, ensure_ascii=False)}
+    )
+
+
+async def publish_answer(db: AsyncSession, equipment_id: int, start_id: int):
+    """Публикует назначенную причину простоя в рамках текущей транзакции."""
+    await db.execute(
+        ANSWER_EVENT_QUERY,
+        {'channel': EVENTS_CHANNEL, 'equipment_id': equipment_id, 'start_id': start_id}
+    )
+
+
+class EventBroker:
+    """
+    Раздаёт события из канала PostgreSQL подписчикам внутри рабочего процесса.
+
+    Атрибуты:
+        channel (str): Имя канала LISTEN/NOTIFY.
+    """
+
+    def __init__(self, channel: str = EVENTS_CHANNEL):
+        self.channel = channel
+        self._subscribers = defaultdict(set)
+        self._handlers = defaultdict(list)
+        self._group_ancestors = lambda group_id: (group_id,)
+        self._task = None
+        self._connection = None
+        self._terminated = None
+
+    def subscribe(self, group_id: int) -> asyncio.Queue:
+        """Регистрирует нового клиента группы и возвращает его очередь событий."""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[group_id].add(queue)
+        logger.info(
+            "Новый подписчик событий для group_id: %s, всего: %s",
+            group_id,
+            len(self._subscribers[group_id])
+        )
+        return queue
+
+    def unsubscribe(self, group_id: int, queue: asyncio.Queue):
+        """Удаляет очередь клиента из подписчиков группы."""
+        subscribers = self._subscribers.get(group_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[group_id]
+        logger.info("Подписчик событий для group_id: %s отключен", group_id)
+
+    def add_handler(self, event_type: str, handler):
+        """Регистрирует синхронный обработчик событий указанного типа внутри процесса."""
+        self._handlers[event_type].append(handler)
+
+    def set_group_ancestors(self, group_ancestors):
+        """
+        Задаёт функцию, возвращающую группу и её предков: события группы получают
+        и подписчики групп-предков.
+        """
+        self._group_ancestors = group_ancestors
+
+    def dispatch(self, event: dict):
+        """
+        Передаёт событие всем подписчикам его группы и групп-предков (или всем, если
+        группа не указана).
+        """
+        for handler in self._handlers.get(event.get("type"), ()):
+            try:
+                handler(event)
+            except Exception as exc:  # noqa: BLE001 - ошибка обработчика не должна мешать рассылке
+                logger.error("Ошибка обработчика события %s: %s", event.get("type"), exc)
+        group_id = event.get("group_id")
+        if group_id is None:
+            queues = [q for subscribers in self._subscribers.values() for q in subscribers]
+        else:
+            queues = [
+                q for ancestor_id in self._group_ancestors(group_id)
+                for q in self._subscribers.get(ancestor_id, ())
+            ]
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Клиент не успевает читать: сбрасываем очередь и просим перечитать данные
+                logger.warning("Очередь событий подписчика group_id: %s переполнена", group_id)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync", "group_id": group_id})
+
+    def _on_notify(self, connection, pid, channel, payload):
+        """Обработчик уведомлений asyncpg."""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.error("Некорректное событие в канале %s: %s", channel, payload)
+            return
+        self.dispatch(event)
+
+    def _on_termination(self, connection):
+        """Обработчик разрыва LISTEN-соединения."""
+        logger.warning("LISTEN-соединение канала %s разорвано", self.channel)
+        if self._terminated is not None:
+            self._terminated.set()
+
+    async def _listen_forever(self):
+        """Держит LISTEN-соединение, переподключаясь при разрыве."""
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            try:
+                self._terminated = asyncio.Event()
+                self._connection = await asyncpg.connect(dsn)
+                self._connection.add_termination_listener(self._on_termination)
+                await self._connection.add_listener(self.channel, self._on_notify)
+                logger.info("Подписка на канал событий %s установлена", self.channel)
+                # События, опубликованные во время разрыва, потеряны: клиенты перечитывают данные
+                self.dispatch({"type": "resync"})
+                while not self._terminated.is_set():
+                    try:
+                        await asyncio.wait_for(self._terminated.wait(), LISTENER_PING_INTERVAL)
+                    except asyncio.TimeoutError:
+                        await asyncio.wait_for(
+                            self._connection.execute("SELECT 1"), LISTENER_PING_INTERVAL
+                        )
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001 - переподключаемся при любой ошибке соединения
+                logger.error("Ошибка LISTEN-соединения канала %s: %s", self.channel, exc)
+            finally:
+                await self._close_connection()
+            await asyncio.sleep(LISTENER_RECONNECT_DELAY)
+
+    async def _close_connection(self):
+        """Закрывает LISTEN-соединение, если оно открыто."""
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            connection.remove_termination_listener(self._on_termination)
+            try:
+                await connection.close(timeout=LISTENER_RECONNECT_DELAY)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Ошибка при закрытии LISTEN-соединения: %s", exc)
+                connection.terminate()
+
+    async def start(self):
+        """Запускает фоновую задачу прослушивания канала."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self):
+        """Останавливает прослушивание канала."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+event_broker = EventBroker()
@@ -0,0 +1,199 @@
+# app/export.py
+"""
+Модуль `export` выгружает журнал простоев в CSV или Parquet потоком.
+
+Строки читаются курсором на стороне сервера (`AsyncSession.stream`, курсор asyncpg)
+пачками по `EXPORT_BATCH_ROWS` и сразу кодируются в очередную порцию ответа, поэтому
+выгрузка любого числа строк занимает память одной пачки. Сессия базы данных создаётся
+при отправке первой порции и закрывается, как только курсор прочитан или клиент
+отключился: соединение пула занято только на время передачи.
+
+Parquet требует необязательной библиотеки `pyarrow`; без неё доступен только CSV.
+Каждая пачка становится отдельной группой строк файла Parquet.
+
+Параметры задаются переменными окружения:
+- `EXPORT_BATCH_ROWS` — сколько строк читать из курсора за раз (по умолчанию 10000).
+"""
+import csv
+import io
+import os
+
+import anyio
+import anyio.lowlevel
+from sqlalchemy import text
+
+from app.groups import GROUP_SUBTREE
+from app.logging_config import logger
+from app.replica import PRIMARY, read_session
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet недоступен
+    pyarrow = None
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+# Станки целого цеха выгружаются по group_id; длинный список не помещается в URL
+EXPORT_MAX_EQUIPMENT = 1000
+
+EXPORT_FORMATS = {
+    'csv': ("text/csv; charset=utf-8", "csv"),
+    'parquet': ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Столбцы выгрузки: (имя, тип Parquet в обозначениях pyarrow)
+EXPORT_COLUMNS = (
+    ('equipment_id', 'int64'),
+    ('equipment_name', 'string'),
+    ('group_id', 'int32'),
+    ('start_id', 'int64'),
+    ('stop_id', 'int64'),
+    ('start_time_utc', 'timestamp[s]'),
+    ('stop_time_utc', 'timestamp[s]'),
+    ('duration_seconds', 'int64'),
+    ('answer_id', 'int32'),
+    ('answer_text', 'string'),
+    ('answer_category', 'int32'),
+    ('category_name', 'string'),
+    ('is_alerted', 'bool'),
+)
+
+# Порядок первичного ключа workflow: строки идут из индексов секций без сортировки
+EXPORT_QUERY = """
+    SELECT w.equipment_id, e.equipment_name, e.group_id, w.start_id, w.stop_id,
+           to_timestamp(w.start_id) AT TIME ZONE 'UTC' AS start_time_utc,
+           to_timestamp(w.stop_id) AT TIME ZONE 'UTC' AS stop_time_utc,
+           w.stop_id - w.start_id AS duration_seconds,
+           w.answer_id, a.answer_text, a.answer_category, c.name AS category_name, w.is_alerted
+    FROM workflow w
+    JOIN equipment e ON e.equipment_id = w.equipment_id
+    LEFT JOIN answers_list a ON a.answer_id = w.answer_id
+    LEFT JOIN answers_categories c ON c.answer_category = a.answer_category
+    WHERE {filter}
+      AND w.start_id >= :start AND w.start_id < :end
+    ORDER BY w.equipment_id, w.start_id
+"""
+EXPORT_QUERIES = {
+    'equipment': text(EXPORT_QUERY.format(filter="w.equipment_id = ANY(:equipment_ids)")),
+    'group': text(EXPORT_QUERY.format(
+        filter=f"w.equipment_id IN (SELECT equipment_id FROM equipment WHERE group_id IN ({GROUP_SUBTREE}))"
+    )),
+}
+
+
+def parquet_available() -> bool:
+    """Установлена ли библиотека pyarrow для выгрузки в Parquet."""
+    return pyarrow is not None
+
+
+class ChunkSink(io.RawIOBase):
+    """Файл для записи, содержимое которого забирается порциями через `drain()`."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        """Байты, записанные после предыдущего вызова."""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class CsvEncoder:
+    """Кодирует пачки строк в CSV (UTF-8 с BOM, чтобы Excel распознал кодировку)."""
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _take(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data.encode("utf-8")
+
+    def start(self) -> bytes:
+        self._writer.writerow(name for name, _ in EXPORT_COLUMNS)
+        return "\ufeff".encode("utf-8") + self._take()
+
+    def encode(self, rows) -> bytes:
+        self._writer.writerows(rows)
+        return self._take()
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class ParquetEncoder:
+    """Кодирует пачки строк в группы строк файла Parquet."""
+
+    def __init__(self):
+        self._schema = pyarrow.schema([(name, pyarrow.type_for_alias(kind)) for name, kind in EXPORT_COLUMNS])
+        self._sink = ChunkSink()
+        self._writer = pyarrow.parquet.ParquetWriter(self._sink, self._schema, compression="zstd")
+
+    def start(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(self, rows) -> bytes:
+        columns = list(zip(*rows))
+        table = pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema
+        )
+        self._writer.write_table(table)
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+ENCODERS = {'csv': CsvEncoder, 'parquet': ParquetEncoder}
+
+
+async def stream_downtimes(export_format: str, filter_key: str, params: dict, target: str = PRIMARY):
+    """
+    Порции файла выгрузки простоев в формате `export_format`.
+
+    `filter_key` — 'equipment' (параметр `equipment_ids`) или 'group' (`group_id`);
+    `params` содержит также границы `start`, `end` времени начала простоя.
+    Строки читаются из базы `target` (app/replica.py).
+    """
+    encoder = ENCODERS[export_format]()
+    yield encoder.start()
+    exported = 0
+    db = read_session(target)
+    try:
+        # При отключении клиента задача ответа отменяется. Обращения к базе защищены от
+        # отмены: прерванный FETCH или откат оставил бы соединение в открытой транзакции.
+        # Отмена проверяется между пачками, после чего сессия закрывается.
+        with anyio.CancelScope(shield=True):
+            result = await db.stream(EXPORT_QUERIES[filter_key], params)
+        while True:
+            # Каждая пачка — один FETCH курсора asyncpg
+            with anyio.CancelScope(shield=True):
+                rows = await result.fetchmany(EXPORT_BATCH_ROWS)
+            await anyio.lowlevel.checkpoint_if_cancelled()
+            if not rows:
+                break
+            exported += len(rows)
+            yield encoder.encode(rows)
+    finally:
+        with anyio.CancelScope(shield=True):
+            await db.close()
+    yield encoder.finish()
+    logger.info("Выгрузка простоев (%s, %s) завершена, строк: %s", export_format, params, exported)
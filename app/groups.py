@@ -0,0 +1,141 @@
+# app/groups.py
+"""
+Модуль `groups` работает с иерархией групп: завод, цех, участок, линия.
+
+Группа включает оборудование своих подгрупп: панель цеха показывает станки всех его
+участков. Пары (предок, потомок) дерева `groups.parent_id` хранятся в таблице
+`group_closure`, которую поддерживает триггер (миграция 0010), поэтому запросы
+оборудования, занятости и простоев группы выбирают подгруппы одним поиском по
+первичному ключу замыкания (`GROUP_SUBTREE`) без рекурсивного обхода.
+
+Само дерево небольшое и хранится в памяти рабочего процесса (`group_tree`): по нему
+строится список выбора группы и рассылаются события подгрупп подписчикам панелей
+групп-предков (app/events.py). Копия перечитывается сразу по событию `groups_changed`
+из триггера и не реже, чем раз в `GROUP_TREE_MAX_AGE` секунд: рассылку событий не
+ждёт ни один запрос, поэтому устаревшее дерево перечитывается в фоне, а до окончания
+загрузки используется прежнее.
+"""
+import asyncio
+import os
+import time
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+from app.database import DATABASE_UNAVAILABLE_ERRORS, SessionLocal
+from app.events import event_broker
+from app.logging_config import logger
+
+GROUP_TREE_MAX_AGE = int(os.getenv("GROUP_TREE_MAX_AGE", "300"))
+
+# Группа :group_id и все её подгруппы. Сама группа добавлена явно: у equipment.group_id
+# нет внешнего ключа на groups, и оборудование группы, которой нет в groups (а значит,
+# и в замыкании), должно выбираться как раньше
+GROUP_SUBTREE = """
+    SELECT CAST(:group_id AS integer)
+    UNION
+    SELECT descendant_id FROM group_closure WHERE ancestor_id = :group_id
+"""
+
+# Группы в порядке обхода дерева: путь от корня по идентификаторам
+GROUP_TREE_QUERY = text("""
+    SELECT g.group_id, g.group_name, MAX(c.depth) AS depth,
+           array_agg(c.ancestor_id ORDER BY c.depth) AS ancestors
+    FROM groups g
+    JOIN group_closure c ON c.descendant_id = g.group_id
+    GROUP BY g.group_id, g.group_name
+    ORDER BY array_agg(c.ancestor_id ORDER BY c.depth DESC)
+""")
+
+
+class GroupTree:
+    """
+    Кэш дерева групп.
+
+    Атрибуты:
+        groups (list): Группы в порядке обхода дерева: `group_id`, `group_name`, `depth`.
+    """
+
+    def __init__(self, max_age: int = GROUP_TREE_MAX_AGE):
+        self.max_age = max_age
+        self.groups = []
+        self._ancestors = {}
+        self._loaded_at = None
+        self._lock = asyncio.Lock()
+        self._reload = None
+        # Счётчик сбросов: загрузка, во время которой был сброс, не считается свежей
+        self._resets = 0
+
+    @property
+    def is_fresh(self) -> bool:
+        """Загружено ли дерево и не истёк ли срок его жизни."""
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.max_age
+        )
+
+    async def load(self):
+        """Перечитывает дерево групп из базы данных."""
+        resets = self._resets
+        async with SessionLocal() as db:
+            async with db.begin():
+                rows = (await db.execute(GROUP_TREE_QUERY)).all()
+
+        self.groups = [
+            {'group_id': row.group_id, 'group_name': row.group_name, 'depth': row.depth}
+            for row in rows
+        ]
+        self._ancestors = {row.group_id: tuple(row.ancestors) for row in rows}
+        if resets == self._resets:
+            self._loaded_at = time.monotonic()
+        logger.info("Дерево групп загружено: %d групп", len(self.groups))
+
+    async def ensure_loaded(self):
+        """Загружает дерево, если оно ещё не загружено или устарело."""
+        if self.is_fresh:
+            return
+        async with self._lock:
+            # Пока ждали блокировку, дерево мог загрузить другой запрос
+            if not self.is_fresh:
+                await self.load()
+
+    def invalidate(self, event: Optional[dict] = None):
+        """Помечает дерево устаревшим и перечитывает его в фоне."""
+        logger.info("Дерево групп сброшено: %s", event)
+        self._resets += 1
+        self._loaded_at = None
+        self._schedule_reload()
+
+    def _schedule_reload(self):
+        if self._reload is not None and not self._reload.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._reload = loop.create_task(self._reload_tree())
+
+    async def _reload_tree(self):
+        try:
+            # Сброс во время загрузки требует ещё одной загрузки
+            while not self.is_fresh:
+                await self.ensure_loaded()
+        except DATABASE_UNAVAILABLE_ERRORS as error:
+            logger.warning("Не удалось перечитать дерево групп: %r", error)
+
+    def ancestors(self, group_id: int) -> Tuple[int, ...]:
+        """
+        Группа и её предки от ближайшего к корню; неизвестная группа — только она сама.
+        Устаревшее дерево перечитывается в фоне, пока ответ даёт прежнее.
+        """
+        if not self.is_fresh:
+            self._schedule_reload()
+        return self._ancestors.get(group_id, (group_id,))
+
+
+group_tree = GroupTree()
+# Сброс во всех рабочих процессах по уведомлению из базы данных, а также после
+# переподключения LISTEN-соединения, когда уведомления могли быть потеряны
+event_broker.add_handler("groups_changed", group_tree.invalidate)
+event_broker.add_handler("resync", group_tree.invalidate)
+event_broker.set_group_ancestors(group_tree.ancestors)
@@ -0,0 +1,15 @@
+# app/locks.py
+"""
+Классы рекомендательных блокировок PostgreSQL приложения.
+
+Класс — первый ключ `pg_advisory_xact_lock(класс, ключ)`; он разделяет блокировки
+разных подсистем, чтобы их ключи не пересекались.
+"""
+
+# Переключение занятости оборудования; ключ — equipment_id
+TOGGLE_LOCK_CLASS = 1
+# Фоновые задачи планировщика (app/scheduler.py); ключ — номер задачи
+SCHEDULER_LOCK_CLASS = 2
+# Сводки простоев (app/analytics.py): задача берёт блокировку монопольно, триггер
+# миграции 0009 — разделяемо; ключ — ROLLUP_LOCK_KEY
+ROLLUP_LOCK_CLASS = 3
@@ -1,9 +1,120 @@
 # app/logging_config.py
+"""
+Настройка логирования приложения.
+
+Обработчики (файл с ротацией и консоль) работают в отдельном фоновом потоке
+(`QueueListener`): маршруты только кладут записи в очередь и не ждут записи на диск
+или ротации файла.
+
+Каждая запись дополняется контекстом запроса — идентификатором запроса, маршрутом и
+длительностью (для итоговой записи о запросе, см. app/middleware.py).
+
+Параметры задаются переменными окружения:
+- `LOG_FORMAT` — `text` (по умолчанию) или `json` (одна JSON-запись на строку);
+- `LOG_LEVEL` — уровень `app_logger` (по умолчанию INFO);
+- `LOG_LEVELS` — уровни отдельных логгеров, например
+  `sqlalchemy.engine=WARNING,uvicorn.access=WARNING`;
+- `LOG_SAMPLE_RATE` — доля сохраняемых частых служебных записей (`SAMPLED_MESSAGES`),
+  от 0 до 1, по умолчанию 1 — сохраняются все;
+- `LOG_QUEUE` — писать через фоновый поток (1, по умолчанию) или напрямую (0).
+"""
+import atexit
+import contextvars
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+LOG_QUEUE = os.getenv("LOG_QUEUE", "1") == "1"
+
+# Частые записи, которые появляются в каждом запросе и сохраняются выборочно
+SAMPLED_MESSAGES = frozenset({
+    "Создание новой сессии базы данных",
+    "Создание новой сессии базы данных (%s)",
+    "Сессия базы данных закрыта",
+})
+
+# Контекст текущего HTTP-запроса: {"request_id": ..., "scope": ...}
+request_context = contextvars.ContextVar("request_context", default=None)
+
+
+def current_route():
+    """Шаблон маршрута текущего запроса (или путь, пока маршрут не определён)."""
+    context = request_context.get()
+    if context is None:
+        return None
+    scope = context["scope"]
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path")
+
+
+class RequestContextFilter(logging.Filter):
+    """Добавляет в запись идентификатор и маршрут текущего запроса."""
+
+    def filter(self, record):
+        context = request_context.get()
+        record.request_id = context["request_id"] if context else None
+        record.route = current_route()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю `rate` записей из `SAMPLED_MESSAGES`."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1 or record.msg not in SAMPLED_MESSAGES:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись как одну строку JSON."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "route": getattr(record, "route", None),
+        }
+        for field in ("method", "status_code", "duration_ms", "db_queries", "db_time_ms"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def parse_levels(levels: str) -> dict:
+    """Разбирает строку вида `logger=LEVEL,logger2=LEVEL`."""
+    result = {}
+    for item in filter(None, (part.strip() for part in levels.split(","))):
+        name, _, level = item.partition("=")
+        result[name.strip()] = level.strip().upper()
+    return result
+
 
 # Настройка логгера
-log_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+if LOG_FORMAT == "json":
+    log_formatter = JsonFormatter()
+else:
+    log_formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+    )
 
 # Настройка файла логов
 LOG_FILE = "app.log"
@@ -16,6 +127,26 @@ console_handler.setFormatter(log_formatter)
 
 # Общий логгер
 logger = logging.getLogger("app_logger")
-logger.setLevel(logging.INFO)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+logger.setLevel(LOG_LEVEL)
+
+if LOG_QUEUE:
+    # Маршруты только кладут запись в очередь; файл и консоль обслуживает фоновый поток
+    log_queue = queue.SimpleQueue()
+    entry_handler = QueueHandler(log_queue)
+    queue_listener = QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    queue_listener.start()
+    atexit.register(queue_listener.stop)
+    entry_handlers = [entry_handler]
+else:
+    entry_handlers = [file_handler, console_handler]
+
+for handler in entry_handlers:
+    # Контекст запроса и выборка добавляются в потоке запроса, до постановки в очередь
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+    handler.addFilter(RequestContextFilter())
+    logger.addHandler(handler)
+
+for logger_name, level in parse_levels(LOG_LEVELS).items():
+    logging.getLogger(logger_name).setLevel(level)
@@ -20,7 +20,7 @@
 - Jinja2: Шаблонизатор для рендеринга HTML-страниц.
 - Starlette: Для работы с сессиями и статическими файлами.
 - Pydantic: Для валидации данных, поступающих в запросах.
-- Werkzeug: Для обработки хеширования паролей.
+- Werkzeug: Для обработки хеширования паролей (см. app/security.py).
 
 Общие шаги, которые выполняет модуль:
 1. Инициализация приложения FastAPI с подключением middleware для сессий.
@@ -30,27 +30,72 @@
 о пользователях, оборудовании и простоях.
 4. Управление сессиями для хранения информации о текущем пользователе и выбранной группе.
 """
+import asyncio
+import json
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone, timedelta
+from typing import List, Optional
 from fastapi import (
     FastAPI, Depends, Form, HTTPException,
     Query, Request, status
 )
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from starlette.middleware.sessions import SessionMiddleware
-from werkzeug.security import check_password_hash
 
 # from app.database import engine
-from app.dependencies import get_db
+from app.analytics import (
+    hour_ceil, hour_floor, load_downtime_report, pareto, reliability, summarize
+)
+from app.answers_cache import answer_catalog
+from app.coalesce import request_flights
+from app.database import pool_status, replica_engine
+from app.dependencies import get_db, get_read_db
+from app.events import event_broker, publish_answer, publish_event
+from app.export import EXPORT_FORMATS, EXPORT_MAX_EQUIPMENT, parquet_available, stream_downtimes
+from app.groups import GROUP_SUBTREE, group_tree
+from app.locks import TOGGLE_LOCK_CLASS
 from app.logging_config import logger
+from app.metrics import METRICS_CONTENT_TYPE, render_metrics
+from app.middleware import RequestContextMiddleware
+from app.pagination import decode_cursor, encode_cursor
+from app.partitions import lookback_start
+from app.replica import mark_write, read_session, replica_router
+from app.roster import (
+    RECENT_USERS_KEY, USER_SEARCH_LIMIT, recent_users, remember_user, roster_cache
+)
+from app.scheduler import scheduler
+from app.security import (
+    LOGIN_LOCKOUT_SECONDS, LOGIN_MAX_BAD_TRIES, PasswordCheckOverloaded,
+    ip_login_limiter, unknown_user_limiter, verify_password
+)
+from app.stale_cache import snapshot_cache
+from app.versions import EQUIPMENT_SCOPE, GROUP_SCOPE, get_version, make_etag
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запускает фоновые задачи рабочего процесса при старте и останавливает при завершении."""
+    await event_broker.start()
+    try:
+        await answer_catalog.load()
+    except Exception as exc:  # noqa: BLE001 - справочник загрузится при первом запросе
+        logger.error("Не удалось загрузить справочник причин простоев: %s", exc)
+    scheduler.start()
+    yield
+    await scheduler.stop()
+    await event_broker.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(SessionMiddleware, secret_key="your_secret_key")
+app.add_middleware(RequestContextMiddleware)
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -59,12 +104,38 @@ KALININGRAD_TZ = timezone(timedelta(hours=2))
 USER_ROLE = 1
 PAGE_SIZE = 4
 PAGE = 1
+# Интервал служебных сообщений в потоке событий (сек) и пауза переподключения клиента (мс)
+EVENTS_HEARTBEAT_INTERVAL = 15
+EVENTS_RETRY_MS = 5000
 
 class DowntimeUpdateRequest(BaseModel):
     """Модель для обновления информации о простое оборудования."""
     answer_id: int
 
 
+class DowntimeAnnotation(BaseModel):
+    """Причина для одного простоя в пакетном обновлении."""
+    equipment_id: int
+    start_id: int
+    answer_id: int
+
+
+class BulkDowntimeUpdateRequest(BaseModel):
+    """
+    Модель пакетного обновления причин простоев.
+
+    Либо список `items`, либо диапазон: `equipment_id`, `start_from`, `start_to`
+    (включительно, в секундах, как `start_id`) и общая `answer_id`. В режиме диапазона
+    по умолчанию меняются только простои без причины (`only_unanswered`).
+    """
+    items: Optional[List[DowntimeAnnotation]] = None
+    equipment_id: Optional[int] = None
+    start_from: Optional[int] = None
+    start_to: Optional[int] = None
+    answer_id: Optional[int] = None
+    only_unanswered: bool = True
+
+
 def convert_timestamp(ts):
     """Конвертация времени из  int"""
     if ts:
@@ -73,6 +144,44 @@ def convert_timestamp(ts):
     return "Unknown"
 
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверяет, совпадает ли один из ETag заголовка If-None-Match с текущим."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Для If-None-Match используется слабое сравнение: префикс W/ не учитывается
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+
+def not_modified_response(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Добавляет к ответу ETag и возвращает ответ 304, если клиент прислал тот же ETag
+    в `If-None-Match`; иначе возвращает None.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    response.headers.update(headers)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        if STALE_HEADER in response.headers:
+            headers[STALE_HEADER] = response.headers[STALE_HEADER]
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+
+# Возраст данных ответа, собранного из прежнего снимка (app/stale_cache.py), секунд
+STALE_HEADER = "X-Stale-Seconds"
+
+
+def with_staleness(response: Response, body: dict, stale_seconds: Optional[float]) -> dict:
+    """
+    Отмечает ответ из прежнего снимка заголовком `X-Stale-Seconds` и полем
+    `stale_seconds` — возрастом данных. Свежие данные возвращаются без изменений.
+    """
+    if stale_seconds is None:
+        return body
+    response.headers[STALE_HEADER] = str(int(stale_seconds))
+    return dict(body, stale_seconds=int(stale_seconds))
+
+
 def get_default_group_id():
     """Функция для получения group_id из переменной окружения"""
     group_id = os.getenv("GROUP_ID")
@@ -120,18 +229,19 @@ async def auto_set_group(request: Request, db: AsyncSession = Depends(get_db)):
 
 
 @app.get("/select-group")
-async def select_group(request: Request, db: AsyncSession = Depends(get_db)):
+async def select_group(request: Request):
     """
     Возвращает список доступных групп пользователей или
     перенаправляет на выбор пользователя, если group_id уже установлен.
+
+    Группы выводятся деревом (завод, цех, участок) из кэша иерархии групп
+    (app/groups.py); панель группы включает оборудование всех её подгрупп.
     """
     logger.info("Получение списка доступных групп")
-    query = text("SELECT group_id, group_name FROM groups")
-    async with db.begin():
-        result = await db.execute(query)
-        groups = result.all()
-
-    return templates.TemplateResponse("select_group.html", {"request": request, "groups": groups})
+    await group_tree.ensure_loaded()
+    return templates.TemplateResponse(
+        "select_group.html", {"request": request, "groups": group_tree.groups}
+    )
 
 
 @app.post("/set-group")
@@ -151,10 +261,18 @@ async def set_group(request: Request, db: AsyncSession = Depends(get_db)):
 
 
 @app.get("/select-user")
-async def select_user(request: Request, db: AsyncSession = Depends(get_db)):
-    """Возвращает страницу для выбора пользователя на основе выбранной группы."""
+async def select_user(request: Request, q: Optional[str] = None):
+    """
+    Возвращает страницу для выбора пользователя на основе выбранной группы.
+
+    В список выбора попадают только недавно входившие на киоске операторы и найденные
+    по строке поиска `q` (табельный номер или Ф.И.О.); небольшая группа выводится
+    целиком. Операторы группы берутся из кэша в памяти (app/roster.py).
+    """
     group_id = request.session.get('group_id')
     logger.info("Выбор пользователя для group_id: %s", group_id)
+    if group_id is None:
+        return RedirectResponse(url="/select-group", status_code=303)
     # auto_set = group_id == int(os.getenv("GROUP_ID", 0))
     # Проверяем, был ли установлен group_id из переменной окружения
     # Получаем значение group_id из переменной окружения как строку и преобразуем в int
@@ -163,26 +281,46 @@ async def select_user(request: Request, db: AsyncSession = Depends(get_db)):
         env_group_id = int(env_group_id)
     # Проверяем, был ли установлен group_id из переменной окружения
     auto_set = group_id == env_group_id
-    query = text("""
-        SELECT users.user_id, users.user_name, users.user_full_name
-        FROM users
-        JOIN users_groups ON users.user_id = users_groups.user_id
-        WHERE users_groups.group_id = :group_id
-    """)
-    async with db.begin():
-        result = await db.execute(query, {'group_id': group_id})
-        users = result.fetchall()
 
-    user_data = [
-        {"user_name": user.user_name, "user_full_name": user.user_full_name} for user in users
-    ]
+    roster = await roster_cache.get(group_id)
+    recent = roster.find(recent_users(request))
+    if q:
+        found = roster.search(q)
+    elif len(roster.users) <= USER_SEARCH_LIMIT:
+        found = roster.users
+    else:
+        found = []
+    recent_names = {user["user_name"] for user in recent}
 
     return templates.TemplateResponse(
         "select_user.html",
-        {"request": request, "users": user_data, "group_id": group_id, "auto_set": auto_set}
+        {
+            "request": request, "group_id": group_id, "auto_set": auto_set, "query": q or "",
+            "recent_users": recent,
+            "users": [user for user in found[:USER_SEARCH_LIMIT] if user["user_name"] not in recent_names],
+            "truncated": len(found) > USER_SEARCH_LIMIT,
+            "search_limit": USER_SEARCH_LIMIT,
+        }
     )
 
 
+@app.get("/select-user/search")
+async def search_users(request: Request, q: str = Query("", max_length=100)):
+    """
+    Поиск операторов группы киоска по началу табельного номера или слова Ф.И.О.
+    для поля поиска страницы выбора пользователя.
+
+    Возвращает не более `USER_SEARCH_LIMIT` операторов; `truncated` — найдены не все,
+    строку поиска нужно уточнить.
+    """
+    group_id = request.session.get('group_id')
+    if group_id is None:
+        raise HTTPException(status_code=400, detail="Группа не выбрана")
+    roster = await roster_cache.get(group_id)
+    found = roster.search(q)
+    return {"users": found[:USER_SEARCH_LIMIT], "truncated": len(found) > USER_SEARCH_LIMIT}
+
+
 @app.get("/login")
 async def login_form(request: Request):
     """Предоставляет форму входа."""
@@ -194,42 +332,126 @@ async def login_form(request: Request):
     )
 
 
+# Пользователь, его пароль и признак блокировки после неудачных попыток входа
+LOGIN_USER_QUERY = text("""
+    SELECT users.user_id, users.user_password, users.bad_tries,
+           users.bad_tries >= :max_bad_tries
+               AND users.last_bad_try_at > timezone('utc', now()) - make_interval(secs => :lockout_seconds)
+               AS locked
+    FROM users
+    JOIN users_groups ON users.user_id = users_groups.user_id
+    WHERE users.user_name = :username AND users_groups.group_id = :group_id
+""")
+
+# Неудачная попытка: после истечения блокировки счётчик начинается заново
+LOGIN_FAILURE_QUERY = text("""
+    UPDATE users
+    SET bad_tries = CASE
+            WHEN last_bad_try_at IS NULL
+                 OR last_bad_try_at <= timezone('utc', now()) - make_interval(secs => :lockout_seconds)
+            THEN 1
+            ELSE LEAST(bad_tries + 1, 32767)
+        END,
+        last_bad_try_at = timezone('utc', now())
+    WHERE user_id = :user_id
+""")
+
+LOGIN_SUCCESS_QUERY = text("""
+    UPDATE users SET bad_tries = 0
+    WHERE user_id = :user_id AND bad_tries <> 0
+""")
+
+
+def login_error(request: Request, username: str, group_id: int, error_message: str,
+                status_code: int = status.HTTP_200_OK):
+    """Возвращает форму входа с сообщением об ошибке."""
+    logger.warning(
+        "Ошибка аутентификации для пользователя %s: %s", username, error_message
+    )
+    return templates.TemplateResponse(
+        "login.html", {
+            "request": request, "error_message": error_message,
+            "username": username, "group_id": group_id
+        },
+        status_code=status_code
+    )
+
+
 @app.post("/login")
 async def login(
     request: Request, username: str = Form(...),
     password: str = Form(...), group_id: int = Form(...),
     db: AsyncSession = Depends(get_db)
 ):
-    """Аутентификация пользователя и установка сессии после успешного входа."""
+    """
+    Аутентификация пользователя и установка сессии после успешного входа.
+
+    Попытки с IP-адреса, исчерпавшего лимит неудач, и попытки заблокированного
+    пользователя отклоняются до проверки пароля. Неудачи входа под табельным номером,
+    которого нет в группе, считаются в памяти по тем же правилам, и блокировка выглядит
+    одинаково для существующих и несуществующих пользователей. Сама проверка хэша выполняется
+    в пуле потоков, чтобы не останавливать обработку запросов других киосков.
+    """
     logger.info("Попытка входа пользователя %s в группу %s", username, group_id)
-    # SQL запрос для получения информации о пользователе и его пароле
-    query = text("""
-        SELECT users.user_id, users.user_password
-        FROM users
-        JOIN users_groups ON users.user_id = users_groups.user_id
-        WHERE users.user_name = :username AND users_groups.group_id = :group_id
-    """)
+    client_ip = request.client.host if request.client else "unknown"
+    if ip_login_limiter.is_blocked(client_ip):
+        return login_error(
+            request, username, group_id,
+            "Слишком много неудачных попыток входа. Повторите попытку позже",
+            status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    lockout_params = {
+        "max_bad_tries": LOGIN_MAX_BAD_TRIES, "lockout_seconds": LOGIN_LOCKOUT_SECONDS
+    }
     async with db.begin():
-        result = await db.execute(query, {"username": username, "group_id": group_id})
+        result = await db.execute(
+            LOGIN_USER_QUERY, {"username": username, "group_id": group_id, **lockout_params}
+        )
         user = result.first()
 
-    # Проверяем, существует ли пользователь и верный ли пароль
-    if not user or not check_password_hash(user.user_password, password):
-        error_message = "Неверное имя пользователя или пароль"
-        logger.warning(
-            "Ошибка аутентификации для пользователя %s: %s", username, error_message
+    locked = user.locked if user else unknown_user_limiter.is_blocked(username)
+    if locked:
+        return login_error(
+            request, username, group_id,
+            f"Вход заблокирован после {LOGIN_MAX_BAD_TRIES} неудачных попыток. "
+            f"Повторите попытку через {LOGIN_LOCKOUT_SECONDS // 60} мин.",
+            status.HTTP_429_TOO_MANY_REQUESTS
         )
-        return templates.TemplateResponse(
-            "login.html", {
-                "request": request, "error_message": error_message,
-                "username": username, "group_id": group_id
-            }
+
+    # Проверяем, существует ли пользователь и верный ли пароль
+    try:
+        password_ok = user is not None and await verify_password(user.user_password, password)
+    except PasswordCheckOverloaded:
+        return login_error(
+            request, username, group_id,
+            "Сервер занят. Повторите попытку входа через несколько секунд",
+            status.HTTP_503_SERVICE_UNAVAILABLE
         )
+
+    if not password_ok:
+        ip_login_limiter.register_failure(client_ip)
+        if user:
+            async with db.begin():
+                await db.execute(
+                    LOGIN_FAILURE_QUERY,
+                    {"user_id": user.user_id, "lockout_seconds": LOGIN_LOCKOUT_SECONDS}
+                )
+            mark_write(request)
+        else:
+            unknown_user_limiter.register_failure(username)
+        return login_error(request, username, group_id, "Неверное имя пользователя или пароль")
         # raise HTTPException(status_code=401, detail="Неверное имя пользователя или пароль")
 
+    if user.bad_tries:
+        async with db.begin():
+            await db.execute(LOGIN_SUCCESS_QUERY, {"user_id": user.user_id})
+        mark_write(request)
+
     # Установка user_id и group_id в сессию
     request.session['user_id'] = user.user_id
     request.session['group_id'] = group_id
+    remember_user(request, username)
 
     # Перенаправление пользователя на страницу панели управления
     logger.info("Пользователь %s успешно аутентифицирован", username)
@@ -240,7 +462,11 @@ async def login(
 async def logout(request: Request):
     """Выход пользователя и очистка сессии."""
     logger.info("Пользователь выходит из системы")
+    # Недавние операторы относятся к киоску, а не к пользователю
+    recent = recent_users(request)
     request.session.clear()
+    if recent:
+        request.session[RECENT_USERS_KEY] = recent
     return RedirectResponse(url='/', status_code=303)
 
 
@@ -253,47 +479,287 @@ def get_current_user(request: Request):
     return user_id
 
 
+# Страница оборудования группы и её подгрупп с текущей занятостью. Каждая группа
+# поддерева отдаёт не больше :limit + :offset последних станков по индексу
+# ix_equipment_group_id, и страница выбирается из них: обратный просмотр всего
+# оборудования по первичному ключу не зависит от оценки размера поддерева
+EQUIPMENT_PAGE_QUERY = f"""
+    SELECT e.equipment_id, e.equipment_name, COALESCE(a.active, FALSE) AS active, u.user_name
+    FROM (
+        SELECT ge.equipment_id, ge.equipment_name
+        FROM ({GROUP_SUBTREE}) s (group_id)
+        CROSS JOIN LATERAL (
+            SELECT equipment_id, equipment_name
+            FROM equipment
+            WHERE group_id = s.group_id
+            ORDER BY equipment_id DESC
+            LIMIT CAST(:limit AS integer) + CAST(:offset AS integer)
+        ) ge
+        ORDER BY ge.equipment_id DESC
+        LIMIT :limit OFFSET :offset
+    ) e
+    LEFT JOIN alerts_subscription a ON e.equipment_id = a.equipment_id AND a.active = TRUE
+    LEFT JOIN users u ON a.user_id = u.user_id
+    ORDER BY e.equipment_id DESC
+"""
+
+# Последние :downtimes_limit простоев оборудования `p` по первичному ключу workflow.
+# Простои не раньше :since (lookback_start(), app/partitions.py) — только свежие секции.
+LATEST_DOWNTIMES_LATERAL = """
+    LEFT JOIN LATERAL (
+        SELECT w.start_id, w.stop_id, w.answer_id
+        FROM workflow w
+        WHERE w.equipment_id = p.equipment_id AND w.start_id >= :since
+        ORDER BY w.start_id DESC
+        LIMIT :downtimes_limit
+    ) d ON TRUE
+"""
+
+# Всё для первой отрисовки панели управления одним запросом: пользователь, количество
+# оборудования группы, страница оборудования с занятостью и последние простои каждого
+# станка страницы. Строка возвращается даже для группы без оборудования.
+DASHBOARD_BOOTSTRAP_QUERY = text(f"""
+    WITH total AS (
+        SELECT COUNT(*) AS total_records
+        FROM equipment
+        WHERE group_id IN ({GROUP_SUBTREE})
+    ),
+    p AS ({EQUIPMENT_PAGE_QUERY})
+    SELECT cu.user_name AS current_user_name, t.total_records,
+           p.equipment_id, p.equipment_name, p.active, p.user_name,
+           d.start_id, d.stop_id, d.answer_id
+    FROM total t
+    LEFT JOIN users cu ON cu.user_id = :user_id
+    LEFT JOIN p ON TRUE
+    {LATEST_DOWNTIMES_LATERAL}
+    ORDER BY p.equipment_id DESC, d.start_id DESC
+""")
+
+
+def add_latest_downtime(entry: dict, row, limit: int):
+    """
+    Добавляет простой из строки `LATEST_DOWNTIMES_LATERAL` в первую страницу журнала
+    `entry` (`downtimes`, `has_more`, `next_cursor`). Запрос выбирает на одну запись
+    больше `limit`: она означает, что у журнала есть следующая страница.
+    """
+    if row.start_id is None:
+        return
+    if len(entry["downtimes"]) < limit:
+        entry["downtimes"].append(downtime_to_dict(row))
+    else:
+        entry["has_more"] = True
+        entry["next_cursor"] = encode_cursor(row.equipment_id, entry["downtimes"][-1]["start_id"])
+
+
+async def load_dashboard_bootstrap(
+    target: str, user_id: str, group_id: int, page: int, page_size: int, downtimes_limit: int
+) -> dict:
+    """
+    Собирает данные первой отрисовки панели управления.
+
+    Формат совпадает с ответами `/equipment` и `/answers`; у каждого оборудования
+    дополнительно есть первая страница журнала простоев (`downtimes`, `has_more`,
+    `next_cursor`) в формате курсорного режима `/downtimes`. Данные читаются из базы
+    `target` (app/replica.py).
+    """
+    await answer_catalog.ensure_loaded()
+    async with read_session(target) as db, db.begin():
+        result = await db.execute(
+            DASHBOARD_BOOTSTRAP_QUERY,
+            {
+                'user_id': user_id,
+                'group_id': group_id,
+                'limit': page_size,
+                'offset': (page - 1) * page_size,
+                # На одну запись больше, чтобы узнать, есть ли следующая страница журнала
+                'downtimes_limit': downtimes_limit + 1,
+                'since': lookback_start()
+            }
+        )
+        rows = result.all()
+
+    equipments = {}
+    for row in rows:
+        if row.equipment_id is None:
+            continue
+        equipment = equipments.get(row.equipment_id)
+        if equipment is None:
+            equipment = equipments[row.equipment_id] = {
+                "id": row.equipment_id,
+                "name": row.equipment_name,
+                "active": row.active,
+                "user_name": row.user_name,
+                "downtimes": [],
+                "has_more": False,
+                "next_cursor": None
+            }
+        add_latest_downtime(equipment, row, downtimes_limit)
+
+    total_records = rows[0].total_records if rows else 0
+    return {
+        "user": {"user_id": user_id, "user_name": rows[0].current_user_name if rows else None},
+        "equipments": list(equipments.values()),
+        "current_page": page,
+        "total_pages": (total_records + page_size - 1) // page_size,
+        "answers": answer_catalog.answers,
+        "answers_etag": answer_catalog.etag
+    }
+
+
+async def get_dashboard_bootstrap(
+    request: Request, user_id: str, group_id: int, page: int, page_size: int, downtimes_limit: int
+) -> tuple:
+    """
+    Данные первой отрисовки панели управления и возраст в секундах, если база данных
+    недоступна и отдан последний загруженный снимок (None — данные свежие).
+    """
+    target = await replica_router.read_target(request)
+    return await snapshot_cache.get(
+        GROUP_SCOPE, group_id, ("bootstrap", user_id, page, page_size, downtimes_limit, target),
+        lambda previous: load_dashboard_bootstrap(
+            target, user_id, group_id, page, page_size, downtimes_limit
+        )
+    )
+
+
 @app.get("/dashboard/{group_id}")
-async def dashboard(request: Request, group_id: int, db: AsyncSession = Depends(get_db)):
-    """Отображает панель управления, показывая все оборудование, связанное с выбранной группой."""
+async def dashboard(request: Request, group_id: int):
+    """
+    Отображает панель управления, показывая все оборудование, связанное с выбранной группой.
+
+    Первая страница оборудования, последние простои и справочник причин встраиваются
+    в страницу, поэтому после загрузки панели дополнительных запросов не требуется.
+    Если база данных недоступна, панель строится по последнему снимку с отметкой о том,
+    насколько данные устарели.
+    """
     logger.info("Отображение панели управления для group_id: %s", group_id)
     # Получаем текущего пользователя
     user_id = get_current_user(request)
     if not user_id:
         raise HTTPException(status_code=400, detail="Пользователь не найден")
 
-    # Получаем имя текущего пользователя
-    user_query = text("SELECT user_name FROM users WHERE user_id = :user_id")
-    # Получаем список оборудования
-    equipment_query = text("SELECT * FROM equipment WHERE group_id = :group_id")
-    async with db.begin():
-        user_result = await db.execute(user_query, {'user_id': user_id})
-        user_name = user_result.scalar()
-        result = await db.execute(equipment_query, {'group_id': group_id})
-        equipments = result.fetchall()
+    bootstrap, stale_seconds = await get_dashboard_bootstrap(
+        request, user_id, group_id, PAGE, PAGE_SIZE, PAGE_SIZE
+    )
+    if stale_seconds is not None:
+        bootstrap = dict(bootstrap, stale_seconds=int(stale_seconds))
 
     return templates.TemplateResponse(
         "dashboard.html",
         {
             "request": request,
-            "equipments": equipments,
             "group_id": group_id,
-            "user_name": user_name,  # Передаем имя пользователя в шаблон
+            "user_name": bootstrap["user"]["user_name"],  # Передаем имя пользователя в шаблон
+            "bootstrap": bootstrap,
             "PAGE": PAGE,
             "PAGE_SIZE": PAGE_SIZE
         }
     )
 
 
+@app.get("/bootstrap/{group_id}")
+async def get_bootstrap(
+    request: Request,
+    response: Response,
+    group_id: int,
+    page: int = Query(PAGE, alias="page", ge=PAGE),
+    page_size: int = Query(PAGE_SIZE, alias="page_size", ge=PAGE),
+    downtimes: int = Query(PAGE_SIZE, alias="downtimes", ge=1, le=100),
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Возвращает данные панели управления одним ответом: текущего пользователя, страницу
+    оборудования с занятостью, последние `downtimes` простоев каждого станка страницы
+    и справочник причин простоев. Используется для повторной синхронизации панели.
+    Если база данных недоступна, отдаётся последний снимок с отметкой `stale_seconds`.
+    """
+    logger.info(
+        "Получение данных панели управления для group_id: %s, страница: %s", group_id, page
+    )
+    bootstrap, stale_seconds = await get_dashboard_bootstrap(
+        request, user_id, group_id, page, page_size, downtimes
+    )
+    return with_staleness(response, bootstrap, stale_seconds)
+
+
+def format_event(event: dict) -> str:
+    """Формирует сообщение Server-Sent Events, добавляя к простоям время для отображения."""
+    if event.get("type") == "downtime":
+        event = dict(
+            event,
+            start_time=convert_timestamp(event.get("start_id")),
+            stop_time=convert_timestamp(event.get("stop_id"))
+        )
+    data = json.dumps(event, ensure_ascii=False)
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+@app.get("/events/{group_id}")
+async def stream_events(
+    request: Request, group_id: int, user_id: str = Depends(get_current_user)
+):
+    """
+    Поток событий (Server-Sent Events) об изменениях оборудования и простоев группы
+    и её подгрупп.
+
+    Панель управления подписывается на поток и обновляет строки на месте вместо
+    повторной загрузки списков оборудования и простоев.
+    """
+    logger.info("Подписка пользователя user_id: %s на события group_id: %s", user_id, group_id)
+    # События подгрупп доставляются по дереву групп, которое должно быть загружено
+    await group_tree.ensure_loaded()
+
+    async def event_stream():
+        # Подписка внутри генератора: отписка в finally выполнится, только если генератор запущен
+        queue = event_broker.subscribe(group_id)
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENTS_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            event_broker.unsubscribe(group_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def get_shared_version(scope: str, scope_id: int, target: str) -> int:
+    """
+    Версия данных группы или оборудования в базе `target`, общая для одновременных
+    запросов.
+    """
+    async def load_version():
+        async with read_session(target) as db:
+            async with db.begin():
+                return await get_version(db, scope, scope_id)
+
+    return await request_flights.run(("version", scope, scope_id, target), load_version)
+
+
 @app.get("/equipment/{group_id}")
 async def get_equipment(
+    request: Request,
+    response: Response,
     group_id: int,
     page: int = Query(PAGE, alias="page", ge=PAGE),
-    page_size: int = Query(PAGE_SIZE, alias="page_size", ge=PAGE),
-    db: AsyncSession = Depends(get_db)
+    page_size: int = Query(PAGE_SIZE, alias="page_size", ge=PAGE)
 ):
     """
     Возвращает список оборудования с постраничным выводом для выбранной группы.
+
+    ETag ответа вычисляется по счётчику изменений группы; при совпадении
+    `If-None-Match` возвращается 304, а страница, загруженная при той же версии группы,
+    не выбирается повторно. Одновременные одинаковые запросы киосков цеха разделяют
+    одну загрузку (app/coalesce.py); если база данных недоступна или не ответила вовремя,
+    отдаётся последняя загруженная страница с отметкой `stale_seconds` (app/stale_cache.py).
     """
     logger.info(
         "Получение списка оборудования для group_id: %s, страница: %s, размер страницы: %s",
@@ -304,268 +770,617 @@ async def get_equipment(
     offset = (page - 1) * page_size
 
     # Запрос для получения общего количества записей
-    count_query = text("""
+    count_query = text(f"""
         SELECT COUNT(*)
         FROM equipment
-        WHERE group_id = :group_id
+        WHERE group_id IN ({GROUP_SUBTREE})
     """)
-    async with db.begin():
-        count_result = await db.execute(count_query, {'group_id': group_id})
-        total_records = count_result.scalar()  # Получаем общее количество записей
+    equipment_query = text(EQUIPMENT_PAGE_QUERY)
+    target = await replica_router.read_target(request)
 
-    total_pages = (total_records + page_size - 1) // page_size  # Рассчитываем количество страниц
+    snapshot_key = ("equipment", page, page_size, target)
+    version, stale = await snapshot_cache.read_or_stale(
+        GROUP_SCOPE, group_id, snapshot_key,
+        lambda: get_shared_version(GROUP_SCOPE, group_id, target)
+    )
+    if stale is None:
+        etag = make_etag(GROUP_SCOPE, group_id, version, page, page_size)
+        not_modified = not_modified_response(request, response, etag)
+        if not_modified is not None:
+            return not_modified
+
+    async def load_page(previous: Optional[dict]) -> dict:
+        if previous is not None and previous["etag"] == etag:
+            return previous
+        async with read_session(target) as db:
+            async with db.begin():
+                count_result = await db.execute(count_query, {'group_id': group_id})
+                total_records = count_result.scalar()  # Получаем общее количество записей
+                result = await db.execute(
+                    equipment_query,
+                    {'group_id': group_id, 'limit': page_size, 'offset': offset}
+                )
+                equipments = result.all()
 
-    equipment_query = text("""
-        SELECT e.equipment_id, e.equipment_name, COALESCE(a.active, FALSE) AS active, u.user_name
-        FROM equipment e
-        LEFT JOIN alerts_subscription a ON e.equipment_id = a.equipment_id AND a.active = TRUE
-        LEFT JOIN users u ON a.user_id = u.user_id
-        WHERE e.group_id = :group_id
-        ORDER BY e.equipment_id DESC
-        LIMIT :limit OFFSET :offset
-    """)
-    async with db.begin():
-        result = await db.execute(
-            equipment_query,
-            {'group_id': group_id, 'limit': page_size, 'offset': offset}
+        total_pages = (total_records + page_size - 1) // page_size  # Рассчитываем количество страниц
+
+        logger.info(
+            "Список оборудования получен для group_id: %s, количество записей: %s",
+            group_id,
+            len(equipments)
         )
-        equipments = result.all()
+        equipment_list = [
+            {"id": eq[0], "name": eq[1], "active": eq[2], "user_name": eq[3]}
+            for eq in equipments
+        ]
+        return {
+            "etag": etag,
+            "body": {
+                "equipments": equipment_list,
+                "current_page": page,
+                "total_pages": total_pages
+            }
+        }
 
-    logger.info(
-        "Список оборудования получен для group_id: %s, количество записей: %s",
-        group_id,
-        len(equipments)
+    if stale is None:
+        snapshot, stale_seconds = await snapshot_cache.get(
+            GROUP_SCOPE, group_id, snapshot_key, load_page, version
+        )
+    else:
+        snapshot, stale_seconds = stale
+    body = with_staleness(response, snapshot["body"], stale_seconds)
+    not_modified = not_modified_response(request, response, snapshot["etag"])
+    if not_modified is not None:
+        return not_modified
+    return body
+
+
+# Блокировка переключения оборудования: pg_advisory_xact_lock(TOGGLE_LOCK_CLASS, equipment_id)
+TOGGLE_LOCK_QUERY = text("SELECT pg_advisory_xact_lock(:lock_class, :equipment_id)")
+
+# Роль пользователя, группа оборудования и текущая занятость одним запросом
+TOGGLE_STATE_QUERY = text("""
+    SELECT u.user_role, u.user_name, e.group_id,
+           occ.id AS subscription_id,
+           occ.user_id AS occupied_by_user_id,
+           occ.user_name AS occupied_by_user_name
+    FROM users u
+    LEFT JOIN equipment e ON e.equipment_id = :equipment_id
+    LEFT JOIN LATERAL (
+        SELECT a.id, a.user_id, ou.user_name
+        FROM alerts_subscription a
+        JOIN users ou ON a.user_id = ou.user_id
+        WHERE a.equipment_id = :equipment_id AND a.active = TRUE
+        LIMIT 1
+    ) occ ON TRUE
+    WHERE u.user_id = :user_id
+""")
+
+RELEASE_SUBSCRIPTION_QUERY = text("""
+    UPDATE alerts_subscription
+    SET active = FALSE, unsubscribe_time = timezone('utc', now())
+    WHERE id = :subscription_id AND active = TRUE
+    RETURNING id
+""")
+
+TAKE_SUBSCRIPTION_QUERY = text("""
+    INSERT INTO alerts_subscription (equipment_id, user_id, active, subscribe_time, minutes_to_live)
+    VALUES (:equipment_id, :user_id, TRUE, timezone('utc', now()), 480)
+    RETURNING id
+""")
+
+# Мастер снимает предыдущее занятие и занимает оборудование сам. Вставка читает
+# результат UPDATE, поэтому выполняется после снятия и не нарушает уникальный индекс
+# активных подписок.
+REPLACE_SUBSCRIPTION_QUERY = text("""
+    WITH released AS (
+        UPDATE alerts_subscription
+        SET active = FALSE, unsubscribe_time = timezone('utc', now())
+        WHERE id = :subscription_id AND active = TRUE
+        RETURNING id
     )
-    equipment_list = [
-        {"id": eq[0], "name": eq[1], "active": eq[2], "user_name": eq[3]}
-        for eq in equipments
-    ]
-    return {
-        "equipments": equipment_list,
-        "current_page": page,
-        "total_pages": total_pages
-    }
+    INSERT INTO alerts_subscription (equipment_id, user_id, active, subscribe_time, minutes_to_live)
+    SELECT :equipment_id, :user_id, TRUE, timezone('utc', now()), 480
+    FROM released
+    RETURNING id
+""")
 
 
 async def can_toggle_equipment(user_id: str, equipment_id: int, db: AsyncSession):
     """
     Функция для проверки, может ли пользователь переключить статус оборудования.
+
+    Вызывается внутри транзакции переключения. Сначала берётся рекомендательная
+    блокировка оборудования до конца транзакции, поэтому одновременные переключения
+    одного станка выполняются по очереди и видят результат друг друга. Затем одним
+    запросом читаются роль пользователя и текущая занятость оборудования.
+
+    Возвращает прочитанное состояние для последующего переключения.
     """
     logger.info(
         "Проверка прав пользователя user_id: %s на переключение оборудования equipment_id: %s",
         user_id,
         equipment_id
     )
-    async with db.begin():  # Начинаем транзакцию для проверки прав
-        # Получаем роль текущего пользователя
-        user_role_query = text("""
-            SELECT user_role FROM users
-            WHERE user_id = :user_id
-        """)
-        user_role_result = await db.execute(user_role_query, {'user_id': user_id})
-        user_role = user_role_result.scalar()
-
-        if user_role is None:
-            logger.error("Пользователь user_id: %s не найден", user_id)
+    await db.execute(
+        TOGGLE_LOCK_QUERY, {'lock_class': TOGGLE_LOCK_CLASS, 'equipment_id': equipment_id}
+    )
+    state_result = await db.execute(
+        TOGGLE_STATE_QUERY, {'user_id': user_id, 'equipment_id': equipment_id}
+    )
+    state = state_result.first()
+
+    if state is None:
+        logger.error("Пользователь user_id: %s не найден", user_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Пользователь не найден."
+        )
+    if state.group_id is None:
+        logger.error("Оборудование equipment_id: %s не найдено", equipment_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Оборудование не найдено."
+        )
+
+    # Если оборудование уже занято другим пользователем, проверяем роль текущего пользователя
+    if state.subscription_id is not None:
+        logger.info(
+            "Оборудование занято пользователем %s (user_id: %s)",
+            state.occupied_by_user_name,
+            state.occupied_by_user_id
+        )
+
+        # Проверяем, имеет ли текущий пользователь права на изменение статуса
+        if state.occupied_by_user_id != user_id and state.user_role != USER_ROLE:
+            logger.warning(
+                "Пользователь user_id: %s не имеет прав на переключение оборудования",
+                user_id
+            )
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Пользователь не найден."
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Оборудование занято пользователем {state.occupied_by_user_name}. У вас нет прав на его переключение."
             )
 
-        # Проверяем, занят ли станок другим пользователем
-        occupation_check_query = text("""
-            SELECT a.id, a.user_id, u.user_name FROM alerts_subscription a
-            JOIN users u ON a.user_id = u.user_id
-            WHERE a.equipment_id = :equipment_id AND a.active = TRUE
-            LIMIT 1
-        """)
-        occupation_check_result = await db.execute(
-            occupation_check_query, {'equipment_id': equipment_id}
-        )
-        occupation = occupation_check_result.fetchone()
-
-        # Если оборудование уже занято другим пользователем, проверяем роль текущего пользователя
-        if occupation:
-            occupied_by_user_id = occupation.user_id
-            occupied_by_user_name = occupation.user_name
-            logger.info(
-                "Оборудование занято пользователем %s (user_id: %s)",
-                occupied_by_user_name,
-                occupied_by_user_id
+    return state
+
+
+async def toggle_subscription(user_id: str, equipment_id: int, db: AsyncSession) -> bool:
+    """
+    Переключает занятость оборудования в одной транзакции под блокировкой оборудования.
+
+    Возвращает новый статус активности оборудования для пользователя.
+    """
+    async with db.begin():
+        state = await can_toggle_equipment(user_id, equipment_id, db)
+
+        if state.subscription_id is None:
+            # Если оборудование не занято, занимаем его текущим пользователем
+            result = await db.execute(
+                TAKE_SUBSCRIPTION_QUERY, {'equipment_id': equipment_id, 'user_id': user_id}
+            )
+            active_status = True
+        elif state.occupied_by_user_id == user_id:
+            # Если текущий пользователь занял оборудование, освобождаем его
+            result = await db.execute(
+                RELEASE_SUBSCRIPTION_QUERY, {'subscription_id': state.subscription_id}
             )
+            active_status = False
+        else:
+            # Если текущий пользователь - мастер, освобождаем предыдущее занятие и занимаем оборудование
+            result = await db.execute(
+                REPLACE_SUBSCRIPTION_QUERY,
+                {
+                    'subscription_id': state.subscription_id,
+                    'equipment_id': equipment_id,
+                    'user_id': user_id
+                }
+            )
+            active_status = True
 
-            # Проверяем, имеет ли текущий пользователь права на изменение статуса
-            if occupied_by_user_id != user_id and user_role != USER_ROLE:
-                logger.warning(
-                    "Пользователь user_id: %s не имеет прав на переключение оборудования",
-                    user_id
-                )
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"Оборудование занято пользователем {occupied_by_user_name}. У вас нет прав на его переключение."
-                )
+        if result.first() is None:
+            # Подписку изменили в обход блокировки (например, напрямую в базе данных)
+            logger.error(
+                "Занятость оборудования equipment_id: %s изменилась во время переключения",
+                equipment_id
+            )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Статус оборудования изменился. Повторите попытку."
+            )
 
-    return True
+        # Сообщаем киоскам группы о новой занятости (доставится после фиксации транзакции)
+        await publish_event(db, {
+            "type": "occupancy",
+            "group_id": state.group_id,
+            "equipment_id": equipment_id,
+            "active": active_status,
+            "user_name": state.user_name if active_status else None
+        })
+
+    logger.info(
+        "Оборудование equipment_id: %s %s пользователем user_id: %s",
+        equipment_id,
+        "занято" if active_status else "освобождено",
+        user_id
+    )
+    return active_status
 
 
 @app.post("/toggle-equipment/{equipment_id}")
 async def toggle_equipment(
+    request: Request,
     equipment_id: int,
     user_id: str = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Переключает статус активности оборудования для пользователя."""
+    """
+    Переключает статус активности оборудования для пользователя.
+
+    Проверка прав и изменение занятости выполняются в одной транзакции под
+    рекомендательной блокировкой оборудования; уникальный индекс активных подписок
+    гарантирует не более одной активной подписки на оборудование.
+    """
     logger.info(
         "Переключение статуса оборудования equipment_id: %s пользователем user_id: %s",
         equipment_id,
         user_id
     )
+    try:
+        active_status = await toggle_subscription(user_id, equipment_id, db)
+    except IntegrityError as exc:
+        logger.error(
+            "Конфликт активных подписок для equipment_id: %s: %s", equipment_id, exc
+        )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Оборудование уже занято. Повторите попытку."
+        ) from exc
+
+    mark_write(request)
+    return {"status": "success", "active": active_status, "equipment_id": equipment_id}
+
+
+# Варианты выборки страницы простоев. Все варианты идут по первичному ключу
+# (equipment_id, start_id) таблицы workflow; OFFSET остаётся только у постраничного режима.
+# Условие start_id >= :since отсекает секции workflow старше журнала по умолчанию.
+DOWNTIMES_PAGE_QUERIES = {
+    # Первая (самая свежая) страница курсорного режима
+    "head": """
+        SELECT w.equipment_id, w.start_id, w.stop_id, w.answer_id
+        FROM workflow w
+        WHERE w.equipment_id = :equipment_id AND w.start_id >= :since
+        ORDER BY w.start_id DESC
+        LIMIT :limit
+    """,
+    # Более старые простои, чем курсор
+    "after": """
+        SELECT w.equipment_id, w.start_id, w.stop_id, w.answer_id
+        FROM workflow w
+        WHERE w.equipment_id = :equipment_id AND w.start_id < :start_id AND w.start_id >= :since
+        ORDER BY w.start_id DESC
+        LIMIT :limit
+    """,
+    # Более новые простои, чем курсор
+    "before": """
+        SELECT w.equipment_id, w.start_id, w.stop_id, w.answer_id
+        FROM workflow w
+        WHERE w.equipment_id = :equipment_id AND w.start_id > :start_id AND w.start_id >= :since
+        ORDER BY w.start_id ASC
+        LIMIT :limit
+    """,
+    # Постраничный режим для старых клиентов киоска
+    "page": """
+        SELECT w.equipment_id, w.start_id, w.stop_id, w.answer_id
+        FROM workflow w
+        WHERE w.equipment_id = :equipment_id AND w.start_id >= :since
+        ORDER BY w.start_id DESC
+        LIMIT :limit OFFSET :offset
+    """,
+}
+
+# Обёртка, добавляющая точное количество простоев в тот же запрос.
+# Строка с total_records возвращается даже для пустой страницы.
+DOWNTIMES_WITH_TOTAL_QUERY = """
+    WITH total AS (
+        SELECT COUNT(*) AS total_records
+        FROM workflow
+        WHERE equipment_id = :equipment_id AND start_id >= :since
+    )
+    SELECT t.total_records, p.equipment_id, p.start_id, p.stop_id, p.answer_id
+    FROM total t
+    LEFT JOIN LATERAL ({page_query}) p ON TRUE
+"""
+
+
+def downtime_to_dict(dt):
+    """
+    Преобразует строку простоя из базы данных в словарь для ответа API.
+
+    Текст причины берётся из кэша справочника причин простоев.
+    """
+    return {
+        'equipment_id': dt.equipment_id,
+        'start_id': dt.start_id,  # Сохраняем как int
+        'start_time': convert_timestamp(dt.start_id),  # Для отображения
+        'stop_id': dt.stop_id,
+        'stop_time': convert_timestamp(dt.stop_id),  # Для отображения
+        'answer_id': dt.answer_id,
+        'answer_text': answer_catalog.answer_text(dt.answer_id) if dt.answer_id else None
+    }
+
+
+async def estimate_downtimes_count(equipment_id: int, since: int, db: AsyncSession) -> int:
+    """
+    Оценивает количество простоев оборудования по статистике планировщика.
+
+    Вместо полного подсчёта используется оценка числа строк из EXPLAIN,
+    что не требует чтения индекса целиком.
+    """
+    query = text("""
+        EXPLAIN (FORMAT JSON)
+        SELECT 1 FROM workflow WHERE equipment_id = :equipment_id AND start_id >= :since
+    """)
+    result = await db.execute(query, {'equipment_id': equipment_id, 'since': since})
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+# Последние простои и количество простоев без причины по нескольким станкам одним
+# запросом. {equipment_filter} выбирает станки по списку или по группе.
+DOWNTIMES_BATCH_QUERY = """
+    WITH p AS (
+        SELECT e.equipment_id
+        FROM equipment e
+        WHERE {equipment_filter}
+    )
+    SELECT p.equipment_id, un.unanswered, d.start_id, d.stop_id, d.answer_id
+    FROM p
+    LEFT JOIN LATERAL (
+        SELECT COUNT(*) AS unanswered
+        FROM workflow w
+        WHERE w.equipment_id = p.equipment_id AND w.start_id >= :since
+          AND (w.answer_id IS NULL OR w.answer_id = 0)
+    ) un ON TRUE
+    {latest_downtimes}
+    ORDER BY p.equipment_id, d.start_id DESC
+"""
+DOWNTIMES_BATCH_QUERIES = {
+    "equipment_ids": text(DOWNTIMES_BATCH_QUERY.format(
+        equipment_filter="e.equipment_id = ANY(:equipment_ids)",
+        latest_downtimes=LATEST_DOWNTIMES_LATERAL
+    )),
+    "group_id": text(DOWNTIMES_BATCH_QUERY.format(
+        equipment_filter=f"e.group_id IN ({GROUP_SUBTREE})",
+        latest_downtimes=LATEST_DOWNTIMES_LATERAL
+    )),
+}
+DOWNTIMES_BATCH_MAX_EQUIPMENT = 100
+
+
+@app.get("/downtimes")
+async def get_downtimes_batch(
+    equipment_ids: Optional[List[int]] = Query(None, alias="equipment_ids"),
+    group_id: Optional[int] = Query(None, alias="group_id"),
+    limit: int = Query(PAGE_SIZE, alias="limit", ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Возвращает последние `limit` простоев и количество простоев без причины
+    (`answer_id` NULL или 0) для нескольких станков одним запросом к базе данных.
 
-    # Проверяем, может ли текущий пользователь переключить оборудование
-    await can_toggle_equipment(user_id, equipment_id, db)
-
-    # Теперь переключаем оборудование
-    async with db.begin():  # Начинаем транзакцию только для изменения статуса оборудования
-        # Проверяем, занят ли станок кем-либо
-        occupation_check_query = text("""
-            SELECT a.id, a.user_id, u.user_name FROM alerts_subscription a
-            JOIN users u ON a.user_id = u.user_id
-            WHERE a.equipment_id = :equipment_id AND a.active = TRUE
-            LIMIT 1
-        """)
-        occupation_check_result = await db.execute(
-            occupation_check_query, {'equipment_id': equipment_id}
+    Станки задаются списком (`equipment_ids=1&equipment_ids=2`) или группой
+    (`group_id`). Журнал каждого станка имеет формат первой страницы курсорного
+    режима `/downtimes/{equipment_id}`: продолжение — с `after=next_cursor`.
+    Несуществующие станки в ответ не попадают.
+    """
+    if (equipment_ids is None) == (group_id is None):
+        raise HTTPException(status_code=400, detail="Передайте equipment_ids или group_id")
+    if equipment_ids is not None and len(equipment_ids) > DOWNTIMES_BATCH_MAX_EQUIPMENT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не более {DOWNTIMES_BATCH_MAX_EQUIPMENT} станков в одном запросе"
         )
-        occupation = occupation_check_result.fetchone()
-
-        if occupation:
-            occupied_by_user_id = occupation.user_id
-
-            if occupied_by_user_id == user_id:
-                # Если текущий пользователь занял оборудование, освобождаем его
-                deactivate_query = text("""
-                    UPDATE alerts_subscription
-                    SET active = FALSE, unsubscribe_time = timezone('utc', now())
-                    WHERE id = :subscription_id
-                """)
-                await db.execute(deactivate_query, {'subscription_id': occupation.id})
-                active_status = False
-                logger.info(
-                    "Оборудование equipment_id: %s освобождено пользователем user_id: %s",
-                    equipment_id,
-                    user_id
-                )
-            else:
-                # Если текущий пользователь - мастер, освобождаем предыдущее занятие и занимаем оборудование
-                deactivate_query = text("""
-                    UPDATE alerts_subscription
-                    SET active = FALSE, unsubscribe_time = timezone('utc', now())
-                    WHERE id = :subscription_id
-                """)
-                await db.execute(deactivate_query, {'subscription_id': occupation.id})
-
-                activate_query = text("""
-                    INSERT INTO alerts_subscription (equipment_id, user_id, active, subscribe_time, minutes_to_live)
-                    VALUES (:equipment_id, :user_id, TRUE, timezone('utc', now()), 480)
-                """)
-                await db.execute(activate_query, {'equipment_id': equipment_id, 'user_id': user_id})
-                active_status = True
-                logger.info(
-                    "Оборудование equipment_id: %s занято пользователем user_id: %s",
-                    equipment_id,
-                    user_id
-                )
-        else:
-            # Если оборудование не занято, занимаем его текущим пользователем
-            activate_query = text("""
-                INSERT INTO alerts_subscription (equipment_id, user_id, active, subscribe_time, minutes_to_live)
-                VALUES (:equipment_id, :user_id, TRUE, timezone('utc', now()), 480)
-            """)
-            await db.execute(activate_query, {'equipment_id': equipment_id, 'user_id': user_id})
-            active_status = True
-            logger.info(
-                "Оборудование equipment_id: %s занято пользователем user_id: %s",
-                equipment_id,
-                user_id
-            )
+    logger.info(
+        "Получение последних простоев для equipment_ids: %s, group_id: %s, limit: %s",
+        equipment_ids,
+        group_id,
+        limit
+    )
 
-        await db.commit()  # Завершаем транзакцию
+    if equipment_ids is not None:
+        query = DOWNTIMES_BATCH_QUERIES["equipment_ids"]
+        params = {'equipment_ids': equipment_ids}
+    else:
+        query = DOWNTIMES_BATCH_QUERIES["group_id"]
+        params = {'group_id': group_id}
+    # На одну запись больше, чтобы узнать, есть ли следующая страница журнала
+    params['downtimes_limit'] = limit + 1
+    params['since'] = lookback_start()
 
-    return {"status": "success", "active": active_status, "equipment_id": equipment_id}
+    await answer_catalog.ensure_loaded()
+    async with db.begin():
+        result = await db.execute(query, params)
+        rows = result.all()
+
+    equipments = {}
+    for row in rows:
+        entry = equipments.get(row.equipment_id)
+        if entry is None:
+            entry = equipments[row.equipment_id] = {
+                "equipment_id": row.equipment_id,
+                "unanswered": row.unanswered,
+                "downtimes": [],
+                "has_more": False,
+                "next_cursor": None
+            }
+        add_latest_downtime(entry, row, limit)
+
+    return {"equipments": list(equipments.values())}
 
 
 @app.get("/downtimes/{equipment_id}")
 async def get_downtimes(
+    request: Request,
+    response: Response,
     equipment_id: int,
     page: int = Query(PAGE, alias="page", ge=PAGE),
     page_size: int = Query(PAGE_SIZE, alias="page_size", ge=PAGE),
-    db: AsyncSession = Depends(get_db)
+    mode: str = Query("page", alias="mode", pattern="^(page|cursor)$"),
+    after: Optional[str] = Query(None, alias="after"),
+    before: Optional[str] = Query(None, alias="before"),
+    total: str = Query("none", alias="total", pattern="^(none|approx|exact)$"),
+    since: Optional[int] = Query(None, alias="since", ge=0)
 ):
-    """Получает список всех простоев для указанного оборудования с постраничным выводом."""
+    """
+    Получает список простоев для указанного оборудования.
+
+    Поддерживаются два режима:
+    - постраничный (по умолчанию, `page`) — прежний контракт для старых клиентов киоска
+      с полями `current_page` и `total_pages`;
+    - курсорный (`mode=cursor`, а также при `after` или `before`) — выборка по первичному
+      ключу `(equipment_id, start_id)` без OFFSET. Следующая страница запрашивается с `after=next_cursor`, предыдущая —
+      с `before=prev_cursor`. Общее количество простоев возвращается только по запросу:
+      `total=exact` (точный подсчёт) или `total=approx` (оценка планировщика).
+
+    Журнал читается с `since` (время начала простоя в секундах Unix), по умолчанию — за
+    последние `DOWNTIMES_LOOKBACK_DAYS` дней: так запрос читает только свежие секции
+    таблицы workflow. Вся история запрашивается с `since=0`.
+
+    Страница простоев и точное количество выбираются одним запросом к базе данных.
+    ETag ответа вычисляется по счётчику изменений журнала оборудования и версии
+    справочника причин; при совпадении `If-None-Match` возвращается 304 без выборки.
+    Одновременные одинаковые запросы разделяют одно чтение счётчика и одну выборку
+    (app/coalesce.py); если база данных недоступна или не ответила вовремя, отдаётся
+    последняя загруженная страница с отметкой `stale_seconds` (app/stale_cache.py).
+    """
+    if after and before:
+        raise HTTPException(status_code=400, detail="Нельзя передавать after и before одновременно")
+    cursor_mode = mode == "cursor" or bool(after or before)
     logger.info(
-        "Получение списка простоев для оборудования equipment_id: %s, страница: %s, размер страницы: %s",
+        "Получение списка простоев для оборудования equipment_id: %s, страница: %s, "
+        "размер страницы: %s, after: %s, before: %s",
         equipment_id,
         page,
-        page_size
+        page_size,
+        after,
+        before
     )
 
-    offset = (page - 1) * page_size
+    if since is None:
+        since = lookback_start()
+    params = {'equipment_id': equipment_id, 'since': since}
+    if not cursor_mode:
+        page_query = DOWNTIMES_PAGE_QUERIES["page"]
+        params.update({'limit': page_size, 'offset': (page - 1) * page_size})
+    else:
+        # Запрашиваем на одну запись больше, чтобы узнать, есть ли следующая страница
+        params['limit'] = page_size + 1
+        if after:
+            page_query = DOWNTIMES_PAGE_QUERIES["after"]
+            params['start_id'] = decode_cursor(after, equipment_id)
+        elif before:
+            page_query = DOWNTIMES_PAGE_QUERIES["before"]
+            params['start_id'] = decode_cursor(before, equipment_id)
+        else:
+            page_query = DOWNTIMES_PAGE_QUERIES["head"]
 
-    # Запрос для получения общего количества простоев
-    count_query = text("""
-        SELECT COUNT(*)
-        FROM workflow
-        WHERE equipment_id = :equipment_id
-    """)
-    async with db.begin():
-        count_result = await db.execute(count_query, {'equipment_id': equipment_id})
-        total_records = count_result.scalar()  # Получаем общее количество простоев
+    with_total = not cursor_mode or total == "exact"
+    if with_total:
+        query = text(DOWNTIMES_WITH_TOTAL_QUERY.format(page_query=page_query))
+    else:
+        query = text(page_query)
 
-    total_pages = (total_records + page_size - 1) // page_size  # Рассчитываем количество страниц
+    await answer_catalog.ensure_loaded()
+    target = await replica_router.read_target(request)
 
-    query = text("""
-        SELECT w.equipment_id, w.start_id, w.stop_id, w.answer_id, al.answer_text
-        FROM workflow w
-        LEFT JOIN answers_list al ON w.answer_id = al.answer_id
-        WHERE w.equipment_id = :equipment_id
-        ORDER BY w.start_id DESC
-        LIMIT :limit OFFSET :offset
-    """)
-    async with db.begin():
-        result = await db.execute(query, {
-            'equipment_id': equipment_id,
-            'limit': page_size,
-            'offset': offset
-        })
-        downtimes = result.all()
-        
-    logger.info(
-        "Список простоев получен для equipment_id: %s, количество записей: %s",
-        equipment_id,
-        len(downtimes)
+    snapshot_key = ("downtimes", cursor_mode, page, page_size, after, before, total, since, target)
+    version, stale = await snapshot_cache.read_or_stale(
+        EQUIPMENT_SCOPE, equipment_id, snapshot_key,
+        lambda: get_shared_version(EQUIPMENT_SCOPE, equipment_id, target)
     )
+    if stale is None:
+        etag = make_etag(
+            EQUIPMENT_SCOPE, equipment_id, version,
+            cursor_mode, page, page_size, after, before, total, since, answer_catalog.etag
+        )
+        not_modified = not_modified_response(request, response, etag)
+        if not_modified is not None:
+            return not_modified
+
+    async def load_page(previous: Optional[dict]) -> dict:
+        if previous is not None and previous["etag"] == etag:
+            return previous
+        total_records = None
+        async with read_session(target) as db:
+            async with db.begin():
+                result = await db.execute(query, params)
+                rows = result.all()
+                if total == "approx" and cursor_mode:
+                    total_records = await estimate_downtimes_count(equipment_id, since, db)
+
+        if with_total:
+            total_records = rows[0].total_records if rows else 0
+            rows = [row for row in rows if row.start_id is not None]
+        downtimes = sorted(rows, key=lambda row: row.start_id, reverse=True)
+
+        if not cursor_mode:
+            total_pages = (total_records + page_size - 1) // page_size  # Рассчитываем количество страниц
+            has_more = page < total_pages
+            has_newer = False
+        elif before:
+            # Записи старше курсора before заведомо есть
+            has_more = True
+            has_newer = len(downtimes) > page_size
+            downtimes = downtimes[-page_size:]
+        else:
+            has_more = len(downtimes) > page_size
+            has_newer = bool(after)
+            downtimes = downtimes[:page_size]
 
-    return {
-        "downtimes": [
-            {
-                'equipment_id': dt.equipment_id,
-                'start_id': dt.start_id,  # Сохраняем как int
-                'start_time': convert_timestamp(dt.start_id),  # Для отображения
-                'stop_id': dt.stop_id,
-                'stop_time': convert_timestamp(dt.stop_id),  # Для отображения
-                'answer_id': dt.answer_id,
-                'answer_text': dt.answer_text if dt.answer_id else None
-            }
-            for dt in downtimes
-        ],
-        "current_page": page,
-        "total_pages": total_pages
-    }
+        logger.info(
+            "Список простоев получен для equipment_id: %s, количество записей: %s",
+            equipment_id,
+            len(downtimes)
+        )
+
+        body = {
+            "downtimes": [downtime_to_dict(dt) for dt in downtimes],
+            "has_more": has_more,
+            "next_cursor": (
+                encode_cursor(equipment_id, downtimes[-1].start_id)
+                if has_more and downtimes else None
+            ),
+            "prev_cursor": (
+                encode_cursor(equipment_id, downtimes[0].start_id)
+                if has_newer and downtimes else None
+            ),
+        }
+        if cursor_mode:
+            body["total_records"] = total_records
+        else:
+            body["current_page"] = page
+            body["total_pages"] = total_pages
+        return {"etag": etag, "body": body}
+
+    if stale is None:
+        snapshot, stale_seconds = await snapshot_cache.get(
+            EQUIPMENT_SCOPE, equipment_id, snapshot_key, load_page, version
+        )
+    else:
+        snapshot, stale_seconds = stale
+    body = with_staleness(response, snapshot["body"], stale_seconds)
+    not_modified = not_modified_response(request, response, snapshot["etag"])
+    if not_modified is not None:
+        return not_modified
+    return body
 
 
 @app.post("/update-downtime/{equipment_id}/{start_id}")
 async def update_downtime(
-    equipment_id: int, start_id: int,
+    http_request: Request, equipment_id: int, start_id: int,
     request: DowntimeUpdateRequest, db: AsyncSession = Depends(get_db)
 ):
     """Обновляет информацию о простое, связывая его с ответом оператора."""
@@ -586,8 +1401,11 @@ async def update_downtime(
             {'answer_id': request.answer_id, 'equipment_id': equipment_id, 'start_id': start_id}
         )
         downtime = result.mappings().first()  # Используем mappings(), чтобы получить результат в виде словаря
+        if downtime:
+            await publish_answer(db, equipment_id, start_id)
 
     if downtime:
+        mark_write(http_request)
         # Возвращаем информацию об обновлённом простое
         logger.info(
             "Простой обновлен для equipment_id: %s, start_id: %s", equipment_id, start_id
@@ -605,14 +1423,393 @@ async def update_downtime(
         raise HTTPException(status_code=404, detail="Простой не найден")
 
 
+# Ограничения пакетного обновления причин простоев
+BULK_UPDATE_MAX_ITEMS = 500
+BULK_UPDATE_MAX_RANGE_SECONDS = 7 * 24 * 3600
+# Предел payload NOTIFY — 8000 байт; более длинные события сокращаются до списка станков
+NOTIFY_PAYLOAD_LIMIT = 7500
+
+# Все пары (equipment_id, start_id) обновляются одним UPDATE по массивам параметров
+BULK_UPDATE_ITEMS_QUERY = text("""
+    WITH input AS (
+        SELECT *
+        FROM unnest(
+            CAST(:equipment_ids AS bigint[]),
+            CAST(:start_ids AS bigint[]),
+            CAST(:answer_ids AS integer[])
+        ) AS i(equipment_id, start_id, answer_id)
+    ),
+    updated AS (
+        UPDATE workflow w
+        SET answer_id = input.answer_id
+        FROM input
+        WHERE w.equipment_id = input.equipment_id AND w.start_id = input.start_id
+        RETURNING w.equipment_id, w.start_id, w.stop_id, w.answer_id
+    )
+    SELECT u.equipment_id, u.start_id, u.stop_id, u.answer_id, e.group_id
+    FROM updated u
+    LEFT JOIN equipment e ON e.equipment_id = u.equipment_id
+""")
+
+BULK_UPDATE_RANGE_QUERY = """
+    WITH updated AS (
+        UPDATE workflow
+        SET answer_id = :answer_id
+        WHERE equipment_id = :equipment_id
+          AND start_id BETWEEN :start_from AND :start_to
+          {unanswered_filter}
+        RETURNING equipment_id, start_id, stop_id, answer_id
+    )
+    SELECT u.equipment_id, u.start_id, u.stop_id, u.answer_id, e.group_id
+    FROM updated u
+    LEFT JOIN equipment e ON e.equipment_id = u.equipment_id
+    ORDER BY u.start_id DESC
+"""
+BULK_UPDATE_RANGE_QUERIES = {
+    True: text(BULK_UPDATE_RANGE_QUERY.format(
+        unanswered_filter="AND (answer_id IS NULL OR answer_id = 0)"
+    )),
+    False: text(BULK_UPDATE_RANGE_QUERY.format(unanswered_filter="")),
+}
+
+
+async def publish_bulk_answers(db: AsyncSession, rows):
+    """
+    Публикует одно событие `answers_bulk` на группу вместо события на каждый простой.
+
+    Событие содержит тройки `[equipment_id, start_id, answer_id]` и тексты причин;
+    если оно не помещается в NOTIFY, передаётся только список станков, журналы
+    которых клиент должен перечитать.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.group_id, []).append(row)
+    for group_id, group_rows in groups.items():
+        answer_ids = {row.answer_id for row in group_rows}
+        event = {
+            "type": "answers_bulk",
+            "group_id": group_id,
+            "items": [[row.equipment_id, row.start_id, row.answer_id] for row in group_rows],
+            "answers": {
+                str(answer_id): answer_catalog.answer_text(answer_id) for answer_id in answer_ids
+            }
+        }
+        if len(json.dumps(event, ensure_ascii=False).encode()) > NOTIFY_PAYLOAD_LIMIT:
+            event = {
+                "type": "answers_bulk",
+                "group_id": group_id,
+                "equipment_ids": sorted({row.equipment_id for row in group_rows})
+            }
+        await publish_event(db, event)
+
+
+@app.post("/update-downtimes")
+async def update_downtimes(
+    http_request: Request, request: BulkDowntimeUpdateRequest, db: AsyncSession = Depends(get_db)
+):
+    """
+    Назначает причины многим простоям одним запросом к базе данных.
+
+    Принимает список `items` (`equipment_id`, `start_id`, `answer_id`) или диапазон
+    простоев одного станка с общей причиной. Причины проверяются по справочнику один
+    раз; результат возвращается по каждой строке (`updated`, `not_found`,
+    `unknown_answer`). Клиенты получают одно событие `answers_bulk` на группу.
+    """
+    await answer_catalog.ensure_loaded()
+
+    if request.items is not None:
+        if len(request.items) > BULK_UPDATE_MAX_ITEMS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Не более {BULK_UPDATE_MAX_ITEMS} простоев в одном запросе"
+            )
+        # Повторы одной пары схлопываются: действует последняя причина
+        items = {(item.equipment_id, item.start_id): item.answer_id for item in request.items}
+        known = {
+            key: answer_id for key, answer_id in items.items()
+            if answer_catalog.answer_text(answer_id) is not None
+        }
+        logger.info(
+            "Пакетное обновление простоев: %s строк, из них с известной причиной: %s",
+            len(items),
+            len(known)
+        )
+        rows = []
+        if known:
+            async with db.begin():
+                result = await db.execute(
+                    BULK_UPDATE_ITEMS_QUERY,
+                    {
+                        'equipment_ids': [key[0] for key in known],
+                        'start_ids': [key[1] for key in known],
+                        'answer_ids': list(known.values())
+                    }
+                )
+                rows = result.all()
+                if rows:
+                    await publish_bulk_answers(db, rows)
+
+        updated = {(row.equipment_id, row.start_id) for row in rows}
+        results = []
+        for (equipment_id, start_id), answer_id in items.items():
+            if (equipment_id, start_id) in updated:
+                row_status = "updated"
+            elif (equipment_id, start_id) in known:
+                row_status = "not_found"
+            else:
+                row_status = "unknown_answer"
+            results.append({
+                "equipment_id": equipment_id,
+                "start_id": start_id,
+                "answer_id": answer_id,
+                "status": row_status
+            })
+    else:
+        if None in (request.equipment_id, request.start_from, request.start_to, request.answer_id):
+            raise HTTPException(
+                status_code=400,
+                detail="Передайте items или equipment_id, start_from, start_to и answer_id"
+            )
+        if not 0 <= request.start_to - request.start_from <= BULK_UPDATE_MAX_RANGE_SECONDS:
+            raise HTTPException(status_code=400, detail="Некорректный диапазон простоев")
+        if answer_catalog.answer_text(request.answer_id) is None:
+            raise HTTPException(status_code=400, detail="Неизвестная причина простоя")
+        logger.info(
+            "Пакетное обновление простоев equipment_id: %s с %s по %s, answer_id: %s",
+            request.equipment_id,
+            request.start_from,
+            request.start_to,
+            request.answer_id
+        )
+        async with db.begin():
+            result = await db.execute(
+                BULK_UPDATE_RANGE_QUERIES[request.only_unanswered],
+                {
+                    'equipment_id': request.equipment_id,
+                    'start_from': request.start_from,
+                    'start_to': request.start_to,
+                    'answer_id': request.answer_id
+                }
+            )
+            rows = result.all()
+            if rows:
+                await publish_bulk_answers(db, rows)
+        results = [
+            {
+                "equipment_id": row.equipment_id,
+                "start_id": row.start_id,
+                "answer_id": row.answer_id,
+                "status": "updated"
+            }
+            for row in rows
+        ]
+
+    updated_count = sum(1 for item in results if item["status"] == "updated")
+    logger.info("Пакетное обновление простоев завершено: обновлено %s", updated_count)
+    if updated_count:
+        mark_write(http_request)
+    return {"status": "success", "updated": updated_count, "results": results}
+
+
+# Период аналитических отчётов по умолчанию, дней
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("ANALYTICS_DEFAULT_DAYS", "30"))
+
+
+def analytics_selection(equipment_ids: Optional[List[int]], group_id: Optional[int]):
+    """Проверяет выбор станков отчёта: список `equipment_ids` или группа `group_id`."""
+    if (equipment_ids is None) == (group_id is None):
+        raise HTTPException(status_code=400, detail="Передайте equipment_ids или group_id")
+
+
+def analytics_period(start: Optional[int], end: Optional[int]) -> tuple:
+    """
+    Период отчёта [start, end) в секундах Unix, расширенный до целых часов.
+    По умолчанию — последние `ANALYTICS_DEFAULT_DAYS` дней.
+    """
+    if end is None:
+        end = int(datetime.now(timezone.utc).timestamp())
+    if start is None:
+        start = end - ANALYTICS_DEFAULT_DAYS * 24 * 3600
+    if start >= end:
+        raise HTTPException(status_code=400, detail="Начало периода должно быть раньше конца")
+    return hour_floor(start), hour_ceil(end)
+
+
+@app.get("/analytics/downtime")
+async def get_downtime_analytics(
+    equipment_ids: Optional[List[int]] = Query(None, alias="equipment_ids"),
+    group_id: Optional[int] = Query(None, alias="group_id"),
+    start: Optional[int] = Query(None, alias="from", ge=0),
+    end: Optional[int] = Query(None, alias="to", ge=0),
+    by: str = Query("equipment", alias="by", pattern="^(equipment|answer|category|shift)$"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Количество и суммарная длительность закрытых простоев станков (`equipment_ids` или
+    `group_id`) за период [`from`, `to`) в разрезе `by`: по станкам, причинам, категориям
+    причин или сменам. Считается по сводкам простоев (app/analytics.py).
+    """
+    analytics_selection(equipment_ids, group_id)
+    start, end = analytics_period(start, end)
+    logger.info(
+        "Отчёт о простоях для equipment_ids: %s, group_id: %s, период: %s–%s, разрез: %s",
+        equipment_ids, group_id, start, end, by
+    )
+    await answer_catalog.ensure_loaded()
+    async with db.begin():
+        rows = await load_downtime_report(
+            db, start, end, equipment_ids, group_id,
+            by_shift=by == "shift", utc_offset=int(KALININGRAD_TZ.utcoffset(None).total_seconds())
+        )
+    items = summarize(rows, by)
+    return {
+        "from": start,
+        "to": end,
+        "by": by,
+        "downtimes": sum(item["downtimes"] for item in items),
+        "downtime_seconds": sum(item["downtime_seconds"] for item in items),
+        "items": items
+    }
+
+
+@app.get("/analytics/reliability")
+async def get_reliability_analytics(
+    equipment_ids: Optional[List[int]] = Query(None, alias="equipment_ids"),
+    group_id: Optional[int] = Query(None, alias="group_id"),
+    start: Optional[int] = Query(None, alias="from", ge=0),
+    end: Optional[int] = Query(None, alias="to", ge=0),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    MTBF (среднее время работы между простоями) и MTTR (средняя длительность простоя)
+    каждого станка за период [`from`, `to`). Время работы — наблюдаемая часть периода
+    (не позже текущего момента) за вычетом простоев.
+    """
+    analytics_selection(equipment_ids, group_id)
+    start, end = analytics_period(start, end)
+    logger.info(
+        "Отчёт о надёжности для equipment_ids: %s, group_id: %s, период: %s–%s",
+        equipment_ids, group_id, start, end
+    )
+    async with db.begin():
+        rows = await load_downtime_report(db, start, end, equipment_ids, group_id)
+    observed_seconds = min(end, int(datetime.now(timezone.utc).timestamp())) - start
+    return {
+        "from": start,
+        "to": end,
+        "observed_seconds": max(observed_seconds, 0),
+        "items": reliability(rows, max(observed_seconds, 0))
+    }
+
+
+@app.get("/analytics/pareto")
+async def get_pareto_analytics(
+    equipment_ids: Optional[List[int]] = Query(None, alias="equipment_ids"),
+    group_id: Optional[int] = Query(None, alias="group_id"),
+    start: Optional[int] = Query(None, alias="from", ge=0),
+    end: Optional[int] = Query(None, alias="to", ge=0),
+    metric: str = Query("downtime_seconds", alias="metric", pattern="^(downtime_seconds|downtimes)$"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Диаграмма Парето простоев по категориям причин за период [`from`, `to`): категории
+    по убыванию длительности (или количества, `metric=downtimes`) с долей и накопленной долей.
+    """
+    analytics_selection(equipment_ids, group_id)
+    start, end = analytics_period(start, end)
+    logger.info(
+        "Диаграмма Парето для equipment_ids: %s, group_id: %s, период: %s–%s",
+        equipment_ids, group_id, start, end
+    )
+    await answer_catalog.ensure_loaded()
+    async with db.begin():
+        rows = await load_downtime_report(db, start, end, equipment_ids, group_id)
+    return {"from": start, "to": end, "metric": metric, "items": pareto(rows, metric)}
+
+
+@app.get("/export/downtimes")
+async def export_downtimes(
+    request: Request,
+    equipment_ids: Optional[List[int]] = Query(None, alias="equipment_ids"),
+    group_id: Optional[int] = Query(None, alias="group_id"),
+    start: int = Query(0, alias="from", ge=0),
+    end: Optional[int] = Query(None, alias="to", ge=0),
+    export_format: str = Query("csv", alias="format", pattern="^(csv|parquet)$")
+):
+    """
+    Выгружает простои станков (`equipment_ids` или `group_id`), начавшиеся в [`from`, `to`),
+    с названиями станков, причин и их категорий файлом CSV или Parquet (`format`).
+    По умолчанию — вся история до текущего момента.
+
+    Файл передаётся потоком по мере чтения курсора (app/export.py); сессия базы данных
+    открывается только на время передачи, поэтому зависимость get_read_db не используется.
+    """
+    analytics_selection(equipment_ids, group_id)
+    if equipment_ids is not None and len(equipment_ids) > EXPORT_MAX_EQUIPMENT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не более {EXPORT_MAX_EQUIPMENT} станков в одном запросе; выгружайте цех по group_id"
+        )
+    if end is None:
+        end = int(datetime.now(timezone.utc).timestamp()) + 1
+    if start >= end:
+        raise HTTPException(status_code=400, detail="Начало периода должно быть раньше конца")
+    if export_format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Выгрузка в Parquet недоступна: не установлен pyarrow")
+    logger.info(
+        "Выгрузка простоев для equipment_ids: %s, group_id: %s, период: %s–%s, формат: %s",
+        equipment_ids, group_id, start, end, export_format
+    )
+
+    if group_id is not None:
+        filter_key, params, scope = "group", {"group_id": group_id}, f"group{group_id}"
+    else:
+        filter_key, params, scope = "equipment", {"equipment_ids": equipment_ids}, "equipment"
+    params.update(start=start, end=end)
+    media_type, extension = EXPORT_FORMATS[export_format]
+    filename = f"downtimes_{scope}_{start}_{end}.{extension}"
+    return StreamingResponse(
+        stream_downtimes(export_format, filter_key, params, await replica_router.read_target(request)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/pool-stats")
+async def get_pool_stats():
+    """
+    Возвращает состояние пула соединений рабочего процесса для подбора его размера,
+    а если задана реплика — состояние её пула и отставание при последней проверке.
+    """
+    stats = {"pid": os.getpid(), **pool_status()}
+    if replica_engine is not None:
+        stats["replica"] = {**pool_status(replica_engine), "lag_seconds": replica_router.lag}
+    return stats
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Возвращает метрики рабочего процесса в текстовом формате Prometheus: гистограммы
+    длительности HTTP- и SQL-запросов по маршрутам, коды ответов, запросы в обработке
+    и состояние пула соединений.
+    """
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/answers")
-async def get_answers(db: AsyncSession = Depends(get_db)):
-    """Возвращает список всех доступных ответов для использования в системе."""
+async def get_answers(request: Request):
+    """
+    Возвращает список всех доступных ответов для использования в системе.
+
+    Список отдаётся из кэша справочника. Если клиент прислал `If-None-Match`
+    с актуальным ETag, возвращается 304 без тела.
+    """
     logger.info("Получение списка всех доступных ответов")
-    query = text("SELECT answer_id, answer_text FROM answers_list")
-    async with db.begin():
-        result = await db.execute(query)
-        answers = result.all()  # Получаем все строки, каждая строка будет в виде кортежа
-    logger.info("Получено %d ответов", len(answers))
-    # Преобразуем каждую строку (кортеж) в словарь
-    return [{'answer_id': ans[0], 'answer_text': ans[1]} for ans in answers]
+    await answer_catalog.ensure_loaded()
+    response = JSONResponse(answer_catalog.answers)
+    not_modified = not_modified_response(request, response, answer_catalog.etag)
+    if not_modified is not None:
+        return not_modified
+    logger.info("Получено %d ответов", len(answer_catalog.answers))
+    return response
@@ -0,0 +1,187 @@
+# app/metrics.py
+"""
+Модуль `metrics` собирает метрики рабочего процесса в формате Prometheus.
+
+Собираются:
+- длительность, количество и коды ответов HTTP-запросов по шаблонам маршрутов,
+  а также число запросов в обработке (`MetricsMiddleware` в app/middleware.py);
+- количество и длительность SQL-запросов с привязкой к маршруту, в котором они
+  выполнены (события движка SQLAlchemy в app/profiling.py);
+- состояние пулов соединений основной базы и реплики (app/database.py);
+- загрузки, выполненные и разделённые между одновременными запросами (app/coalesce.py);
+- ответы из снимков при недоступности базы данных (app/stale_cache.py).
+
+Метрики хранятся в памяти процесса и отдаются на `/metrics`. У каждой серии есть
+метка `worker` (PID), чтобы серии разных рабочих процессов не смешивались.
+"""
+import os
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Optional
+
+from app.database import pool_status, replica_engine
+from app.logging_config import request_context
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+WORKER = str(os.getpid())
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Базовая метрика с метками.
+
+    Атрибуты:
+        name (str): Имя метрики.
+        documentation (str): Описание метрики для строки HELP.
+        labelnames (tuple): Имена меток.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _labels(self, labelvalues) -> dict:
+        return {"worker": WORKER, **dict(zip(self.labelnames, labelvalues))}
+
+    def samples(self):
+        """Возвращает пары (строка серии, значение)."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{series} {_format_value(value)}" for series, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = defaultdict(float)
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] += amount
+
+    def samples(self):
+        for labelvalues, value in self._values.items():
+            yield self.name + _format_labels(self._labels(labelvalues)), value
+
+
+class Gauge(Counter):
+    """Значение, которое может как расти, так и уменьшаться."""
+    kind = "gauge"
+
+    def dec(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] -= amount
+
+    def set(self, value: float, *labelvalues):
+        self._values[labelvalues] = value
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными границами корзин."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=HTTP_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._counts = {}
+        self._sums = defaultdict(float)
+
+    def observe(self, value: float, *labelvalues):
+        counts = self._counts.get(labelvalues)
+        if counts is None:
+            counts = self._counts[labelvalues] = [0] * (len(self.buckets) + 1)
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labelvalues] += value
+
+    def samples(self):
+        for labelvalues, counts in self._counts.items():
+            labels = self._labels(labelvalues)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = dict(labels, le=_format_value(float(bound)))
+                yield f"{self.name}_bucket{_format_labels(bucket_labels)}", cumulative
+            yield f"{self.name}_sum{_format_labels(labels)}", self._sums[labelvalues]
+            yield f"{self.name}_count{_format_labels(labels)}", cumulative
+
+
+REGISTRY = []
+
+http_requests_total = Counter(
+    "kiosk_http_requests_total", "Количество HTTP-запросов", ("route", "method", "status")
+)
+http_request_duration = Histogram(
+    "kiosk_http_request_duration_seconds", "Длительность HTTP-запросов", ("route", "method"),
+    buckets=HTTP_BUCKETS
+)
+http_requests_in_flight = Gauge(
+    "kiosk_http_requests_in_flight", "HTTP-запросы в обработке"
+)
+db_statements_total = Counter(
+    "kiosk_db_statements_total", "Количество SQL-запросов по маршрутам", ("route",)
+)
+db_statement_duration = Histogram(
+    "kiosk_db_statement_duration_seconds", "Длительность SQL-запросов по маршрутам", ("route",),
+    buckets=DB_BUCKETS
+)
+
+
+def route_label(scope: Optional[dict] = None) -> str:
+    """
+    Метка маршрута для метрик: шаблон пути (`/equipment/{group_id}`), а не сам путь,
+    чтобы число серий не росло с каждым идентификатором. Запросы без найденного
+    маршрута объединяются в `unmatched`, работа вне запросов — в `background`.
+    """
+    if scope is None:
+        context = request_context.get()
+        if context is None:
+            return "background"
+        scope = context["scope"]
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def observe_request(route: str, method: str, status_code: int, duration: float):
+    """Учитывает завершённый HTTP-запрос."""
+    http_requests_total.inc(route, method, str(status_code))
+    http_request_duration.observe(duration, route, method)
+
+
+def render_metrics() -> str:
+    """Все метрики процесса в текстовом формате Prometheus."""
+    parts = [metric.render() for metric in REGISTRY]
+    worker_labels = _format_labels({"worker": WORKER})
+    pools = [("kiosk_db_pool", pool_status())]
+    if replica_engine is not None:
+        pools.append(("kiosk_db_replica_pool", pool_status(replica_engine)))
+    for prefix, status in pools:
+        for key, value in status.items():
+            kind = "counter" if key.endswith("_total") else "gauge"
+            name = f"{prefix}_{key}"
+            parts.append(f"# TYPE {name} {kind}\n{name}{worker_labels} {_format_value(value)}")
+    return "\n".join(parts) + "\n"
@@ -0,0 +1,77 @@
+# app/middleware.py
+"""
+Модуль `middleware` содержит ASGI-прослойки приложения.
+
+`RequestContextMiddleware` присваивает каждому запросу идентификатор (или берёт его
+из заголовка `X-Request-ID`), делает его доступным логированию через
+`app.logging_config.request_context` и по завершении запроса пишет одну итоговую
+запись с маршрутом, кодом ответа и длительностью. Те же данные учитываются в метриках
+`/metrics` (app/metrics.py). В режиме `SQL_PROFILE=1` к ответу добавляются заголовки
+`X-DB-Queries` и `X-DB-Time-ms` (app/profiling.py).
+"""
+import time
+import uuid
+
+from app.logging_config import current_route, logger, request_context
+from app.metrics import http_requests_in_flight, observe_request, route_label
+from app.profiling import SQL_PROFILE, QueryProfile, current_profile, profile_headers
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+class RequestContextMiddleware:
+    """ASGI-прослойка, задающая контекст логирования запроса."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or ())
+        request_id = headers.get(REQUEST_ID_HEADER, b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        token = request_context.set({"request_id": request_id, "scope": scope})
+        started = time.perf_counter()
+        response_status = 500
+        profile = QueryProfile() if SQL_PROFILE else None
+        profile_token = current_profile.set(profile)
+        http_requests_in_flight.inc()
+
+        async def send_with_request_id(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+                ]
+                if profile is not None:
+                    message["headers"] += profile_headers(profile)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration = time.perf_counter() - started
+            duration_ms = round(duration * 1000, 2)
+            http_requests_in_flight.dec()
+            observe_request(route_label(scope), scope["method"], response_status, duration)
+            extra = {
+                "method": scope["method"],
+                "status_code": response_status,
+                "duration_ms": duration_ms
+            }
+            if profile is not None:
+                extra.update(db_queries=profile.count, db_time_ms=profile.milliseconds)
+            logger.info(
+                "Запрос %s %s завершён: %s за %.1f мс",
+                scope["method"],
+                current_route(),
+                response_status,
+                duration_ms,
+                extra=extra
+            )
+            current_profile.reset(profile_token)
+            request_context.reset(token)
@@ -64,6 +64,20 @@ class AlertsSubscription(Base):
         subscribe_action (Integer): Действие при подписке.
     """
     __tablename__ = 'alerts_subscription'
+    __table_args__ = (
+        # Не более одной активной подписки на оборудование; user_id включён для чтения
+        # занятости только из индекса (миграция 0003)
+        Index(
+            'alerts_subscription_active_occupancy_uq', 'equipment_id',
+            unique=True, postgresql_include=['user_id'], postgresql_where=text('active')
+        ),
+        # Срок истечения активной занятости для фоновой задачи expire_subscriptions (миграция 0006)
+        Index(
+            'alerts_subscription_active_expiry_idx',
+            text("(subscribe_time + minutes_to_live * interval '1 minute')"),
+            postgresql_where=text('active')
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, server_default=text("nextval('alerts_subscription_id_seq'::regclass)"))
     equipment_id = Column(Integer, nullable=False)
@@ -125,6 +139,10 @@ class Equipment(Base):
         sort_order (Integer): Порядок сортировки.
     """
     __tablename__ = 'equipment'
+    __table_args__ = (
+        # Страница оборудования группы в порядке equipment_id (миграция 0007)
+        Index('ix_equipment_group_id', 'group_id', 'equipment_id'),
+    )
 
     equipment_id = Column(Integer, primary_key=True)
     group_id = Column(Integer)
@@ -172,6 +190,28 @@ class Group(Base):
     group_status = Column(Integer, nullable=False, server_default=text("1"))
 
 
+class GroupClosure(Base):
+    """
+    Модель для таблицы `group_closure` — замыкания иерархии групп (миграция 0010).
+
+    Таблицу поддерживает триггер на `groups`; по ней оборудование группы вместе
+    с подгруппами выбирается без рекурсивного обхода (app/groups.py).
+
+    Атрибуты:
+        ancestor_id (Integer): Группа-предок (или сама группа).
+        descendant_id (Integer): Группа-потомок.
+        depth (Integer): Число уровней между группами; 0 — та же группа.
+    """
+    __tablename__ = 'group_closure'
+    __table_args__ = (
+        Index('group_closure_descendant_idx', 'descendant_id', 'ancestor_id'),
+    )
+
+    ancestor_id = Column(Integer, primary_key=True, nullable=False)
+    descendant_id = Column(Integer, primary_key=True, nullable=False)
+    depth = Column(Integer, nullable=False)
+
+
 class User(Base):
     """
     Модель для таблицы `users`, представляющей пользователей.
@@ -190,11 +230,12 @@ class User(Base):
         create_time (DateTime): Время создания пользователя.
         update_time (DateTime): Время последнего обновления данных пользователя.
         bad_tries (SmallInteger): Количество неудачных попыток входа.
+        last_bad_try_at (DateTime): Время последней неудачной попытки входа (UTC).
     """
     __tablename__ = 'users'
 
     user_id = Column(CHAR(32), primary_key=True)
-    user_name = Column(String(50))
+    user_name = Column(String(50), index=True)
     user_full_name = Column(String(250))
     user_mail = Column(String(250))
     user_role = Column(Integer, nullable=False, server_default=text("0"))
@@ -206,6 +247,7 @@ class User(Base):
     create_time = Column(DateTime, server_default=text("timezone('utc'::text, now())"))
     update_time = Column(DateTime, server_default=text("timezone('utc'::text, now())"))
     bad_tries = Column(SmallInteger, nullable=False, server_default=text("0"))
+    last_bad_try_at = Column(DateTime)
 
 
 class Workflow(Base):
@@ -220,6 +262,15 @@ class Workflow(Base):
         is_alerted (Boolean): Признак того, было ли оповещение.
     """
     __tablename__ = 'workflow'
+    __table_args__ = (
+        # Простои без указанной причины по оборудованию (миграция 0004)
+        Index(
+            'workflow_unanswered_equipment_idx', 'equipment_id', 'start_id',
+            postgresql_where=text('answer_id IS NULL OR answer_id = 0')
+        ),
+        # Секции по месяцам start_id (миграция 0008, app/partitions.py)
+        {'postgresql_partition_by': 'RANGE (start_id)'},
+    )
 
     equipment_id = Column(BigInteger, primary_key=True, nullable=False)
     start_id = Column(BigInteger, primary_key=True, nullable=False)
@@ -264,8 +315,85 @@ class UsersGroup(Base):
     __tablename__ = 'users_groups'
 
     user_id = Column(ForeignKey('users.user_id', ondelete='CASCADE', onupdate='CASCADE'), primary_key=True, nullable=False)
-    group_id = Column(ForeignKey('groups.group_id', ondelete='CASCADE', onupdate='CASCADE'), primary_key=True, nullable=False)
+    group_id = Column(ForeignKey('groups.group_id', ondelete='CASCADE', onupdate='CASCADE'), primary_key=True, nullable=False, index=True)
     user_role = Column(Integer, nullable=False, server_default=text("0"))
 
     group = relationship('Group')
     user = relationship('User')
+
+
+class KioskVersion(Base):
+    """
+    Модель для таблицы `kiosk_versions` — счётчиков изменений данных киоска.
+
+    Счётчики увеличивают триггеры (миграция 0005); по ним вычисляются ETag
+    ответов `/equipment` и `/downtimes` (app/versions.py).
+
+    Атрибуты:
+        scope (Text): Область счётчика: `group` или `equipment`.
+        scope_id (BigInteger): Идентификатор группы или оборудования.
+        version (BigInteger): Номер версии.
+    """
+    __tablename__ = 'kiosk_versions'
+
+    scope = Column(Text, primary_key=True, nullable=False)
+    scope_id = Column(BigInteger, primary_key=True, nullable=False)
+    version = Column(BigInteger, nullable=False, server_default=text("0"))
+
+
+class DowntimeRollupHourly(Base):
+    """
+    Модель для таблицы `downtime_rollup_hourly` — часовых сводок закрытых простоев.
+
+    Сводки заполняет фоновая задача и исправляет триггер на workflow (миграция 0009,
+    app/analytics.py). Простой относится к часу своего начала.
+
+    Атрибуты:
+        equipment_id (BigInteger): Идентификатор оборудования.
+        hour_start (BigInteger): Начало часа UTC в секундах Unix.
+        answer_id (Integer): Причина простоя; 0 — не указана.
+        downtimes (Integer): Количество простоев.
+        downtime_seconds (BigInteger): Суммарная длительность простоев, сек.
+    """
+    __tablename__ = 'downtime_rollup_hourly'
+
+    equipment_id = Column(BigInteger, primary_key=True, nullable=False)
+    hour_start = Column(BigInteger, primary_key=True, nullable=False)
+    answer_id = Column(Integer, primary_key=True, nullable=False)
+    downtimes = Column(Integer, nullable=False, server_default=text("0"))
+    downtime_seconds = Column(BigInteger, nullable=False, server_default=text("0"))
+
+
+class DowntimeRollupMonthly(Base):
+    """
+    Модель для таблицы `downtime_rollup_monthly` — месячных сводок закрытых простоев
+    для отчётов за длинные периоды (миграция 0009).
+
+    Атрибуты:
+        equipment_id (BigInteger): Идентификатор оборудования.
+        month_start (BigInteger): Начало месяца UTC в секундах Unix.
+        answer_id (Integer): Причина простоя; 0 — не указана.
+        downtimes (Integer): Количество простоев.
+        downtime_seconds (BigInteger): Суммарная длительность простоев, сек.
+    """
+    __tablename__ = 'downtime_rollup_monthly'
+
+    equipment_id = Column(BigInteger, primary_key=True, nullable=False)
+    month_start = Column(BigInteger, primary_key=True, nullable=False)
+    answer_id = Column(Integer, primary_key=True, nullable=False)
+    downtimes = Column(Integer, nullable=False, server_default=text("0"))
+    downtime_seconds = Column(BigInteger, nullable=False, server_default=text("0"))
+
+
+class RollupWatermark(Base):
+    """
+    Модель для таблицы `rollup_watermarks` — отметок готовности сводок (миграция 0009).
+
+    Атрибуты:
+        name (Text): Имя сводки.
+        watermark (BigInteger): start_id, до которого простои учтены в сводках.
+    """
+    __tablename__ = 'rollup_watermarks'
+
+    name = Column(Text, primary_key=True)
+    watermark = Column(BigInteger, nullable=False)
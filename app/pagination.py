@@ -0,0 +1,48 @@
+# app/pagination.py
+"""
+Модуль `pagination` содержит вспомогательные функции для курсорной (keyset) пагинации.
+
+Курсор — это непрозрачная для клиента строка, в которой закодирован ключ последней
+показанной записи `(equipment_id, start_id)` таблицы `workflow`. Клиент передаёт его
+обратно в параметрах `after`/`before`, а сервер продолжает выборку по индексу
+первичного ключа без `OFFSET` и без подсчёта всех записей.
+"""
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException
+
+from app.logging_config import logger
+
+
+def encode_cursor(equipment_id: int, start_id: int) -> str:
+    """Кодирует ключ записи простоя в непрозрачный курсор."""
+    payload = json.dumps({"e": equipment_id, "s": start_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, equipment_id: int) -> int:
+    """
+    Декодирует курсор и возвращает start_id, с которого продолжается выборка.
+
+    Курсор привязан к оборудованию: курсор, выданный для другого equipment_id,
+    считается некорректным.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        cursor_equipment_id = int(payload["e"])
+        start_id = int(payload["s"])
+    except (binascii.Error, ValueError, KeyError, TypeError) as exc:
+        logger.warning("Некорректный курсор пагинации: %s (%s)", cursor, exc)
+        raise HTTPException(status_code=400, detail="Некорректный курсор") from exc
+
+    if cursor_equipment_id != equipment_id:
+        logger.warning(
+            "Курсор для equipment_id: %s передан для equipment_id: %s",
+            cursor_equipment_id,
+            equipment_id
+        )
+        raise HTTPException(status_code=400, detail="Курсор относится к другому оборудованию")
+    return start_id
@@ -0,0 +1,207 @@
+# app/partitions.py
+"""
+Модуль `partitions` обслуживает секционирование журнала простоев `workflow`.
+
+Таблица секционирована по диапазонам `start_id` (время начала простоя в секундах Unix)
+по календарным месяцам UTC (миграция 0008). Секции:
+- `workflow_pГГГГММ` — простои одного месяца;
+- `workflow_legacy` — прежняя таблица со всеми простоями до месяца, следующего за миграцией;
+- `workflow_default` — простои вне всех секций. Обычно пуста: при создании секции месяца
+  её строки переносятся из `workflow_default` в новую секцию.
+
+Фоновая задача `maintain_workflow_partitions` (app/scheduler.py) заранее создаёт секции
+текущего и следующих месяцев и архивирует старые секции: переносит их в табличное
+пространство для архива (например, на файловой системе со сжатием) или, если оно не
+задано, отсоединяет от `workflow` в схему `workflow_archive`. Отсоединённую секцию можно
+выгрузить `pg_dump -t workflow_archive.<секция>` и удалить.
+
+Журнал простоев на страницах киоска по умолчанию читается за последние дни
+(`lookback_start()`), чтобы планировщик отсекал старые секции.
+
+Параметры задаются переменными окружения:
+- `WORKFLOW_PARTITIONS_AHEAD` — на сколько месяцев вперёд создавать секции (по умолчанию 3);
+- `WORKFLOW_RETENTION_MONTHS` — секции старше стольких полных месяцев архивируются
+  (по умолчанию 0 — не архивировать);
+- `WORKFLOW_ARCHIVE_TABLESPACE` — табличное пространство для архивных секций; если не
+  задано, секции отсоединяются;
+- `WORKFLOW_PARTITION_LOCK_TIMEOUT` — сколько ждать блокировку `workflow` при изменении
+  секций (по умолчанию 5s); при превышении задача повторится через интервал;
+- `DOWNTIMES_LOOKBACK_DAYS` — за сколько дней журнал простоев читается по умолчанию
+  (по умолчанию 90; 0 — вся история).
+"""
+import os
+import re
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.logging_config import logger
+
+WORKFLOW_PARTITIONS_AHEAD = int(os.getenv("WORKFLOW_PARTITIONS_AHEAD", "3"))
+WORKFLOW_RETENTION_MONTHS = int(os.getenv("WORKFLOW_RETENTION_MONTHS", "0"))
+WORKFLOW_ARCHIVE_TABLESPACE = os.getenv("WORKFLOW_ARCHIVE_TABLESPACE", "")
+WORKFLOW_PARTITION_LOCK_TIMEOUT = os.getenv("WORKFLOW_PARTITION_LOCK_TIMEOUT", "5s")
+DOWNTIMES_LOOKBACK_DAYS = int(os.getenv("DOWNTIMES_LOOKBACK_DAYS", "90"))
+
+ARCHIVE_SCHEMA = "workflow_archive"
+DEFAULT_PARTITION = "workflow_default"
+# Имена секций workflow; их нет в app/models.py (см. migrations/env.py)
+PARTITION_NAME_PATTERN = re.compile(r"^workflow_(p\d{6}|legacy|default)$")
+
+# Секция: границы start_id — None для MINVALUE/MAXVALUE
+Partition = namedtuple("Partition", "name lower upper tablespace")
+
+PARTITIONS_QUERY = text("""
+    SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound,
+           COALESCE(ts.spcname, '') AS tablespace
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    LEFT JOIN pg_tablespace ts ON ts.oid = c.reltablespace
+    WHERE i.inhparent = 'workflow'::regclass
+""")
+BOUND_PATTERN = re.compile(r"FROM \('?(\w+)'?\) TO \('?(\w+)'?\)")
+
+PARTITION_INDEXES_QUERY = text("""
+    SELECT c.relname
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE i.indrelid = CAST(:name AS regclass)
+""")
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+def month_start(moment: datetime, months: int = 0) -> datetime:
+    """Начало месяца UTC, отстоящего от месяца `moment` на `months` месяцев."""
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def to_start_id(moment: datetime) -> int:
+    """Время в секундах Unix, как `start_id` в workflow."""
+    return int(moment.timestamp())
+
+
+def quote_identifier(name: str) -> str:
+    """Имя объекта базы данных в двойных кавычках."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def parse_bound(bound: str):
+    """Границы секции из `pg_get_expr(relpartbound)`; None — секция по умолчанию."""
+    match = BOUND_PATTERN.search(bound)
+    if match is None:
+        return None
+    return tuple(None if value.isalpha() else int(value) for value in match.groups())
+
+
+def lookback_start(now: Optional[float] = None) -> int:
+    """
+    Нижняя граница `start_id` журнала простоев по умолчанию: начало суток UTC
+    `DOWNTIMES_LOOKBACK_DAYS` дней назад (0 — без ограничения).
+
+    Граница округлена до суток, чтобы запросы в течение дня совпадали, а ETag ответов
+    `/downtimes` не менялся без изменений журнала.
+    """
+    if DOWNTIMES_LOOKBACK_DAYS <= 0:
+        return 0
+    now = time.time() if now is None else now
+    today = int(now) // SECONDS_PER_DAY * SECONDS_PER_DAY
+    return today - DOWNTIMES_LOOKBACK_DAYS * SECONDS_PER_DAY
+
+
+async def list_partitions(db: AsyncSession) -> list:
+    """Секции workflow с границами, кроме секции по умолчанию."""
+    partitions = []
+    for row in (await db.execute(PARTITIONS_QUERY)).all():
+        bounds = parse_bound(row.bound)
+        if bounds is not None:
+            partitions.append(Partition(row.name, bounds[0], bounds[1], row.tablespace))
+    return partitions
+
+
+def is_covered(partitions: list, start_id: int) -> bool:
+    """Попадает ли `start_id` в одну из секций."""
+    return any(
+        (p.lower is None or p.lower <= start_id) and (p.upper is None or start_id < p.upper)
+        for p in partitions
+    )
+
+
+async def create_partition(db: AsyncSession, start: datetime) -> int:
+    """
+    Создаёт секцию месяца `start` и возвращает число строк, перенесённых в неё из
+    секции по умолчанию.
+
+    Таблица создаётся отдельно и присоединяется `ATTACH PARTITION`: он блокирует
+    `workflow` слабее, чем `CREATE TABLE ... PARTITION OF`, и не мешает чтению журнала.
+    """
+    name = f"workflow_p{start:%Y%m}"
+    bounds = {'lower': to_start_id(start), 'upper': to_start_id(month_start(start, 1))}
+    await db.execute(text(f"CREATE TABLE {name} (LIKE workflow INCLUDING DEFAULTS)"))
+    # Без переноса ATTACH не пройдёт проверку секции по умолчанию
+    moved = await db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE start_id >= :lower AND start_id < :upper
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds)
+    await db.execute(text(
+        f"ALTER TABLE workflow ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ({bounds['lower']}) TO ({bounds['upper']})"
+    ))
+    logger.info("Создана секция %s, перенесено строк из %s: %s", name, DEFAULT_PARTITION, moved.rowcount)
+    return moved.rowcount
+
+
+async def archive_partition(db: AsyncSession, partition: Partition):
+    """Переносит секцию в архивное табличное пространство или отсоединяет её в архивную схему."""
+    if WORKFLOW_ARCHIVE_TABLESPACE:
+        tablespace = quote_identifier(WORKFLOW_ARCHIVE_TABLESPACE)
+        indexes = (await db.execute(PARTITION_INDEXES_QUERY, {'name': partition.name})).scalars().all()
+        await db.execute(text(f"ALTER TABLE {partition.name} SET TABLESPACE {tablespace}"))
+        for index in indexes:
+            await db.execute(text(f"ALTER INDEX {index} SET TABLESPACE {tablespace}"))
+        logger.info("Секция %s перенесена в табличное пространство %s", partition.name, tablespace)
+    else:
+        await db.execute(text(f"ALTER TABLE workflow DETACH PARTITION {partition.name}"))
+        await db.execute(text(f"ALTER TABLE {partition.name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        logger.info("Секция %s отсоединена в схему %s", partition.name, ARCHIVE_SCHEMA)
+
+
+async def maintain_workflow_partitions(db: AsyncSession, batch_size: int) -> int:
+    """
+    Создаёт недостающие секции текущего и `WORKFLOW_PARTITIONS_AHEAD` следующих месяцев
+    и архивирует не более `batch_size` секций старше `WORKFLOW_RETENTION_MONTHS` месяцев.
+
+    Возвращает число созданных и архивированных секций.
+    """
+    await db.execute(text(f"SET LOCAL lock_timeout = '{WORKFLOW_PARTITION_LOCK_TIMEOUT}'"))
+    partitions = await list_partitions(db)
+    current = month_start(datetime.now(timezone.utc))
+
+    processed = 0
+    for months in range(WORKFLOW_PARTITIONS_AHEAD + 1):
+        start = month_start(current, months)
+        if not is_covered(partitions, to_start_id(start)):
+            await create_partition(db, start)
+            processed += 1
+
+    if WORKFLOW_RETENTION_MONTHS <= 0:
+        return processed
+    cutoff = to_start_id(month_start(current, -WORKFLOW_RETENTION_MONTHS))
+    archived = 0
+    for partition in sorted(partitions, key=lambda p: (p.upper is None, p.upper)):
+        if archived >= batch_size or partition.upper is None or partition.upper > cutoff:
+            break
+        if WORKFLOW_ARCHIVE_TABLESPACE and partition.tablespace == WORKFLOW_ARCHIVE_TABLESPACE:
+            continue
+        await archive_partition(db, partition)
+        archived += 1
+    return processed + archived
@@ -0,0 +1,194 @@
+# app/profiling.py
+"""
+Модуль `profiling` измеряет каждый SQL-запрос, выполненный через движки приложения
+(основная база и реплика).
+
+Для каждого запроса:
+- обновляются метрики `kiosk_db_statements_total` и `kiosk_db_statement_duration_seconds`
+  (app/metrics.py);
+- если включён режим профилирования (`SQL_PROFILE=1`), запрос учитывается в профиле
+  текущего HTTP-запроса; количество и суммарное время возвращаются в заголовках ответа
+  `X-DB-Queries` и `X-DB-Time-ms` (см. app/middleware.py);
+- если запрос выполнялся дольше `SLOW_QUERY_MS` миллисекунд, он пишется в лог
+  `app_logger.slow_sql` в нормализованном виде (литералы заменены на `?`) вместе с
+  типами параметров, но без их значений.
+
+Бюджет запросов проверяется через `query_budget()` (вызовы внутри процесса) или
+`assert_query_budget()` (по заголовкам ответа), см. также benchmarks/query_budgets.py.
+Исходный текст и параметры запросов для EXPLAIN собирает `capture_statements()`
+(benchmarks/plan_check.py).
+"""
+import contextvars
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+
+from app.database import engines
+from app.metrics import db_statement_duration, db_statements_total, route_label
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+DB_QUERIES_HEADER = b"x-db-queries"
+DB_TIME_HEADER = b"x-db-time-ms"
+
+slow_query_logger = logging.getLogger("app_logger.slow_sql")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryProfile:
+    """
+    Профиль SQL-запросов одного HTTP-запроса (или блока `query_budget`).
+
+    Атрибуты:
+        count (int): Количество выполненных запросов.
+        seconds (float): Суммарное время выполнения.
+        statements (list): Нормализованный текст и длительность каждого запроса.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    @property
+    def milliseconds(self) -> float:
+        return round(self.seconds * 1000, 2)
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements.append((normalize_sql(statement), seconds))
+
+
+# Профиль текущего запроса; None — профилирование не ведётся
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+# Списки, открытые capture_statements(); общие для всех потоков процесса
+_statement_sinks = []
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Выполнено больше SQL-запросов, чем позволяет бюджет."""
+
+
+def normalize_sql(statement: str) -> str:
+    """Сводит SQL к одной строке и заменяет литералы на `?`, списки значений — на `(...)`."""
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    statement = _VALUE_LIST.sub("(...)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def parameters_shape(parameters) -> str:
+    """Типы параметров запроса без значений: `(int, str, NoneType)`, `[12 × (int, int)]`."""
+    if isinstance(parameters, list):
+        if not parameters:
+            return "[]"
+        return f"[{len(parameters)} × {parameters_shape(parameters[0])}]"
+    if isinstance(parameters, dict):
+        values = parameters.values()
+    elif isinstance(parameters, tuple):
+        values = parameters
+    else:
+        return type(parameters).__name__
+    return "(" + ", ".join(type(value).__name__ for value in values) + ")"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start_time"].pop()
+    route = route_label()
+    db_statements_total.inc(route)
+    db_statement_duration.observe(seconds, route)
+
+    profile = current_profile.get()
+    if profile is not None:
+        profile.record(statement, seconds)
+    for sink in _statement_sinks:
+        sink.append((route, statement, parameters))
+
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            "Медленный SQL-запрос (%.1f мс, маршрут %s): %s; параметры: %s",
+            seconds * 1000,
+            route,
+            normalize_sql(statement),
+            parameters_shape(parameters)
+        )
+
+
+for db_engine in engines:
+    event.listen(db_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(db_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def profile_headers(profile: QueryProfile) -> list:
+    """Заголовки ответа с количеством и временем SQL-запросов профиля."""
+    return [
+        (DB_QUERIES_HEADER, str(profile.count).encode("latin-1")),
+        (DB_TIME_HEADER, str(profile.milliseconds).encode("latin-1")),
+    ]
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """
+    Проверяет, что внутри блока выполнено не больше `max_queries` SQL-запросов.
+
+    Пример:
+        with query_budget(3) as profile:
+            await toggle_subscription(user_id, equipment_id, db)
+    """
+    profile = QueryProfile()
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+    if profile.count > max_queries:
+        raise QueryBudgetExceeded(
+            "Выполнено %d SQL-запросов при бюджете %d:\n%s" % (
+                profile.count,
+                max_queries,
+                "\n".join(statement for statement, _ in profile.statements)
+            )
+        )
+
+
+@contextmanager
+def capture_statements():
+    """
+    Собирает выполненные внутри блока SQL-запросы в виде (маршрут, текст, параметры).
+
+    Текст и параметры передаются драйверу как есть, поэтому запрос можно повторить
+    с EXPLAIN. Учитываются запросы всех потоков процесса, в том числе TestClient.
+    """
+    statements = []
+    _statement_sinks.append(statements)
+    try:
+        yield statements
+    finally:
+        _statement_sinks.remove(statements)
+
+
+def assert_query_budget(response, max_queries: int):
+    """Проверяет бюджет по заголовку `X-DB-Queries` ответа (нужен `SQL_PROFILE=1`)."""
+    value = response.headers.get(DB_QUERIES_HEADER.decode())
+    if value is None:
+        raise QueryBudgetExceeded("В ответе нет заголовка X-DB-Queries: включите SQL_PROFILE=1")
+    if int(value) > max_queries:
+        raise QueryBudgetExceeded(
+            "%s: выполнено %s SQL-запросов при бюджете %d" % (
+                response.request.url.path, value, max_queries
+            )
+        )
@@ -0,0 +1,149 @@
+# app/replica.py
+"""
+Модуль `replica` выбирает базу данных для чтения: основную или реплику.
+
+Если задан `DATABASE_REPLICA_URL` (app/database.py), списки для киосков (оборудование,
+журнал простоев, панель управления), аналитика и выгрузка читаются
+с реплики, а изменения (занятость оборудования, причины простоев, учёт попыток входа)
+и чтение перед ними выполняются на основной базе.
+
+Отставание реплики проверяется не чаще чем раз в `REPLICA_CHECK_INTERVAL` секунд
+запросом к самой реплике: если она применила всё полученное от основной базы,
+отставание равно нулю, иначе — времени с последней применённой транзакции
+(`pg_last_xact_replay_timestamp()`). Чтение уходит на основную базу, если:
+- реплика недоступна или не ответила за `REPLICA_CHECK_INTERVAL`;
+- отставание больше `REPLICA_MAX_LAG` секунд;
+- киоск сам изменял данные так недавно, что реплика могла их ещё не получить: время
+  последней записи хранится в сессии киоска (`mark_write()`), и киоск читает свои
+  изменения с основной базы.
+
+Параметры задаются переменными окружения:
+- `REPLICA_MAX_LAG` — допустимое отставание реплики, сек (по умолчанию 5);
+- `REPLICA_CHECK_INTERVAL` — период проверки отставания, сек (по умолчанию 1).
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import (
+    DATABASE_UNAVAILABLE_ERRORS, ReplicaSessionLocal, SessionLocal, replica_engine
+)
+from app.logging_config import logger
+from app.metrics import Counter, Gauge
+
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "1"))
+
+PRIMARY = "primary"
+REPLICA = "replica"
+# Время последней записи киоска (time.time()) в сессии
+LAST_WRITE_KEY = "last_write_at"
+
+# Отставание реплики в секундах; на основной базе (реплика не в режиме восстановления) — 0
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+READ_SESSIONS = {PRIMARY: SessionLocal, REPLICA: ReplicaSessionLocal or SessionLocal}
+
+db_reads_total = Counter(
+    "kiosk_db_reads_total",
+    "Выбор базы для чтения: target — primary или replica, reason — причина выбора",
+    ("target", "reason")
+)
+replica_lag_seconds = Gauge(
+    "kiosk_db_replica_lag_seconds", "Отставание реплики при последней проверке (-1 — недоступна)"
+)
+
+
+class ReplicaRouter:
+    """
+    Выбор базы для чтения по отставанию реплики и времени последней записи киоска.
+
+    Атрибуты:
+        max_lag (float): Допустимое отставание реплики в секундах.
+        check_interval (float): Период проверки отставания в секундах.
+        lag (Optional[float]): Отставание при последней проверке; None — реплика недоступна.
+    """
+
+    def __init__(self, max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None
+        self._checked_at = None
+        self._check = None
+
+    async def current_lag(self) -> Optional[float]:
+        """
+        Отставание реплики, проверенное не раньше чем `check_interval` секунд назад;
+        None — реплика недоступна или проверка не успела.
+        """
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self.lag
+        if self._check is None:
+            self._check = asyncio.ensure_future(self._check_lag())
+        try:
+            # Проверку разделяют одновременные запросы; она продолжается после таймаута
+            return await asyncio.wait_for(asyncio.shield(self._check), self.check_interval)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _check_lag(self) -> Optional[float]:
+        try:
+            async with ReplicaSessionLocal() as db:
+                async with db.begin():
+                    # NULL — реплика ещё не применила ни одной транзакции, отставание неизвестно
+                    lag = (await db.execute(REPLICA_LAG_QUERY)).scalar()
+        except DATABASE_UNAVAILABLE_ERRORS as error:
+            if self.lag is not None or self._checked_at is None:
+                logger.warning("Реплика недоступна, чтение переключено на основную базу: %r", error)
+            lag = None
+        finally:
+            self._check = None
+        self.lag = float(lag) if lag is not None else None
+        self._checked_at = time.monotonic()
+        replica_lag_seconds.set(self.lag if self.lag is not None else -1)
+        return self.lag
+
+    async def read_target(self, request: Request) -> str:
+        """База для чтения в запросе `request`: PRIMARY или REPLICA."""
+        if replica_engine is None:
+            return PRIMARY
+        lag = await self.current_lag()
+        if lag is None:
+            reason = "unavailable"
+        elif lag > self.max_lag:
+            reason = "lag"
+        else:
+            last_write_at = request.session.get(LAST_WRITE_KEY)
+            # Запись видна на реплике, если с неё прошло больше отставания с учётом
+            # того, что отставание могло вырасти после проверки
+            if last_write_at is not None and time.time() - last_write_at <= lag + self.check_interval:
+                reason = "recent_write"
+            else:
+                db_reads_total.inc(REPLICA, "replica")
+                return REPLICA
+        db_reads_total.inc(PRIMARY, reason)
+        return PRIMARY
+
+
+replica_router = ReplicaRouter(REPLICA_MAX_LAG, REPLICA_CHECK_INTERVAL)
+
+
+def read_session(target: str) -> AsyncSession:
+    """Новая сессия базы `target` (PRIMARY или REPLICA) для чтения."""
+    return READ_SESSIONS[target]()
+
+
+def mark_write(request: Request):
+    """Запоминает в сессии киоска время записи, чтобы киоск читал свои изменения."""
+    if replica_engine is not None:
+        request.session[LAST_WRITE_KEY] = time.time()
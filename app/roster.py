@@ -0,0 +1,188 @@
+# app/roster.py
+"""
+Модуль `roster` хранит списки операторов групп для страницы выбора пользователя.
+
+В крупных группах сотни операторов, и выводить их всех в список выбора на каждом
+киоске долго. Страница `/select-user` показывает только недавно входивших на этом
+киоске операторов (`RECENT_USERS_KEY` в сессии) и найденных по строке поиска:
+табельный номер или Ф.И.О. набираются в поле поиска, и киоск запрашивает
+`/select-user/search`.
+
+Список операторов группы (`users_groups`) загружается из основной базы один раз и
+хранится в памяти рабочего процесса вместе с индексом префиксов: поиск — двоичный
+поиск по отсортированным табельным номерам и словам Ф.И.О. без запроса к базе.
+Актуальность поддерживается так же, как у справочника причин (app/answers_cache.py):
+- триггер из миграции `0011_users_roster` публикует событие `roster_changed` с
+  группой, у которой изменился состав или имена операторов, и рабочие процессы
+  сбрасывают её список;
+- список в любом случае перечитывается не реже, чем раз в `ROSTER_CACHE_MAX_AGE` секунд.
+
+Параметры задаются переменными окружения:
+- `ROSTER_CACHE_GROUPS` — число групп в кэше, давно не запрашиваемые вытесняются
+  (по умолчанию 1000);
+- `ROSTER_CACHE_MAX_AGE` — срок жизни списка группы, сек (по умолчанию 300);
+- `USER_SEARCH_LIMIT` — сколько операторов возвращает поиск (по умолчанию 20);
+- `RECENT_USERS_LIMIT` — сколько недавних операторов помнит киоск (по умолчанию 8).
+"""
+import bisect
+import os
+import time
+from collections import OrderedDict, namedtuple
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+
+from app.coalesce import request_flights
+from app.database import SessionLocal
+from app.events import event_broker
+from app.logging_config import logger
+from app.versions import GROUP_SCOPE
+
+ROSTER_CACHE_GROUPS = int(os.getenv("ROSTER_CACHE_GROUPS", "1000"))
+ROSTER_CACHE_MAX_AGE = int(os.getenv("ROSTER_CACHE_MAX_AGE", "300"))
+USER_SEARCH_LIMIT = int(os.getenv("USER_SEARCH_LIMIT", "20"))
+RECENT_USERS_LIMIT = int(os.getenv("RECENT_USERS_LIMIT", "8"))
+
+# Табельные номера недавно входивших на киоске операторов в сессии, последний — первым
+RECENT_USERS_KEY = "recent_users"
+
+ROSTER_QUERY = text("""
+    SELECT users.user_name, users.user_full_name
+    FROM users
+    JOIN users_groups ON users.user_id = users_groups.user_id
+    WHERE users_groups.group_id = :group_id
+    ORDER BY users.user_name
+""")
+
+# Список группы и момент его загрузки (time.monotonic())
+RosterEntry = namedtuple("RosterEntry", "roster loaded_at")
+
+
+def search_key(value: Optional[str]) -> str:
+    """Строка для сравнения без учёта регистра и различия «е» и «ё»."""
+    return " ".join((value or "").casefold().replace("ё", "е").split())
+
+
+class Roster:
+    """
+    Операторы одной группы с индексом префиксов.
+
+    Атрибуты:
+        users (list): Операторы по табельному номеру: `user_name`, `user_full_name`.
+    """
+
+    def __init__(self, users: List[dict]):
+        self.users = users
+        self._by_name = {user['user_name']: user for user in users}
+        # Ключи поиска: табельный номер, Ф.И.О. целиком и каждое слово Ф.И.О.
+        index = set()
+        for position, user in enumerate(users):
+            full_name = search_key(user['user_full_name'])
+            index.add((search_key(user['user_name']), position))
+            index.add((full_name, position))
+            index.update((word, position) for word in full_name.split())
+        index = sorted(index)
+        self._keys = [key for key, _ in index]
+        self._positions = [position for _, position in index]
+
+    def search(self, query: str, limit: int = USER_SEARCH_LIMIT) -> List[dict]:
+        """
+        Операторы, табельный номер или слово Ф.И.О. которых начинается с `query`,
+        по табельному номеру; не более `limit`, на одного больше — признак того,
+        что найдены не все.
+        """
+        prefix = search_key(query)
+        if not prefix:
+            return []
+        found = set()
+        start = bisect.bisect_left(self._keys, prefix)
+        for key, position in zip(self._keys[start:], self._positions[start:]):
+            if not key.startswith(prefix):
+                break
+            found.add(position)
+            if len(found) > limit:
+                break
+        return [self.users[position] for position in sorted(found)]
+
+    def find(self, user_names: List[str]) -> List[dict]:
+        """Операторы группы из списка `user_names` в его порядке."""
+        return [self._by_name[name] for name in user_names if name in self._by_name]
+
+
+class RosterCache:
+    """
+    Кэш списков операторов групп.
+
+    Атрибуты:
+        max_groups (int): Число групп в кэше.
+        max_age (int): Срок жизни списка группы в секундах.
+    """
+
+    def __init__(self, max_groups: int = ROSTER_CACHE_GROUPS, max_age: int = ROSTER_CACHE_MAX_AGE):
+        self.max_groups = max_groups
+        self.max_age = max_age
+        self._rosters = OrderedDict()
+        # Счётчик сбросов: загрузка, во время которой был сброс, не сохраняется
+        self._resets = 0
+
+    async def get(self, group_id: int) -> Roster:
+        """Операторы группы `group_id` из кэша или из базы данных."""
+        entry = self._rosters.get(group_id)
+        if entry is not None and time.monotonic() - entry.loaded_at < self.max_age:
+            self._rosters.move_to_end(group_id)
+            return entry.roster
+        return await request_flights.run(
+            ("roster", GROUP_SCOPE, group_id), lambda: self.load(group_id)
+        )
+
+    async def load(self, group_id: int) -> Roster:
+        """Перечитывает операторов группы из базы данных."""
+        resets = self._resets
+        # Основная база: после уведомления `roster_changed` реплика могла ещё не получить изменения
+        async with SessionLocal() as db:
+            async with db.begin():
+                rows = (await db.execute(ROSTER_QUERY, {"group_id": group_id})).all()
+
+        roster = Roster([
+            {"user_name": row.user_name, "user_full_name": row.user_full_name} for row in rows
+        ])
+        if resets == self._resets:
+            self._rosters[group_id] = RosterEntry(roster, time.monotonic())
+            self._rosters.move_to_end(group_id)
+            if len(self._rosters) > self.max_groups:
+                self._rosters.popitem(last=False)
+        logger.info("Список операторов группы %s загружен: %d", group_id, len(roster.users))
+        return roster
+
+    def invalidate(self, event: Optional[dict] = None):
+        """
+        Сбрасывает список группы события; событие без группы сбрасывает все списки.
+        Следующий запрос перечитает его.
+        """
+        logger.info("Список операторов сброшен: %s", event)
+        self._resets += 1
+        group_id = (event or {}).get("group_id")
+        if group_id is None:
+            self._rosters.clear()
+        else:
+            self._rosters.pop(group_id, None)
+            request_flights.invalidate(GROUP_SCOPE, {group_id})
+
+
+def recent_users(request: Request) -> List[str]:
+    """Табельные номера недавно входивших на киоске операторов."""
+    return request.session.get(RECENT_USERS_KEY) or []
+
+
+def remember_user(request: Request, user_name: str):
+    """Ставит оператора первым в список недавних операторов киоска."""
+    names = [name for name in recent_users(request) if name != user_name]
+    request.session[RECENT_USERS_KEY] = [user_name] + names[:RECENT_USERS_LIMIT - 1]
+
+
+roster_cache = RosterCache()
+# Сброс во всех рабочих процессах по уведомлению из базы данных, а также после
+# переподключения LISTEN-соединения, когда уведомления могли быть потеряны
+event_broker.add_handler("roster_changed", roster_cache.invalidate)
+event_broker.add_handler("resync", roster_cache.invalidate)
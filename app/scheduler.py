@@ -0,0 +1,208 @@
+# app/scheduler.py
+"""
+Модуль `scheduler` выполняет периодические фоновые задачи в рабочих процессах приложения.
+
+Планировщик запускается в каждом рабочем процессе, но каждый запуск задачи выполняется
+только одним из них: перед запуском процесс берёт рекомендательную блокировку
+`pg_try_advisory_xact_lock(SCHEDULER_LOCK_CLASS, ключ задачи)`. Если блокировку держит
+другой процесс, запуск пропускается. Блокировка живёт до конца транзакции, поэтому не
+остаётся на соединении пула.
+
+Задача обрабатывает данные порциями: одна порция — одна транзакция. Пока задача
+сообщает, что обработала полную порцию, следующая запускается сразу, иначе — через
+интервал задачи.
+
+Задачи:
+- `expire_subscriptions` — снимает занятость оборудования, у которой истёк срок
+  `subscribe_time + minutes_to_live` минут, и сообщает об этом киоскам.
+- `maintain_workflow_partitions` — создаёт секции журнала простоев на следующие месяцы
+  и архивирует старые (app/partitions.py);
+- `advance_downtime_rollup` — сворачивает простои в часовые и месячные сводки для
+  аналитики (app/analytics.py).
+
+Параметры задаются переменными окружения:
+- `SCHEDULER_ENABLED` — запускать планировщик (1, по умолчанию) или нет (0);
+- `SUBSCRIPTION_EXPIRY_INTERVAL` — интервал проверки занятости, сек (по умолчанию 60);
+- `SUBSCRIPTION_EXPIRY_BATCH` — сколько подписок снимать за одну транзакцию (по умолчанию 500).
+- `WORKFLOW_PARTITION_INTERVAL` — интервал обслуживания секций workflow, сек (по умолчанию 3600);
+- `WORKFLOW_ARCHIVE_BATCH` — сколько секций архивировать за одну транзакцию (по умолчанию 1).
+"""
+import asyncio
+import os
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.analytics import ROLLUP_BATCH_HOURS, ROLLUP_INTERVAL, advance_downtime_rollup
+from app.database import SessionLocal
+from app.events import EVENTS_CHANNEL
+from app.locks import SCHEDULER_LOCK_CLASS, TOGGLE_LOCK_CLASS
+from app.logging_config import logger
+from app.metrics import Counter
+from app.partitions import maintain_workflow_partitions
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SUBSCRIPTION_EXPIRY_INTERVAL = float(os.getenv("SUBSCRIPTION_EXPIRY_INTERVAL", "60"))
+SUBSCRIPTION_EXPIRY_BATCH = int(os.getenv("SUBSCRIPTION_EXPIRY_BATCH", "500"))
+WORKFLOW_PARTITION_INTERVAL = float(os.getenv("WORKFLOW_PARTITION_INTERVAL", "3600"))
+WORKFLOW_ARCHIVE_BATCH = int(os.getenv("WORKFLOW_ARCHIVE_BATCH", "1"))
+
+JOB_LOCK_QUERY = text("SELECT pg_try_advisory_xact_lock(:lock_class, :job_key)")
+
+scheduler_runs_total = Counter(
+    "kiosk_scheduler_runs_total", "Запуски фоновых задач", ("job", "result")
+)
+scheduler_rows_total = Counter(
+    "kiosk_scheduler_rows_total", "Строки, обработанные фоновыми задачами", ("job",)
+)
+
+
+class PeriodicJob:
+    """
+    Периодическая задача планировщика.
+
+    Атрибуты:
+        name (str): Имя задачи для логов и метрик.
+        key (int): Ключ рекомендательной блокировки задачи.
+        interval (float): Пауза между запусками, сек.
+        batch_size (int): Размер порции, передаётся в функцию задачи.
+        func: Корутина `func(db, batch_size) -> int`, возвращающая число обработанных строк.
+    """
+
+    def __init__(self, name: str, key: int, interval: float, batch_size: int, func):
+        self.name = name
+        self.key = key
+        self.interval = interval
+        self.batch_size = batch_size
+        self.func = func
+
+
+class Scheduler:
+    """Запускает периодические задачи в фоне рабочего процесса."""
+
+    def __init__(self):
+        self.jobs = []
+        self._tasks = []
+
+    def add_job(self, job: PeriodicJob):
+        """Регистрирует задачу; задачи запускаются вызовом `start()`."""
+        self.jobs.append(job)
+
+    async def run_batch(self, job: PeriodicJob):
+        """
+        Выполняет одну порцию задачи под блокировкой.
+
+        Возвращает число обработанных строк или None, если задачу сейчас выполняет
+        другой рабочий процесс.
+        """
+        async with SessionLocal() as db:
+            async with db.begin():
+                locked = await db.execute(
+                    JOB_LOCK_QUERY, {'lock_class': SCHEDULER_LOCK_CLASS, 'job_key': job.key}
+                )
+                if not locked.scalar():
+                    return None
+                return await job.func(db, job.batch_size)
+
+    async def run_job(self, job: PeriodicJob) -> int:
+        """Выполняет задачу порциями, пока очередная порция заполнена целиком."""
+        total = 0
+        while True:
+            processed = await self.run_batch(job)
+            if processed is None:
+                scheduler_runs_total.inc(job.name, "skipped")
+                return total
+            total += processed
+            scheduler_rows_total.inc(job.name, amount=processed)
+            if processed < job.batch_size:
+                scheduler_runs_total.inc(job.name, "success")
+                return total
+
+    async def _run_forever(self, job: PeriodicJob):
+        while True:
+            try:
+                total = await self.run_job(job)
+                if total:
+                    logger.info("Фоновая задача %s обработала строк: %s", job.name, total)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001 - задача повторится через интервал
+                scheduler_runs_total.inc(job.name, "error")
+                logger.error("Ошибка фоновой задачи %s: %s", job.name, exc)
+            await asyncio.sleep(job.interval)
+
+    def start(self):
+        """Запускает все задачи, если планировщик включён."""
+        if not SCHEDULER_ENABLED or self._tasks:
+            return
+        for job in self.jobs:
+            self._tasks.append(asyncio.create_task(self._run_forever(job), name=job.name))
+        logger.info("Планировщик запущен, задач: %s", len(self._tasks))
+
+    async def stop(self):
+        """Останавливает задачи."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+# Просроченная занятость снимается в порядке истечения срока. Оборудование, которое
+# сейчас переключают (блокировка toggle_equipment), пропускается до следующего запуска.
+EXPIRE_SUBSCRIPTIONS_QUERY = text("""
+    WITH batch AS MATERIALIZED (
+        SELECT id, equipment_id
+        FROM alerts_subscription
+        WHERE active = TRUE
+          AND subscribe_time + minutes_to_live * interval '1 minute' < timezone('utc', now())
+        ORDER BY subscribe_time + minutes_to_live * interval '1 minute'
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    -- Блокировки переключения берутся только для оборудования порции: условие в batch
+    -- проверялось бы для всех просроченных строк до сортировки
+    overdue AS (
+        SELECT id
+        FROM batch
+        WHERE pg_try_advisory_xact_lock(:lock_class, equipment_id)
+    ),
+    expired AS (
+        UPDATE alerts_subscription a
+        SET active = FALSE, unsubscribe_time = timezone('utc', now())
+        FROM overdue
+        WHERE a.id = overdue.id
+        RETURNING a.equipment_id
+    )
+    SELECT x.equipment_id, pg_notify(:channel, json_build_object(
+        'type', 'occupancy',
+        'group_id', e.group_id,
+        'equipment_id', x.equipment_id,
+        'active', FALSE,
+        'user_name', NULL
+    )::text)
+    FROM expired x
+    LEFT JOIN equipment e ON e.equipment_id = x.equipment_id
+""")
+
+
+async def expire_subscriptions(db: AsyncSession, batch_size: int) -> int:
+    """Снимает порцию просроченной занятости и тем же запросом публикует события `occupancy`."""
+    result = await db.execute(
+        EXPIRE_SUBSCRIPTIONS_QUERY,
+        {'lock_class': TOGGLE_LOCK_CLASS, 'batch_size': batch_size, 'channel': EVENTS_CHANNEL}
+    )
+    return len(result.all())
+
+
+scheduler = Scheduler()
+scheduler.add_job(PeriodicJob(
+    "expire_subscriptions", 1, SUBSCRIPTION_EXPIRY_INTERVAL, SUBSCRIPTION_EXPIRY_BATCH,
+    expire_subscriptions
+))
+scheduler.add_job(PeriodicJob(
+    "maintain_workflow_partitions", 2, WORKFLOW_PARTITION_INTERVAL, WORKFLOW_ARCHIVE_BATCH,
+    maintain_workflow_partitions
+))
+scheduler.add_job(PeriodicJob(
+    "advance_downtime_rollup", 3, ROLLUP_INTERVAL, ROLLUP_BATCH_HOURS, advance_downtime_rollup
+))
@@ -0,0 +1,166 @@
+# app/security.py
+"""
+Модуль `security` содержит проверку паролей и ограничение попыток входа.
+
+Хэши паролей (PBKDF2/scrypt) вычисляются десятки и сотни миллисекунд. Чтобы не
+блокировать цикл событий, проверка выполняется в отдельном ограниченном пуле потоков
+(hashlib освобождает GIL на время вычисления). Очередь проверок тоже ограничена:
+при её переполнении попытка входа отклоняется сразу.
+
+Попытки входа ограничиваются на двух уровнях, и оба срабатывают до вычисления хэша:
+- по пользователю — счётчик `users.bad_tries` в базе данных, общий для всех рабочих процессов;
+  для табельных номеров, которых нет в группе, такой же счётчик ведётся в памяти рабочего
+  процесса, чтобы ответ о блокировке не выдавал, существует ли пользователь;
+- по IP-адресу киоска — счётчик неудачных попыток в памяти рабочего процесса.
+Счётчики в памяти, по которым давно не было неудач, периодически удаляются.
+
+Параметры задаются переменными окружения:
+- `PASSWORD_HASH_WORKERS` — число потоков проверки паролей;
+- `PASSWORD_HASH_QUEUE` — сколько проверок может ждать своей очереди;
+- `LOGIN_MAX_BAD_TRIES`, `LOGIN_LOCKOUT_SECONDS` — блокировка пользователя;
+- `LOGIN_IP_MAX_FAILURES`, `LOGIN_IP_WINDOW_SECONDS` — блокировка IP-адреса.
+"""
+import asyncio
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash
+
+from app.logging_config import logger
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+LOGIN_MAX_BAD_TRIES = int(os.getenv("LOGIN_MAX_BAD_TRIES", "5"))
+LOGIN_LOCKOUT_SECONDS = int(os.getenv("LOGIN_LOCKOUT_SECONDS", "300"))
+# С одного киоска входят многие операторы, поэтому считаются только неудачные попытки
+LOGIN_IP_MAX_FAILURES = int(os.getenv("LOGIN_IP_MAX_FAILURES", "20"))
+LOGIN_IP_WINDOW_SECONDS = int(os.getenv("LOGIN_IP_WINDOW_SECONDS", "60"))
+
+_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_pending_checks = 0
+
+
+class PasswordCheckOverloaded(Exception):
+    """Очередь проверки паролей переполнена."""
+
+
+async def verify_password(password_hash: str, password: str) -> bool:
+    """
+    Проверяет пароль по хэшу в пуле потоков, не блокируя цикл событий.
+
+    Вызывает PasswordCheckOverloaded, если проверок в очереди больше, чем
+    PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE.
+    """
+    global _pending_checks
+    if not password_hash:
+        return False
+    if _pending_checks >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE:
+        logger.warning("Очередь проверки паролей переполнена: %s", _pending_checks)
+        raise PasswordCheckOverloaded()
+    _pending_checks += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _hash_executor, check_password_hash, password_hash, password
+        )
+    finally:
+        _pending_checks -= 1
+
+
+class FailureLimiter:
+    """
+    Счётчик неудачных попыток по ключу в скользящем окне.
+
+    Атрибуты:
+        max_failures (int): Допустимое число неудач в окне.
+        window (int): Длина окна в секундах.
+    """
+
+    def __init__(self, max_failures: int, window: int):
+        self.max_failures = max_failures
+        self.window = window
+        # Для блокировки достаточно последних max_failures неудач
+        self._failures = defaultdict(lambda: deque(maxlen=max_failures))
+        self._swept_at = time.monotonic()
+
+    def _prune(self, key: str, now: float):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def is_blocked(self, key: str) -> bool:
+        """Исчерпан ли лимит неудачных попыток для ключа."""
+        failures = self._prune(key, time.monotonic())
+        return failures is not None and len(failures) >= self.max_failures
+
+    def register_failure(self, key: str):
+        """Учитывает неудачную попытку для ключа."""
+        now = time.monotonic()
+        self._sweep(now)
+        self._prune(key, now)
+        self._failures[key].append(now)
+
+    def _sweep(self, now: float):
+        """Раз в окно удаляет ключи без неудач в окне: адреса, которые больше не входят."""
+        if now - self._swept_at < self.window:
+            return
+        self._swept_at = now
+        for key in list(self._failures):
+            self._prune(key, now)
+
+
+class BadTriesLimiter:
+    """
+    Счётчик неудачных попыток подряд по ключу с блокировкой на `lockout` секунд после
+    последней неудачи — те же правила, что у `users.bad_tries` (app/main.py).
+
+    Атрибуты:
+        max_bad_tries (int): Число неудач подряд до блокировки.
+        lockout (int): Длительность блокировки в секундах; после неё счёт начинается заново.
+    """
+
+    def __init__(self, max_bad_tries: int, lockout: int):
+        self.max_bad_tries = max_bad_tries
+        self.lockout = lockout
+        # Ключ -> (число неудач, время последней неудачи)
+        self._tries = {}
+        self._swept_at = time.monotonic()
+
+    def _current(self, key: str, now: float) -> int:
+        tries = self._tries.get(key)
+        if tries is None or now - tries[1] >= self.lockout:
+            return 0
+        return tries[0]
+
+    def is_blocked(self, key: str) -> bool:
+        """Заблокирован ли ключ."""
+        return self._current(key, time.monotonic()) >= self.max_bad_tries
+
+    def register_failure(self, key: str):
+        """Учитывает неудачную попытку для ключа."""
+        now = time.monotonic()
+        self._sweep(now)
+        self._tries[key] = (self._current(key, now) + 1, now)
+
+    def _sweep(self, now: float):
+        """Раз в `lockout` секунд удаляет ключи, блокировка которых истекла."""
+        if now - self._swept_at < self.lockout:
+            return
+        self._swept_at = now
+        for key in [k for k, (_, last) in self._tries.items() if now - last >= self.lockout]:
+            del self._tries[key]
+
+
+ip_login_limiter = FailureLimiter(LOGIN_IP_MAX_FAILURES, LOGIN_IP_WINDOW_SECONDS)
+# Табельные номера, которых нет в группе входа
+unknown_user_limiter = BadTriesLimiter(LOGIN_MAX_BAD_TRIES, LOGIN_LOCKOUT_SECONDS)
@@ -0,0 +1,185 @@
+# app/stale_cache.py
+"""
+Модуль `stale_cache` хранит последние удачные снимки данных панели управления, чтобы
+киоски продолжали работать, пока база данных перезапускается или отвечает медленно.
+
+Снимки (страница оборудования с занятостью, данные первой отрисовки панели, страницы
+журнала простоев) хранятся в памяти рабочего процесса по областям — группе или станку.
+Каждый запрос сначала обновляет снимок загрузкой из базы (общей для одновременных
+запросов, app/coalesce.py):
+- загрузка успела за `STALE_CACHE_WAIT_MS` — отдаются свежие данные;
+- не успела — отдаётся прежний снимок с отметкой устаревания, а загрузка продолжается
+  в фоне и обновит снимок для следующих запросов;
+- завершилась ошибкой соединения или таймаутом базы данных — отдаётся прежний снимок.
+Загрузки для разных версий данных не объединяются, а снимок более старой версии не
+заменяет более новый: после изменения запрос не получит данные, загруженные до него.
+Снимки старше `STALE_CACHE_MAX_AGE` секунд не отдаются. Без снимка запрос ждёт загрузку
+и получает её ошибку, как и без кэша.
+
+Короткое чтение перед загрузкой — версия данных для ответа 304 — защищается так же
+(`read_or_stale()`): если оно не успело или завершилось ошибкой, отдаётся прежний снимок.
+
+Память ограничена: не более `STALE_CACHE_AREAS` областей (давно не запрашиваемые
+вытесняются) и `STALE_CACHE_ENTRIES` снимков в каждой.
+
+Параметры задаются переменными окружения:
+- `STALE_CACHE_WAIT_MS` — сколько ждать загрузку при наличии снимка (по умолчанию 1000);
+- `STALE_CACHE_MAX_AGE` — предельный возраст отдаваемого снимка, сек (по умолчанию 3600);
+- `STALE_CACHE_AREAS` — число групп и станков в кэше (по умолчанию 1000);
+- `STALE_CACHE_ENTRIES` — число снимков одной группы или станка (по умолчанию 32).
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, namedtuple
+from typing import Awaitable, Callable, Optional
+
+from app.coalesce import request_flights
+from app.database import DATABASE_UNAVAILABLE_ERRORS
+from app.logging_config import logger
+from app.metrics import Counter, Gauge
+
+STALE_CACHE_WAIT_MS = int(os.getenv("STALE_CACHE_WAIT_MS", "1000"))
+STALE_CACHE_MAX_AGE = int(os.getenv("STALE_CACHE_MAX_AGE", "3600"))
+STALE_CACHE_AREAS = int(os.getenv("STALE_CACHE_AREAS", "1000"))
+STALE_CACHE_ENTRIES = int(os.getenv("STALE_CACHE_ENTRIES", "32"))
+
+# Снимок: данные, момент загрузки (time.time()) и версия данных, для которой он загружен
+Snapshot = namedtuple("Snapshot", "value loaded_at version")
+
+stale_cache_requests_total = Counter(
+    "kiosk_stale_cache_requests_total",
+    "Запросы к кэшу снимков: fresh — свежие данные при наличии снимка, miss — снимка нет, "
+    "stale_slow и stale_error — отдан прежний снимок из-за медленной загрузки или ошибки",
+    ("name", "result")
+)
+stale_cache_entries = Gauge("kiosk_stale_cache_entries", "Снимки в кэше")
+
+
+class StaleCache:
+    """
+    Кэш последних удачных снимков с выдачей устаревших данных при сбоях базы.
+
+    Атрибуты:
+        wait (float): Сколько секунд ждать загрузку при наличии снимка.
+        max_age (float): Предельный возраст отдаваемого снимка в секундах.
+        max_areas (int): Число областей (групп, станков) в кэше.
+        max_entries (int): Число снимков одной области.
+    """
+
+    def __init__(self, wait: float, max_age: float, max_areas: int, max_entries: int):
+        self.wait = wait
+        self.max_age = max_age
+        self.max_areas = max_areas
+        self.max_entries = max_entries
+        self._areas = OrderedDict()
+        self._size = 0
+
+    def peek(self, scope: str, scope_id: int, key: tuple) -> Optional[Snapshot]:
+        """Снимок по ключу `key` области (`scope`, `scope_id`) без учёта возраста."""
+        entries = self._areas.get((scope, scope_id))
+        return entries.get(key) if entries is not None else None
+
+    def _store(self, scope: str, scope_id: int, key: tuple, value, version: Optional[int] = None):
+        area = (scope, scope_id)
+        entries = self._areas.get(area)
+        current = entries.get(key) if entries is not None else None
+        # Загрузка старой версии, завершившаяся позже загрузки новой
+        if (current is not None and version is not None and current.version is not None
+                and version < current.version):
+            return
+        if entries is None:
+            entries = self._areas[area] = OrderedDict()
+            if len(self._areas) > self.max_areas:
+                _, evicted = self._areas.popitem(last=False)
+                self._size -= len(evicted)
+        self._areas.move_to_end(area)
+        if key not in entries:
+            self._size += 1
+        entries[key] = Snapshot(value, time.time(), version)
+        entries.move_to_end(key)
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self._size -= 1
+        stale_cache_entries.set(self._size)
+
+    def _usable(self, scope: str, scope_id: int, key: tuple) -> Optional[Snapshot]:
+        """Снимок по ключу, если он не старше `max_age`."""
+        snapshot = self.peek(scope, scope_id, key)
+        if snapshot is not None and time.time() - snapshot.loaded_at > self.max_age:
+            return None
+        return snapshot
+
+    def _stale(self, scope: str, scope_id: int, key: tuple, snapshot: Snapshot,
+               error: BaseException, slow: bool) -> tuple:
+        """Прежний снимок и его возраст вместо данных, которые не удалось прочитать."""
+        stale_cache_requests_total.inc(key[0], "stale_slow" if slow else "stale_error")
+        age = time.time() - snapshot.loaded_at
+        logger.warning(
+            "Отдан снимок %s %s %s возрастом %.1f с: %s",
+            key[0], scope, scope_id, age, "загрузка не успела" if slow else repr(error)
+        )
+        return snapshot.value, age
+
+    async def read_or_stale(self, scope: str, scope_id: int, key: tuple,
+                            read: Callable[[], Awaitable]) -> tuple:
+        """
+        Результат `read()` и None либо None и пара (прежний снимок, возраст в секундах),
+        если снимок по ключу `key` есть, а чтение завершилось ошибкой базы данных или не
+        успело за `wait`. Без снимка ошибка чтения передаётся вызывающему.
+        """
+        snapshot = self._usable(scope, scope_id, key)
+        if snapshot is None:
+            return await read(), None
+        task = asyncio.ensure_future(read())
+        # Ошибку чтения, завершившегося после таймаута, уже никто не ждёт
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.wait), None
+        except DATABASE_UNAVAILABLE_ERRORS as error:
+            slow = isinstance(error, asyncio.TimeoutError) and not task.done()
+            return None, self._stale(scope, scope_id, key, snapshot, error, slow)
+
+    async def get(self, scope: str, scope_id: int, key: tuple,
+                  load: Callable[[Optional[object]], Awaitable],
+                  version: Optional[int] = None) -> tuple:
+        """
+        Данные по ключу `key` области (`scope`, `scope_id`) и возраст в секундах, если
+        отдан прежний снимок (None — данные свежие).
+
+        `load(previous)` загружает данные из базы; `previous` — значение прежнего снимка
+        (или None), которое загрузка может вернуть, если данные не изменились.
+        `version` — версия данных, прочитанная перед загрузкой: загрузка, начатая для
+        другой версии, не используется повторно.
+        """
+        snapshot = self._usable(scope, scope_id, key)
+        previous = snapshot.value if snapshot is not None else None
+        task, started = request_flights.start(
+            ("snapshot", scope, scope_id) + key + (version,), lambda: load(previous)
+        )
+        if started:
+            task.add_done_callback(
+                lambda done: self._on_loaded(scope, scope_id, key, version, done)
+            )
+
+        if snapshot is None:
+            stale_cache_requests_total.inc(key[0], "miss")
+            return await asyncio.shield(task), None
+        try:
+            value = await asyncio.wait_for(asyncio.shield(task), self.wait)
+        except DATABASE_UNAVAILABLE_ERRORS as error:
+            slow = isinstance(error, asyncio.TimeoutError) and not task.done()
+            return self._stale(scope, scope_id, key, snapshot, error, slow)
+        stale_cache_requests_total.inc(key[0], "fresh")
+        return value, None
+
+    def _on_loaded(self, scope: str, scope_id: int, key: tuple, version: Optional[int],
+                   task: asyncio.Task):
+        """Сохраняет результат удачной загрузки, в том числе завершившейся в фоне."""
+        if not task.cancelled() and task.exception() is None:
+            self._store(scope, scope_id, key, task.result(), version)
+
+
+snapshot_cache = StaleCache(
+    STALE_CACHE_WAIT_MS / 1000, STALE_CACHE_MAX_AGE, STALE_CACHE_AREAS, STALE_CACHE_ENTRIES
+)
@@ -0,0 +1,42 @@
+# app/versions.py
+"""
+Модуль `versions` вычисляет ETag ответов киоска по счётчикам изменений.
+
+Счётчики `kiosk_versions` увеличивают триггеры базы данных (миграция 0005_kiosk_versions) при
+любых изменениях занятости, оборудования и журнала простоев — и из приложения, и от
+сборщика данных. Чтение счётчика — один запрос по первичному ключу, поэтому при
+совпадении `If-None-Match` маршрут отвечает 304, не выполняя запросы списков.
+
+Счётчик читается до выборки данных: если данные изменились между двумя запросами,
+клиент получит новые данные со старым ETag и при следующем запросе просто загрузит
+их ещё раз.
+"""
+import hashlib
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+GROUP_SCOPE = "group"
+EQUIPMENT_SCOPE = "equipment"
+
+VERSION_QUERY = text("""
+    SELECT COALESCE(
+        (SELECT version FROM kiosk_versions WHERE scope = :scope AND scope_id = :scope_id),
+        0
+    )
+""")
+
+
+async def get_version(db: AsyncSession, scope: str, scope_id: int) -> int:
+    """Текущая версия данных группы или оборудования (0 — изменений ещё не было)."""
+    result = await db.execute(VERSION_QUERY, {'scope': scope, 'scope_id': scope_id})
+    return result.scalar()
+
+
+def make_etag(scope: str, scope_id: int, version: int, *variant) -> str:
+    """
+    Сильный ETag представления: область, идентификатор и версия данных плюс
+    параметры запроса (`variant`), от которых зависит содержимое ответа.
+    """
+    digest = hashlib.sha256(repr(variant).encode()).hexdigest()[:12]
+    return f'"{scope}-{scope_id}-{version}-{digest}"'
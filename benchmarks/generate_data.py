@@ -0,0 +1,374 @@
+# benchmarks/generate_data.py
+"""
+Генератор синтетических данных мониторинга в объёме рабочей базы.
+
+Заполняет справочники (`groups`, `answers_categories`, `answers_list`), оборудование,
+пользователей с привязкой к группам, журнал простоев `workflow` и историю занятости
+`alerts_subscription`. Столбцы и их порядок берутся из определений таблиц в
+app/models.py: генератор строит словари значений, а `copy_rows` проверяет их по модели
+и загружает через COPY (`asyncpg.copy_records_to_table`) порциями по `--batch-size`
+строк. В памяти находится одна порция и простои одного станка, поэтому расход памяти
+не зависит от объёма данных.
+
+Распределения:
+- группы образуют дерево до трёх уровней (цех — участок — линия), оборудование
+  распределено по группам неравномерно (распределение Парето);
+- число простоев станка — логнормальное вокруг `--workflow / --equipment`; длительность
+  простоя логнормальная (медиана 5 минут, хвост — часы), время работы между простоями
+  экспоненциальное; у части станков последний простой ещё не закрыт (`stop_id` NULL);
+- свежие простои (последние двое суток) чаще без причины, причины выбираются по
+  закону Ципфа: несколько причин покрывают большую часть простоев;
+- занятость: по сменам из 8 часов, оператор из группы станка; в текущей смене часть
+  оборудования занята (не более одной активной подписки на станок).
+
+Данные полностью определяются параметрами запуска (`--seed`, количества и `--end`):
+случайные значения каждого станка берутся из отдельного генератора, зависящего от
+`--seed` и номера станка, поэтому не зависят от `--batch-size`. По умолчанию `--end` —
+начало текущего часа UTC (текущая занятость ещё не истекла); для воспроизводимых
+замеров задавайте его явно.
+
+Перед загрузкой таблицы очищаются (TRUNCATE), поэтому непустую базу скрипт заполняет
+только с флагом `--truncate`. Пользовательские триггеры таблиц на время загрузки
+отключаются: события киоска и счётчики изменений для исторических данных не нужны.
+Сводки простоев тоже очищаются; их заново строит фоновая задача `advance_downtime_rollup`.
+Замыкание иерархии групп (`group_closure`) строится после загрузки.
+
+Запуск из корня репозитория (база данных из app/database.py, схема — `alembic upgrade head`):
+    python -m benchmarks.generate_data --seed 1 --end 2026-10-01T08:00 --truncate
+    python -m benchmarks.generate_data --groups 20 --equipment 200 --users 100 --workflow 2000000
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import math
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+from sqlalchemy.engine import make_url
+from werkzeug.security import generate_password_hash
+
+from app.database import DATABASE_URL
+from app.models import (
+    AlertsSubscription, AnswersCategory, AnswersList, DowntimeRollupHourly, DowntimeRollupMonthly,
+    Equipment, Group, KioskVersion, RollupWatermark, User, UsersGroup, Workflow
+)
+
+# Причины простоев по категориям; порядок задаёт частоту (закон Ципфа)
+ANSWERS = {
+    "Организационные": ["Нет оператора", "Нет задания", "Ожидание материала", "Обед", "Пересменка"],
+    "Технические": ["Поломка", "Ремонт инструмента", "Нет электроэнергии", "Нет воздуха"],
+    "Наладка": ["Переналадка", "Наладка после ремонта", "Смена инструмента"],
+    "Плановые": ["Плановое обслуживание", "Уборка рабочего места"],
+    "Качество": ["Проверка ОТК", "Брак заготовки"],
+}
+ANSWER_COLORS = ["#BDF4A8", "#F4E3A8", "#F4B8A8", "#A8D8F4", "#D8A8F4"]
+LAST_NAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов",
+              "Михайлов", "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев"]
+FIRST_NAMES = ["Александр", "Сергей", "Дмитрий", "Андрей", "Алексей", "Максим", "Иван",
+               "Евгений", "Михаил", "Николай", "Ольга", "Елена", "Татьяна", "Наталья"]
+
+GROUP_LEVELS = 3
+SHIFT_HOURS = 8
+SUBSCRIPTION_MINUTES_TO_LIVE = 480
+# Длительность простоя, с: логнормальное распределение, медиана 5 минут
+DOWNTIME_MEDIAN_SECONDS = 300
+DOWNTIME_SIGMA = 1.2
+DOWNTIME_MAX_SECONDS = 12 * 3600
+RECENT_SECONDS = 2 * 24 * 3600
+
+# Таблицы в порядке очистки (зависимые — первыми)
+GENERATED_TABLES = (
+    Workflow.__table__, AlertsSubscription.__table__, UsersGroup.__table__, User.__table__,
+    Equipment.__table__, Group.__table__, AnswersList.__table__, AnswersCategory.__table__,
+    KioskVersion.__table__, DowntimeRollupHourly.__table__, DowntimeRollupMonthly.__table__,
+    RollupWatermark.__table__,
+)
+
+
+def seeded_random(seed: int, *key) -> random.Random:
+    """Отдельный генератор для части данных: не зависит от порядка и размера порций."""
+    digest = hashlib.sha256(repr((seed,) + key).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def zipf_cum_weights(count: int, exponent: float = 1.1):
+    """Накопленные веса закона Ципфа для `count` значений (для `random.choices`)."""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def to_timestamp(moment: datetime) -> int:
+    """Время в секундах Unix, как `start_id` и `stop_id` в workflow."""
+    return int(moment.replace(tzinfo=timezone.utc).timestamp())
+
+
+class Dataset:
+    """
+    Параметры генерации и общие для таблиц данные.
+
+    Атрибуты:
+        group_parents (dict): group_id -> parent_id.
+        equipment_groups (dict): equipment_id -> group_id.
+        group_users (dict): group_id -> список user_id.
+        answer_ids (list): Идентификаторы причин простоев в порядке частоты.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.end = args.end
+        self.group_parents = {}
+        self.equipment_groups = {}
+        self.group_users = {}
+        self.user_ids = []
+        self.answer_ids = []
+
+    def answers_categories(self):
+        for category, name in enumerate(ANSWERS, start=1):
+            yield {"answer_category": category, "name": name}
+
+    def answers_list(self):
+        answer_id = 0
+        for category, texts in enumerate(ANSWERS.values(), start=1):
+            for text in texts:
+                answer_id += 1
+                self.answer_ids.append(answer_id)
+                yield {
+                    "answer_id": answer_id,
+                    "answer_text": text,
+                    "answer_category": category,
+                    "answer_color": ANSWER_COLORS[(category - 1) % len(ANSWER_COLORS)],
+                    "is_system": False,
+                }
+        # Частые причины встречаются в разных категориях
+        seeded_random(self.args.seed, "answers").shuffle(self.answer_ids)
+
+    def groups(self):
+        rng = seeded_random(self.args.seed, "groups")
+        roots = max(1, self.args.groups // 25)
+        levels = {}
+        parents = []
+        for group_id in range(1, self.args.groups + 1):
+            parent_id = None if group_id <= roots else rng.choice(parents)
+            levels[group_id] = 1 if parent_id is None else levels[parent_id] + 1
+            if levels[group_id] < GROUP_LEVELS:
+                parents.append(group_id)
+            self.group_parents[group_id] = parent_id
+            yield {
+                "group_id": group_id,
+                "parent_id": parent_id,
+                "group_name": ("Цех", "Участок", "Линия")[levels[group_id] - 1] + f" {group_id}",
+                "group_status": 1,
+            }
+
+    def equipment(self):
+        rng = seeded_random(self.args.seed, "equipment")
+        group_ids = list(self.group_parents)
+        weights = [rng.paretovariate(1.2) for _ in group_ids]
+        for equipment_id in range(1, self.args.equipment + 1):
+            group_id = rng.choices(group_ids, weights)[0]
+            self.equipment_groups[equipment_id] = group_id
+            yield {
+                "equipment_id": equipment_id,
+                "group_id": group_id,
+                "equipment_name": f"Станок {equipment_id}",
+                "equipment_status": 1 if rng.random() < 0.95 else 0,
+                "mac_address": ":".join(f"{rng.getrandbits(8):02x}" for _ in range(6)),
+                "sort_order": equipment_id,
+            }
+
+    def users(self):
+        rng = seeded_random(self.args.seed, "users")
+        password_hash = generate_password_hash(self.args.password)
+        created = self.end - timedelta(days=self.args.days)
+        for number in range(1, self.args.users + 1):
+            user_id = f"{rng.getrandbits(128):032x}"
+            self.user_ids.append(user_id)
+            yield {
+                "user_id": user_id,
+                "user_name": str(100000 + number),
+                "user_full_name": f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}",
+                "user_role": 1 if rng.random() < 0.02 else 0,
+                "user_password": password_hash,
+                "create_time": created,
+                "update_time": created,
+            }
+
+    def users_groups(self):
+        rng = seeded_random(self.args.seed, "users_groups")
+        # Операторов больше там, где больше оборудования
+        equipment_count = Counter(self.equipment_groups.values())
+        group_ids = list(self.group_parents)
+        weights = [1 + equipment_count[group_id] for group_id in group_ids]
+        for user_id in self.user_ids:
+            for group_id in set(rng.choices(group_ids, weights, k=rng.choice((1, 1, 1, 2, 3)))):
+                self.group_users.setdefault(group_id, []).append(user_id)
+                yield {"user_id": user_id, "group_id": group_id, "user_role": 0}
+
+    def workflow(self):
+        args = self.args
+        end = to_timestamp(self.end)
+        span = args.days * 24 * 3600
+        average = args.workflow / args.equipment
+        duration_mu = math.log(DOWNTIME_MEDIAN_SECONDS)
+        mean_duration = DOWNTIME_MEDIAN_SECONDS * math.exp(DOWNTIME_SIGMA ** 2 / 2)
+        answer_weights = zipf_cum_weights(len(self.answer_ids))
+        for equipment_id in self.equipment_groups:
+            rng = seeded_random(args.seed, "workflow", equipment_id)
+            # Среднее логнормального множителя exp(mu + sigma² / 2) равно 1
+            count = max(1, round(average * rng.lognormvariate(-0.18, 0.6)))
+            mean_gap = max(30.0, span / count - mean_duration)
+            rows = []
+            moment = end - int(rng.expovariate(1 / mean_gap))
+            for _ in range(count):
+                duration = int(rng.lognormvariate(duration_mu, DOWNTIME_SIGMA))
+                duration = min(DOWNTIME_MAX_SECONDS, max(15, duration))
+                start = moment - duration
+                unanswered = 0.7 if end - start < RECENT_SECONDS else 0.1
+                rows.append({
+                    "equipment_id": equipment_id,
+                    "start_id": start,
+                    "stop_id": start + duration,
+                    "answer_id": 0 if rng.random() < unanswered else rng.choices(
+                        self.answer_ids, cum_weights=answer_weights
+                    )[0],
+                    "is_alerted": duration > 600 and rng.random() < 0.5,
+                })
+                moment = start - 1 - int(rng.expovariate(1 / mean_gap))
+            # Текущий простой у части станков ещё не закрыт
+            if rng.random() < 0.1:
+                rows[0]["stop_id"] = None
+                rows[0]["answer_id"] = 0
+            yield from reversed(rows)
+
+    def alerts_subscription(self):
+        args = self.args
+        shift = timedelta(hours=SHIFT_HOURS)
+        shifts = args.subscription_days * 24 // SHIFT_HOURS
+        first_shift = self.end - shifts * shift
+        for equipment_id, group_id in self.equipment_groups.items():
+            rng = seeded_random(args.seed, "alerts_subscription", equipment_id)
+            operators = self.group_users.get(group_id) or self.user_ids
+            for number in range(shifts):
+                if rng.random() > 0.7:
+                    continue
+                current = number == shifts - 1
+                if current:
+                    # Текущая занятость началась недавно и ещё не истекла
+                    subscribe = self.end - timedelta(minutes=rng.randint(10, 240))
+                else:
+                    subscribe = first_shift + number * shift + timedelta(minutes=rng.randint(0, 30))
+                # Подписку снимает оператор или фоновая задача по истечении срока
+                if rng.random() < 0.8:
+                    worked = timedelta(minutes=rng.randint(60, SUBSCRIPTION_MINUTES_TO_LIVE))
+                else:
+                    worked = timedelta(minutes=SUBSCRIPTION_MINUTES_TO_LIVE)
+                yield {
+                    "equipment_id": equipment_id,
+                    "user_id": rng.choice(operators),
+                    "active": current,
+                    "subscribe_time": subscribe,
+                    "unsubscribe_time": None if current else subscribe + worked,
+                    "minutes_to_live": SUBSCRIPTION_MINUTES_TO_LIVE,
+                    "subscribe_action": 0,
+                }
+
+
+async def copy_rows(connection, table, rows, batch_size: int) -> int:
+    """
+    Загружает строки в таблицу через COPY порциями по `batch_size`.
+
+    Состав столбцов определяется первой строкой и проверяется по модели; столбцы, которых
+    нет в строках, получают значения по умолчанию из схемы.
+    """
+    columns = None
+    batch = []
+    total = 0
+    started = time.perf_counter()
+    for row in rows:
+        if columns is None:
+            unknown = set(row) - set(table.columns.keys())
+            if unknown:
+                raise ValueError(f"В таблице {table.name} нет столбцов {sorted(unknown)}")
+            columns = [column.name for column in table.columns if column.name in row]
+        batch.append(tuple(row[column] for column in columns))
+        if len(batch) >= batch_size:
+            await connection.copy_records_to_table(table.name, records=batch, columns=columns)
+            total += len(batch)
+            batch = []
+            rate = total / (time.perf_counter() - started)
+            print(f"  {table.name}: {total} строк, {rate:.0f} в секунду", end="\r")
+    if batch:
+        await connection.copy_records_to_table(table.name, records=batch, columns=columns)
+        total += len(batch)
+    print(f"{table.name:<22} {total:>12} строк за {time.perf_counter() - started:.1f} с")
+    return total
+
+
+async def main(args) -> int:
+    """Очищает таблицы и загружает сгенерированные данные."""
+    url = make_url(DATABASE_URL).set(drivername="postgresql")
+    connection = await asyncpg.connect(url.render_as_string(hide_password=False))
+    dataset = Dataset(args)
+    tables = [table.name for table in GENERATED_TABLES]
+    try:
+        has_data = await connection.fetchval("SELECT EXISTS (SELECT 1 FROM equipment)")
+        if has_data and not args.truncate:
+            print("В базе уже есть данные: запустите с --truncate, чтобы очистить таблицы")
+            return 1
+        print(f"Генерация: seed={args.seed}, end={args.end.isoformat()}")
+        await connection.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY")
+        for table in tables:
+            await connection.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+        try:
+            for table, rows in (
+                (AnswersCategory.__table__, dataset.answers_categories()),
+                (AnswersList.__table__, dataset.answers_list()),
+                (Group.__table__, dataset.groups()),
+                (Equipment.__table__, dataset.equipment()),
+                (User.__table__, dataset.users()),
+                (UsersGroup.__table__, dataset.users_groups()),
+                (Workflow.__table__, dataset.workflow()),
+                (AlertsSubscription.__table__, dataset.alerts_subscription()),
+            ):
+                await copy_rows(connection, table, rows, args.batch_size)
+        finally:
+            for table in tables:
+                await connection.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+        # Замыкание иерархии групп поддерживает отключённый на время загрузки триггер
+        await connection.execute("SELECT refresh_group_closure()")
+        # Статистика планировщика для новых данных
+        await connection.execute(f"ANALYZE {', '.join(tables)}, group_closure")
+    finally:
+        await connection.close()
+    return 0
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки."""
+    hour = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--equipment", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--workflow", type=int, default=100_000_000, help="простоев всего (примерно)")
+    parser.add_argument("--days", type=int, default=730, help="глубина журнала простоев, дней")
+    parser.add_argument(
+        "--subscription-days", type=int, default=90, help="глубина истории занятости, дней"
+    )
+    parser.add_argument(
+        "--end", type=datetime.fromisoformat, default=hour,
+        help="конец периода, UTC (по умолчанию — начало текущего часа)"
+    )
+    parser.add_argument("--password", default="pass", help="пароль всех пользователей")
+    parser.add_argument("--batch-size", type=int, default=50000, help="строк в одной команде COPY")
+    parser.add_argument("--truncate", action="store_true", help="очистить таблицы с данными")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
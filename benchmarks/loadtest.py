@@ -0,0 +1,428 @@
+# benchmarks/loadtest.py
+"""
+Нагрузочный тест сценариев киоска через HTTP.
+
+Каждый киоск — отдельный HTTP-клиент со своей сессией (cookie), закреплённый за группой
+(цехом). Киоск повторяет действия браузера панели: выбор группы и оператора, вход,
+панель (`/dashboard`), затем до конца прогона опрашивает `/equipment` с `If-None-Match`,
+время от времени переключает занятость станка (`/toggle-equipment`), открывает журнал
+простоев (`/downtimes`) и указывает причину простоя (`/answers`, `/update-downtime`).
+В момент `--shift-change-at` все киоски одновременно выходят и входят под следующим
+оператором группы — пересменка; входы этого всплеска учитываются отдельно
+(`POST /login [пересменка]`).
+
+Для каждого маршрута считаются количество запросов, коды ответов, ошибки (код 5xx или
+сбой соединения), пропускная способность и задержки p50/p95/p99. Результат сохраняется
+в JSON (`--output`, по умолчанию benchmarks/results/) вместе с коммитом и параметрами;
+режим `compare` сравнивает два результата и завершается с кодом 1 при регрессии.
+
+Операторы и группы берутся из базы данных (app/database.py): группы с оборудованием и
+не менее чем двумя операторами; пароль у всех один (`--password`, как в
+benchmarks/generate_data.py). Случайные решения киосков определяются `--seed`.
+
+Запуск из корня репозитория, приложение уже запущено:
+    uvicorn app.main:app --port 8080 --workers 4
+    python -m benchmarks.loadtest run --kiosks 100 --duration 120 --shift-change-at 60
+    python -m benchmarks.loadtest compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+from sqlalchemy import text
+
+from app.database import SessionLocal, engine
+from app.logging_config import logger
+from benchmarks.stats import percentile
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SHIFT_CHANGE_SUFFIX = " [пересменка]"
+
+# Группы с оборудованием и операторами для киосков
+ROSTER_QUERY = text("""
+    SELECT ug.group_id, array_agg(u.user_name ORDER BY u.user_name) AS user_names
+    FROM users_groups ug
+    JOIN users u ON u.user_id = ug.user_id
+    WHERE u.user_name IS NOT NULL
+      AND EXISTS (SELECT 1 FROM equipment e WHERE e.group_id = ug.group_id)
+    GROUP BY ug.group_id
+    HAVING COUNT(*) >= 2
+    ORDER BY ug.group_id
+    LIMIT :limit
+""")
+
+
+class Recorder:
+    """Задержки и коды ответов по маршрутам."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, route: str, status, seconds: float):
+        self.latencies[route].append(seconds * 1000)
+        self.statuses[route][str(status)] += 1
+
+    def summary(self) -> dict:
+        """Итоги прогона по маршрутам."""
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        routes = {}
+        for route in sorted(self.latencies):
+            latencies = self.latencies[route]
+            statuses = self.statuses[route]
+            routes[route] = {
+                "count": len(latencies),
+                "errors": sum(
+                    count for code, count in statuses.items()
+                    if not code.isdigit() or int(code) >= 500
+                ),
+                "statuses": dict(statuses),
+                "throughput_rps": round(len(latencies) / elapsed, 2),
+                "p50_ms": round(percentile(latencies, 0.50), 2),
+                "p95_ms": round(percentile(latencies, 0.95), 2),
+                "p99_ms": round(percentile(latencies, 0.99), 2),
+                "max_ms": round(max(latencies), 2),
+            }
+        total = sum(route["count"] for route in routes.values())
+        return {
+            "duration_s": round(elapsed, 2),
+            "requests": total,
+            "errors": sum(route["errors"] for route in routes.values()),
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0,
+            "routes": routes,
+        }
+
+
+class Kiosk:
+    """Один киоск: сессия браузера панели в группе."""
+
+    def __init__(self, number: int, group_id: int, user_names, args, recorder: Recorder):
+        self.number = number
+        self.group_id = group_id
+        self.user_names = user_names
+        self.args = args
+        self.recorder = recorder
+        self.rng = random.Random(f"{args.seed}-{number}")
+        self.operator = number % len(user_names)
+        self.client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+        self.equipment = []
+        self.etags = {}
+        self.answer_ids = []
+
+    @property
+    def user_name(self) -> str:
+        return self.user_names[self.operator]
+
+    async def request(self, method: str, route: str, url: str, **kwargs):
+        """Выполняет запрос и учитывает его под шаблоном маршрута `route`."""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.recorder.record(
+                f"{method} {route}", type(exc).__name__, time.perf_counter() - started
+            )
+            return None
+        self.recorder.record(
+            f"{method} {route}", response.status_code, time.perf_counter() - started
+        )
+        return response
+
+    async def get_cached(self, route: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """GET с If-None-Match, как у браузера; возвращает ответ только при новых данных."""
+        headers = {"If-None-Match": self.etags[url]} if url in self.etags else {}
+        response = await self.request("GET", route, url, headers=headers, **kwargs)
+        if response is None or response.status_code != 200:
+            return None
+        if "etag" in response.headers:
+            self.etags[url] = response.headers["etag"]
+        return response
+
+    async def login(self, login_route: str = "/login") -> bool:
+        """Выбор группы и оператора, вход и открытие панели."""
+        await self.request(
+            "POST", "/set-group", "/set-group", data={"group_id": self.group_id}
+        )
+        await self.request("GET", "/select-user", "/select-user")
+        # Оператор набирает начало табельного номера в поле поиска
+        await self.request(
+            "GET", "/select-user/search", "/select-user/search", params={"q": self.user_name[:2]}
+        )
+        response = await self.request("POST", login_route, "/login", data={
+            "username": self.user_name,
+            "password": self.args.password,
+            "group_id": self.group_id,
+        })
+        if response is None or response.status_code != 303:
+            return False
+        await self.request("GET", "/dashboard/{group_id}", f"/dashboard/{self.group_id}")
+        self.etags.clear()
+        return True
+
+    async def shift_change(self) -> bool:
+        """Пересменка: выход и вход следующего оператора группы."""
+        await self.request("GET", "/logout", "/logout")
+        self.operator = (self.operator + 1) % len(self.user_names)
+        return await self.login("/login" + SHIFT_CHANGE_SUFFIX)
+
+    async def poll_equipment(self):
+        response = await self.get_cached("/equipment/{group_id}", f"/equipment/{self.group_id}")
+        if response is not None:
+            self.equipment = response.json()["equipments"]
+
+    async def toggle_equipment(self):
+        """Занимает свободный станок или освобождает свой."""
+        candidates = [
+            item for item in self.equipment
+            if not item["active"] or item["user_name"] == self.user_name
+        ]
+        if candidates:
+            equipment_id = self.rng.choice(candidates)["id"]
+            await self.request(
+                "POST", "/toggle-equipment/{equipment_id}", f"/toggle-equipment/{equipment_id}"
+            )
+
+    async def annotate_downtime(self):
+        """Открывает журнал простоев станка и указывает причину простоя без причины."""
+        if not self.equipment:
+            return
+        equipment_id = self.rng.choice(self.equipment)["id"]
+        response = await self.get_cached(
+            "/downtimes/{equipment_id}", f"/downtimes/{equipment_id}?mode=cursor"
+        )
+        if response is None:
+            return
+        unanswered = [
+            downtime for downtime in response.json()["downtimes"] if not downtime["answer_id"]
+        ]
+        if not unanswered or self.rng.random() > self.args.answer_probability:
+            return
+        if not self.answer_ids:
+            answers = await self.request("GET", "/answers", "/answers")
+            if answers is None or answers.status_code != 200:
+                return
+            self.answer_ids = [answer["answer_id"] for answer in answers.json()]
+        downtime = self.rng.choice(unanswered)
+        await self.request(
+            "POST", "/update-downtime/{equipment_id}/{start_id}",
+            f"/update-downtime/{equipment_id}/{downtime['start_id']}",
+            json={"answer_id": self.rng.choice(self.answer_ids)}
+        )
+
+    async def run(self, deadline: float, shift_change: asyncio.Event):
+        """Сценарий киоска до `deadline` с одной пересменкой по событию `shift_change`."""
+        await asyncio.sleep(self.args.ramp_up * self.number / self.args.kiosks)
+        logged_in = await self.login()
+        shift_changed = False
+        try:
+            while time.perf_counter() < deadline:
+                if shift_change.is_set() and not shift_changed:
+                    shift_changed = True
+                    logged_in = await self.shift_change()
+                if logged_in:
+                    await self.poll_equipment()
+                    if self.rng.random() < self.args.toggle_probability:
+                        await self.toggle_equipment()
+                    if self.rng.random() < self.args.downtimes_probability:
+                        await self.annotate_downtime()
+                interval = self.args.poll_interval * self.rng.uniform(0.8, 1.2)
+                timeout = max(0.0, min(interval, deadline - time.perf_counter()))
+                if shift_changed:
+                    await asyncio.sleep(timeout)
+                    continue
+                # Ожидание прерывается пересменкой, чтобы все киоски входили одновременно
+                try:
+                    await asyncio.wait_for(shift_change.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.client.aclose()
+
+
+async def load_roster(limit: int):
+    """Группы и табельные номера операторов для киосков."""
+    async with SessionLocal() as db:
+        result = await db.execute(ROSTER_QUERY, {'limit': limit})
+        roster = [(row.group_id, list(row.user_names)) for row in result]
+    await engine.dispose()
+    return roster
+
+
+def git_commit() -> Optional[str]:
+    """Текущий коммит репозитория для сравнения результатов."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(summary: dict):
+    print(f"{'маршрут':<52} {'запросов':>8} {'ошибок':>6} {'rps':>8} "
+          f"{'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, stats in summary["routes"].items():
+        print(
+            f"{route:<52} {stats['count']:>8} {stats['errors']:>6} "
+            f"{stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.1f} "
+            f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+        )
+    print(
+        f"Всего {summary['requests']} запросов за {summary['duration_s']} с "
+        f"({summary['throughput_rps']} в секунду), ошибок {summary['errors']}"
+    )
+
+
+def compare(baseline: dict, current: dict, args) -> int:
+    """
+    Сравнивает два результата по маршрутам и возвращает число регрессий.
+
+    Регрессия — рост p95 больше чем на `--max-regression` (доля) и на `--min-delta-ms`,
+    или рост доли ошибок маршрута.
+    """
+    print(f"Сравнение {baseline.get('commit')} -> {current.get('commit')}")
+    regressions = 0
+    for route, stats in current["routes"].items():
+        base = baseline["routes"].get(route)
+        if base is None:
+            print(f"{route:<52} новый маршрут")
+            continue
+        delta = stats["p95_ms"] - base["p95_ms"]
+        ratio = delta / base["p95_ms"] if base["p95_ms"] else 0.0
+        status = "ok"
+        if ratio > args.max_regression and delta > args.min_delta_ms:
+            status = "РЕГРЕССИЯ p95"
+            regressions += 1
+        elif stats["errors"] / stats["count"] > base["errors"] / base["count"]:
+            status = "РЕГРЕССИЯ: больше ошибок"
+            regressions += 1
+        print(
+            f"{route:<52} p95 {base['p95_ms']:>8.1f} -> {stats['p95_ms']:>8.1f} мс "
+            f"({ratio:+.0%}), p99 {base['p99_ms']:>8.1f} -> {stats['p99_ms']:>8.1f} мс  {status}"
+        )
+    return regressions
+
+
+async def run(args) -> int:
+    """Запускает киоски и сохраняет результат."""
+    roster = await load_roster(args.groups or args.kiosks)
+    if not roster:
+        print("В базе данных нет групп с оборудованием и операторами")
+        return 1
+
+    recorder = Recorder()
+    shift_change = asyncio.Event()
+    deadline = time.perf_counter() + args.duration
+    kiosks = [
+        Kiosk(number, *roster[number % len(roster)], args, recorder)
+        for number in range(args.kiosks)
+    ]
+
+    async def start_shift_change():
+        await asyncio.sleep(args.shift_change_at)
+        shift_change.set()
+
+    shift_timer = None
+    if 0 < args.shift_change_at < args.duration:
+        shift_timer = asyncio.create_task(start_shift_change())
+    await asyncio.gather(*(kiosk.run(deadline, shift_change) for kiosk in kiosks))
+    if shift_timer is not None:
+        shift_timer.cancel()
+    recorder.finished = time.perf_counter()
+
+    summary = recorder.summary()
+    result = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "args": {
+            key: value for key, value in vars(args).items() if key not in ("password", "func")
+        },
+        "groups_used": len({group_id for group_id, _ in roster[:args.kiosks]}),
+        **summary,
+    }
+    print_summary(summary)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"loadtest-{datetime.now():%Y%m%d-%H%M%S}-{result['commit'] or 'nocommit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(result, file, ensure_ascii=False, indent=2)
+    print(f"Результат сохранён: {output}")
+
+    failures = 1 if summary["errors"] else 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            failures += compare(json.load(file), result, args)
+    return 1 if failures else 0
+
+
+def run_compare(args) -> int:
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.current, encoding="utf-8") as file:
+        current = json.load(file)
+    return 1 if compare(baseline, current, args) else 0
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_compare_options(command):
+        command.add_argument(
+            "--max-regression", type=float, default=0.2, help="допустимый рост p95, доля"
+        )
+        command.add_argument(
+            "--min-delta-ms", type=float, default=5.0, help="рост p95 меньше этого не считается"
+        )
+
+    run_parser = commands.add_parser("run", help="нагрузочный прогон")
+    run_parser.set_defaults(func=lambda args: asyncio.run(run(args)))
+    run_parser.add_argument("--base-url", default="http://127.0.0.1:8080")
+    run_parser.add_argument("--kiosks", type=int, default=50, help="одновременных киосков")
+    run_parser.add_argument(
+        "--groups", type=int, help="групп для киосков (по умолчанию — по группе на киоск)"
+    )
+    run_parser.add_argument("--duration", type=float, default=60.0, help="длительность прогона, с")
+    run_parser.add_argument("--ramp-up", type=float, default=5.0, help="запуск киосков в течение, с")
+    run_parser.add_argument(
+        "--shift-change-at", type=float, default=30.0, help="пересменка через, с (0 — без неё)"
+    )
+    run_parser.add_argument("--poll-interval", type=float, default=5.0, help="опрос /equipment, с")
+    run_parser.add_argument("--toggle-probability", type=float, default=0.05)
+    run_parser.add_argument("--downtimes-probability", type=float, default=0.2)
+    run_parser.add_argument("--answer-probability", type=float, default=0.5)
+    run_parser.add_argument("--password", default="pass", help="пароль операторов")
+    run_parser.add_argument("--timeout", type=float, default=30.0, help="таймаут запроса, с")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--output", help="файл результата JSON")
+    run_parser.add_argument("--compare", help="сравнить с сохранённым результатом")
+    add_compare_options(run_parser)
+
+    compare_parser = commands.add_parser("compare", help="сравнение двух результатов")
+    compare_parser.set_defaults(func=run_compare)
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    add_compare_options(compare_parser)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logger.setLevel(logging.WARNING)
+    arguments = parse_args()
+    sys.exit(arguments.func(arguments))
@@ -0,0 +1,138 @@
+# benchmarks/plan_check.py
+"""
+Проверка планов SQL-запросов основных маршрутов.
+
+Скрипт проходит сценарий киоска из benchmarks/query_budgets.py, собирает каждый
+выполненный запрос вместе с параметрами (`capture_statements()`, app/profiling.py) и
+получает его план через `EXPLAIN (FORMAT JSON)`. Проверка не пройдена, если в плане
+таблица не из `SEQ_SCAN_ALLOWED` читается целиком: последовательно (Seq Scan) или
+полным просмотром индекса — без условия `Index Cond` на первый столбец индекса.
+Частичные индексы (например, активной занятости `WHERE active`) читать целиком можно,
+как и индекс, который под LIMIT читается по порядку только до нужного числа строк.
+
+По умолчанию планы строятся с `enable_seqscan`, `enable_hashjoin` и `enable_mergejoin`
+= off: на маленькой тестовой базе планировщик честно выбирает полное чтение и соединение
+хэшированием, а так полное чтение остаётся только там, где подходящего индекса нет совсем. С `--natural` планы строятся с настройками базы — для
+проверки на копии рабочих данных.
+
+Запуск из корня репозитория (база данных из app/database.py, схема — `alembic upgrade head`):
+    python -m benchmarks.plan_check --group-id 1 --equipment-id 3 --username 1002 --password pass
+Код возврата 1 означает, что хотя бы один запрос читает таблицу целиком.
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+
+import asyncpg
+from fastapi.testclient import TestClient
+from sqlalchemy.engine import make_url
+
+from benchmarks.query_budgets import run_scenario
+from app.database import DATABASE_URL
+from app.main import app
+from app.profiling import capture_statements, normalize_sql
+
+# Справочники из десятков строк и дерево групп: читаются целиком и кэшируются приложением
+SEQ_SCAN_ALLOWED = {"answers_list", "answers_categories", "groups", "group_closure"}
+
+# Планы строятся только для запросов к данным
+EXPLAINED_KEYWORDS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# Без них планировщик выбирает индекс везде, где он есть
+STRICT_SETTINGS = ("enable_seqscan", "enable_hashjoin", "enable_mergejoin")
+
+INDEX_SCANS = ("Index Scan", "Index Only Scan", "Bitmap Index Scan")
+# Узлы, которые передают строки внешнего входа по одной: LIMIT над ними останавливает чтение
+STREAMING_NODES = ("Limit", "Nested Loop", "Result", "Subquery Scan")
+
+# Первый столбец индекса (NULL — выражение) и признак частичного индекса
+INDEXES_QUERY = """
+    SELECT c.relname, t.relname, a.attname, i.indpred IS NOT NULL
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_class t ON t.oid = i.indrelid
+    LEFT JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+    WHERE c.relnamespace = current_schema()::regnamespace
+"""
+
+
+def full_scans(plan: dict, indexes: dict, limited: bool = False):
+    """Таблицы, которые узлы плана читают целиком; `limited` — узел читается под LIMIT."""
+    node_type = plan.get("Node Type")
+    if node_type == "Seq Scan":
+        yield plan["Relation Name"]
+    elif node_type in INDEX_SCANS and plan["Index Name"] in indexes and not limited:
+        table, leading_column, partial = indexes[plan["Index Name"]]
+        condition = plan.get("Index Cond", "")
+        if not partial and not (
+            condition and (leading_column is None or re.search(rf"\({leading_column}\b", condition))
+        ):
+            yield table
+    limited = node_type == "Limit" or (limited and node_type in STREAMING_NODES)
+    for child in plan.get("Plans", ()):
+        outer = child.get("Parent Relationship") in ("Outer", "Subquery", None)
+        yield from full_scans(child, indexes, limited and outer)
+
+
+async def explain_statements(statements, natural: bool):
+    """Возвращает (маршрут, текст, читаемые целиком таблицы) для каждого уникального запроса."""
+    url = make_url(DATABASE_URL).set(drivername="postgresql")
+    connection = await asyncpg.connect(url.render_as_string(hide_password=False))
+    try:
+        if not natural:
+            for setting in STRICT_SETTINGS:
+                await connection.execute(f"SET {setting} = off")
+        indexes = {
+            index: (table, column, partial)
+            for index, table, column, partial in await connection.fetch(INDEXES_QUERY)
+        }
+        results = []
+        seen = set()
+        for route, statement, parameters in statements:
+            key = (route, statement)
+            if key in seen or not statement.lstrip().upper().startswith(EXPLAINED_KEYWORDS):
+                continue
+            seen.add(key)
+            plan = await connection.fetchval(
+                "EXPLAIN (FORMAT JSON) " + statement, *(parameters or ())
+            )
+            tables = set(full_scans(json.loads(plan)[0]["Plan"], indexes))
+            results.append((route, normalize_sql(statement), tables - SEQ_SCAN_ALLOWED))
+        return results
+    finally:
+        await connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--group-id", type=int, default=1)
+    parser.add_argument("--equipment-id", type=int, default=1)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument(
+        "--natural", action="store_true", help="не отключать Seq Scan и соединения хэшированием"
+    )
+    args = parser.parse_args()
+
+    with capture_statements() as statements:
+        with TestClient(app) as client:
+            client.post("/set-group", data={"group_id": args.group_id}, follow_redirects=False)
+            for _ in run_scenario(client, args):
+                pass
+
+    failures = 0
+    for route, statement, tables in asyncio.run(explain_statements(statements, args.natural)):
+        status = "ok"
+        if tables:
+            status = "ОШИБКА: полное чтение " + ", ".join(sorted(tables))
+            failures += 1
+        print(f"{route:<40} {status}")
+        if tables:
+            print(f"    {statement[:300]}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
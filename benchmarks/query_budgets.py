@@ -0,0 +1,109 @@
+# benchmarks/query_budgets.py
+"""
+Проверка бюджетов SQL-запросов основных маршрутов.
+
+Скрипт проходит сценарий киоска (выбор группы, вход, панель, оборудование, простои,
+переключение занятости) через TestClient в режиме `SQL_PROFILE=1` и сравнивает
+заголовок `X-DB-Queries` каждого ответа с бюджетом из `BUDGETS`. Бюджет уменьшают
+вместе с изменением, которое сокращает число запросов маршрута.
+
+Запуск из корня репозитория (база данных из app/database.py):
+    python -m benchmarks.query_budgets --group-id 1 --equipment-id 3 --username 1002 --password pass
+Код возврата 1 означает, что хотя бы один маршрут превысил бюджет.
+"""
+import argparse
+import os
+import sys
+
+# Профилирование включается до импорта приложения
+os.environ["SQL_PROFILE"] = "1"
+# Бюджеты считаются без повторного использования результатов соседних запросов
+os.environ.setdefault("COALESCE_TTL_MS", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.profiling import QueryBudgetExceeded, assert_query_budget  # noqa: E402
+
+# Маршрут -> допустимое число SQL-запросов (включая проверку пользователя)
+BUDGETS = {
+    "select_user": 1,
+    # Операторы группы ищутся в списке, загруженном страницей выбора
+    "select_user_search": 0,
+    "login": 2,
+    "dashboard": 1,
+    "bootstrap": 1,
+    "equipment": 3,
+    # Ответ 304 по If-None-Match: только чтение счётчика изменений
+    "equipment_not_modified": 1,
+    "downtimes": 2,
+    "downtimes_not_modified": 1,
+    "downtimes_page": 2,
+    "downtimes_batch": 1,
+    "toggle_equipment": 4,
+    # Справочник отдаётся из кэша; два запроса — только при его перечитывании
+    "answers": 2,
+}
+
+
+def run_scenario(client: TestClient, args):
+    """Выполняет сценарий киоска и возвращает пары (имя маршрута, ответ)."""
+    equipment_path = f"/toggle-equipment/{args.equipment_id}"
+    yield "select_user", client.get("/select-user")
+    yield "select_user_search", client.get("/select-user/search", params={"q": args.username[:2]})
+    yield "login", client.post(
+        "/login",
+        data={"username": args.username, "password": args.password, "group_id": args.group_id},
+        follow_redirects=False
+    )
+    yield "dashboard", client.get(f"/dashboard/{args.group_id}")
+    yield "bootstrap", client.get(f"/bootstrap/{args.group_id}")
+    response = client.get(f"/equipment/{args.group_id}")
+    yield "equipment", response
+    yield "equipment_not_modified", client.get(
+        f"/equipment/{args.group_id}", headers={"If-None-Match": response.headers["etag"]}
+    )
+    response = client.get(f"/downtimes/{args.equipment_id}", params={"mode": "cursor"})
+    yield "downtimes", response
+    yield "downtimes_not_modified", client.get(
+        f"/downtimes/{args.equipment_id}", params={"mode": "cursor"},
+        headers={"If-None-Match": response.headers["etag"]}
+    )
+    yield "downtimes_page", client.get(f"/downtimes/{args.equipment_id}", params={"page": 1})
+    yield "downtimes_batch", client.get("/downtimes", params={"group_id": args.group_id})
+    yield "toggle_equipment", client.post(equipment_path)
+    # Второе переключение возвращает оборудование в исходное состояние
+    yield "toggle_equipment", client.post(equipment_path)
+    yield "answers", client.get("/answers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--group-id", type=int, default=1)
+    parser.add_argument("--equipment-id", type=int, default=1)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    args = parser.parse_args()
+
+    failures = 0
+    with TestClient(app) as client:
+        client.post("/set-group", data={"group_id": args.group_id}, follow_redirects=False)
+        for name, response in run_scenario(client, args):
+            queries = response.headers.get("x-db-queries")
+            status = "ok"
+            try:
+                if response.status_code >= 400:
+                    raise QueryBudgetExceeded(f"код ответа {response.status_code}")
+                assert_query_budget(response, BUDGETS[name])
+            except QueryBudgetExceeded as exc:
+                status = f"ОШИБКА: {exc}"
+                failures += 1
+            print(
+                f"{name:<24} запросов {queries:>3} / бюджет {BUDGETS[name]:<3} "
+                f"{response.headers.get('x-db-time-ms', '-'):>8} мс  {status}"
+            )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+# benchmarks/stats.py
+"""Статистика задержек для нагрузочных проверок."""
+
+
+def percentile(values, fraction):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
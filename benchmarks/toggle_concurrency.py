@@ -0,0 +1,127 @@
+# benchmarks/toggle_concurrency.py
+"""
+Нагрузочная проверка переключения занятости оборудования (`toggle_equipment`).
+
+Много клиентов одновременно переключают один и тот же станок. Скрипт проверяет, что
+в любой момент у оборудования не больше одной активной подписки, что не возникает
+конфликтов уникального индекса, и что 99-й перцентиль задержки не превышает порог.
+
+Запуск из корня репозитория (база данных из app/database.py):
+    python -m benchmarks.toggle_concurrency --equipment-id 1 --clients 50 --iterations 20
+Код возврата 1 означает, что проверка не пройдена.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from collections import Counter
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal, engine
+from app.logging_config import logger
+from app.main import toggle_subscription
+from benchmarks.stats import percentile
+
+ACTIVE_COUNT_QUERY = text("""
+    SELECT COUNT(*) FROM alerts_subscription
+    WHERE equipment_id = :equipment_id AND active = TRUE
+""")
+
+
+async def load_user_ids(limit: int):
+    """Берёт пользователей для клиентов из базы данных."""
+    async with SessionLocal() as db:
+        result = await db.execute(
+            text("SELECT user_id FROM users ORDER BY user_id LIMIT :limit"), {'limit': limit}
+        )
+        return [row.user_id for row in result]
+
+
+async def run_client(user_id, equipment_id, iterations, latencies, outcomes):
+    """Один клиент: последовательно переключает оборудование iterations раз."""
+    for _ in range(iterations):
+        started = time.perf_counter()
+        async with SessionLocal() as db:
+            try:
+                await toggle_subscription(user_id, equipment_id, db)
+                outcomes["success"] += 1
+            except HTTPException as exc:
+                outcomes[f"http_{exc.status_code}"] += 1
+            except IntegrityError:
+                outcomes["integrity_error"] += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def watch_active(equipment_id, stop_event, observed):
+    """Во время нагрузки периодически считает активные подписки оборудования."""
+    async with SessionLocal() as db:
+        while not stop_event.is_set():
+            result = await db.execute(ACTIVE_COUNT_QUERY, {'equipment_id': equipment_id})
+            observed.append(result.scalar())
+            await db.rollback()
+            await asyncio.sleep(0.01)
+
+
+async def main(args) -> int:
+    """Запускает нагрузку и возвращает код возврата."""
+    user_ids = args.users.split(",") if args.users else await load_user_ids(args.clients)
+    if not user_ids:
+        print("В базе данных нет пользователей")
+        return 1
+
+    latencies, outcomes, observed = [], Counter(), []
+    stop_event = asyncio.Event()
+    watcher = asyncio.create_task(watch_active(args.equipment_id, stop_event, observed))
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_client(
+            user_ids[i % len(user_ids)], args.equipment_id, args.iterations, latencies, outcomes
+        )
+        for i in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - started
+    stop_event.set()
+    await watcher
+
+    async with SessionLocal() as db:
+        final_active = (await db.execute(
+            ACTIVE_COUNT_QUERY, {'equipment_id': args.equipment_id}
+        )).scalar()
+    await engine.dispose()
+
+    p50, p95, p99 = (percentile(latencies, q) for q in (0.50, 0.95, 0.99))
+    print(f"Запросов: {len(latencies)} за {elapsed:.2f} с ({len(latencies) / elapsed:.1f} в секунду)")
+    print(f"Результаты: {dict(outcomes)}")
+    print(f"Задержка, мс: p50={p50:.1f} p95={p95:.1f} p99={p99:.1f} max={max(latencies):.1f}")
+    print(f"Активных подписок: максимум за прогон {max(observed, default=0)}, в конце {final_active}")
+
+    failures = []
+    if max(observed, default=0) > 1 or final_active > 1:
+        failures.append("обнаружено больше одной активной подписки")
+    if outcomes["integrity_error"] or outcomes["http_409"]:
+        failures.append("переключения конфликтовали вместо ожидания блокировки")
+    if p99 > args.max_p99_ms:
+        failures.append(f"p99 {p99:.1f} мс больше порога {args.max_p99_ms} мс")
+    for failure in failures:
+        print(f"ОШИБКА: {failure}")
+    return 1 if failures else 0
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--equipment-id", type=int, required=True)
+    parser.add_argument("--clients", type=int, default=20, help="число одновременных клиентов")
+    parser.add_argument("--iterations", type=int, default=20, help="переключений на клиента")
+    parser.add_argument("--users", help="user_id через запятую (по умолчанию берутся из базы)")
+    parser.add_argument("--max-p99-ms", type=float, default=250.0, help="порог p99, мс")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logger.setLevel(logging.WARNING)
+    sys.exit(asyncio.run(main(parse_args())))
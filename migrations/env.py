@@ -0,0 +1,70 @@
+# migrations/env.py
+"""
+Окружение Alembic: миграции выполняются через asyncpg по строке `DATABASE_URL`,
+автогенерация сравнивает базу с `Base.metadata` из app/models.py.
+"""
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import Column, pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import DATABASE_URL
+from app.models import Base
+from app.partitions import PARTITION_NAME_PATTERN
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """
+    Исключает из автогенерации индексы по выражениям: PostgreSQL хранит выражение в
+    нормализованном виде, и оно всегда отличается от текста в app/models.py.
+    Секции workflow создаются миграцией 0008 и фоновой задачей, их нет в моделях.
+    """
+    if type_ == "index":
+        return all(isinstance(expression, Column) for expression in obj.expressions)
+    if type_ == "table" and reflected and compare_to is None:
+        return not PARTITION_NAME_PATTERN.match(name)
+    return True
+
+
+def run_migrations_offline():
+    """Выводит SQL миграций без подключения к базе (`alembic upgrade head --sql`)."""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection):
+    context.configure(
+        connection=connection, target_metadata=target_metadata, include_object=include_object
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online():
+    """Применяет миграции к базе данных."""
+    engine = create_async_engine(DATABASE_URL, poolclass=pool.NullPool)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,38 @@
+# migrations/indexes.py
+"""
+Общие операции миграций с индексами.
+
+Прерванный или завершившийся ошибкой `CREATE INDEX CONCURRENTLY` оставляет
+недействительный индекс (`pg_index.indisvalid = false`): планировщик его не использует,
+но он поддерживается при записи, а `CREATE INDEX ... IF NOT EXISTS` с тем же именем
+ничего не делает. Перед созданием индекса такой остаток удаляется.
+"""
+from alembic import op
+from sqlalchemy import text
+
+INVALID_INDEX_QUERY = text("""
+    SELECT 1
+    FROM pg_index
+    WHERE indexrelid = to_regclass(:name) AND NOT indisvalid
+""")
+
+
+def drop_invalid_index(name: str) -> None:
+    """
+    Удаляет индекс `name`, если он недействителен. Выполняется в
+    `autocommit_block()`, как и следующий за ним `CREATE INDEX CONCURRENTLY`.
+    """
+    if op.get_bind().execute(INVALID_INDEX_QUERY, {'name': name}).scalar():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def create_index_concurrently(name: str, definition: str, unique: bool = False) -> None:
+    """
+    Создаёт индекс `name` без блокировки записи; `definition` — всё после имени индекса
+    (`ON таблица (столбцы) [WHERE ...]`). Недействительный остаток прежней попытки
+    перестраивается.
+    """
+    drop_invalid_index(name)
+    op.execute(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}"
+    )
@@ -0,0 +1,75 @@
+"""Триггеры событий киоска в канале kiosk_events
+
+Открытие и закрытие простоев (строки workflow пишет сборщик данных) и изменения
+справочника причин публикуются через pg_notify, см. app/events.py и app/answers_cache.py.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 05:02:10.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_notify_workflow() RETURNS trigger AS $$
+        DECLARE
+            v_group_id integer;
+        BEGIN
+            SELECT group_id INTO v_group_id FROM equipment WHERE equipment_id = NEW.equipment_id;
+            PERFORM pg_notify('kiosk_events', json_build_object(
+                'type', 'downtime',
+                'group_id', v_group_id,
+                'equipment_id', NEW.equipment_id,
+                'start_id', NEW.start_id,
+                'stop_id', NEW.stop_id,
+                'answer_id', NEW.answer_id
+            )::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS workflow_kiosk_events ON workflow")
+    op.execute("""
+        CREATE TRIGGER workflow_kiosk_events
+            AFTER INSERT OR UPDATE OF stop_id ON workflow
+            FOR EACH ROW EXECUTE FUNCTION kiosk_notify_workflow()
+    """)
+
+    # Изменение справочника причин простоев: рабочие процессы сбрасывают кэш
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_notify_answers() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('kiosk_events', json_build_object(
+                'type', 'answers_changed',
+                'table', TG_TABLE_NAME
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in ('answers_list', 'answers_categories'):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_kiosk_events ON {table}")
+        op.execute(f"""
+            CREATE TRIGGER {table}_kiosk_events
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION kiosk_notify_answers()
+        """)
+
+
+def downgrade() -> None:
+    for table in ('answers_list', 'answers_categories'):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_kiosk_events ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS kiosk_notify_answers()")
+    op.execute("DROP TRIGGER IF EXISTS workflow_kiosk_events ON workflow")
+    op.execute("DROP FUNCTION IF EXISTS kiosk_notify_workflow()")
@@ -0,0 +1,48 @@
+"""Не более одной активной подписки на оборудование
+
+Гарантия на уровне базы данных для переключения занятости в toggle_equipment
+(app/main.py). user_id включён в индекс, чтобы списки оборудования читали занятость
+только из индекса.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 05:04:31.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from migrations.indexes import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Снимаем дубли, накопившиеся до появления индекса: остаётся самая поздняя подписка
+    op.execute("""
+        UPDATE alerts_subscription a
+        SET active = FALSE, unsubscribe_time = timezone('utc', now())
+        WHERE a.active = TRUE
+          AND EXISTS (
+              SELECT 1 FROM alerts_subscription newer
+              WHERE newer.equipment_id = a.equipment_id
+                AND newer.active = TRUE
+                AND newer.id > a.id
+          )
+    """)
+    with op.get_context().autocommit_block():
+        create_index_concurrently('alerts_subscription_active_occupancy_uq', """
+            ON alerts_subscription (equipment_id) INCLUDE (user_id)
+            WHERE active
+        """, unique=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS alerts_subscription_active_occupancy_uq")
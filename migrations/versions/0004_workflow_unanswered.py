@@ -0,0 +1,36 @@
+"""Частичный индекс простоев без указанной причины
+
+Счётчик неотмеченных простоев в пакетной выдаче журналов (GET /downtimes, app/main.py)
+читает только этот индекс, а не всю историю оборудования; start_id в индексе ограничивает
+подсчёт периодом просмотра журнала.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 05:06:02.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from migrations.indexes import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        create_index_concurrently('workflow_unanswered_equipment_idx', """
+            ON workflow (equipment_id, start_id)
+            WHERE answer_id IS NULL OR answer_id = 0
+        """)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS workflow_unanswered_equipment_idx")
@@ -0,0 +1,145 @@
+"""Счётчики изменений для ETag ответов киоска
+
+scope = 'group' — оборудование группы и его занятость (GET /equipment/{group_id});
+scope = 'equipment' — журнал простоев оборудования (GET /downtimes/{equipment_id}).
+Счётчики увеличивают триггеры, поэтому учитываются и записи сборщика данных
+(см. app/versions.py).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 05:08:15.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Триггеры уровня оператора с таблицей переходов `changed`: (событие, строки таблицы переходов)
+STATEMENT_TRIGGERS = (
+    ('INSERT', 'NEW'),
+    ('UPDATE', 'NEW'),
+    ('DELETE', 'OLD'),
+)
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS kiosk_versions (
+            scope text NOT NULL,
+            scope_id bigint NOT NULL,
+            version bigint NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, scope_id)
+        )
+    """)
+
+    # Увеличивает счётчики; идентификаторы упорядочены, чтобы параллельные транзакции
+    # блокировали строки счётчиков в одном порядке
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_bump_versions(p_scope text, p_ids bigint[]) RETURNS void AS $$
+            INSERT INTO kiosk_versions AS v (scope, scope_id, version)
+            SELECT p_scope, ids.id, 1
+            FROM (SELECT DISTINCT unnest(p_ids) AS id) ids
+            WHERE ids.id IS NOT NULL
+            ORDER BY ids.id
+            ON CONFLICT (scope, scope_id) DO UPDATE SET version = v.version + 1;
+        $$ LANGUAGE sql
+    """)
+
+    # Журнал простоев: один вызов на оператор, а не на строку (пакетные обновления причин)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_workflow_versions() RETURNS trigger AS $$
+        BEGIN
+            PERFORM kiosk_bump_versions('equipment', ARRAY(SELECT equipment_id FROM changed));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Занятость оборудования меняет версию его группы
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_subscription_versions() RETURNS trigger AS $$
+        BEGIN
+            PERFORM kiosk_bump_versions('group', ARRAY(
+                SELECT e.group_id
+                FROM changed c
+                JOIN equipment e ON e.equipment_id = c.equipment_id
+            ));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table, function in (
+        ('workflow', 'kiosk_workflow_versions'),
+        ('alerts_subscription', 'kiosk_subscription_versions'),
+    ):
+        for operation, transition in STATEMENT_TRIGGERS:
+            trigger = f"{table}_versions_{operation.lower()}"
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+            op.execute(f"""
+                CREATE TRIGGER {trigger}
+                    AFTER {operation} ON {table} REFERENCING {transition} TABLE AS changed
+                    FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+            """)
+
+    # Состав и названия оборудования: меняются версии прежней и новой группы
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_equipment_versions() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM kiosk_bump_versions('group', ARRAY[OLD.group_id::bigint]);
+            END IF;
+            IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                PERFORM kiosk_bump_versions('group', ARRAY[NEW.group_id::bigint]);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS equipment_versions ON equipment")
+    op.execute("""
+        CREATE TRIGGER equipment_versions
+            AFTER INSERT OR UPDATE OR DELETE ON equipment
+            FOR EACH ROW EXECUTE FUNCTION kiosk_equipment_versions()
+    """)
+
+    # Табельный номер занявшего оборудование показывается в списке оборудования
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_user_versions() RETURNS trigger AS $$
+        BEGIN
+            PERFORM kiosk_bump_versions('group', ARRAY(
+                SELECT e.group_id
+                FROM alerts_subscription a
+                JOIN equipment e ON e.equipment_id = a.equipment_id
+                WHERE a.user_id = NEW.user_id AND a.active = TRUE
+            ));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS users_versions ON users")
+    op.execute("""
+        CREATE TRIGGER users_versions
+            AFTER UPDATE OF user_name ON users
+            FOR EACH ROW WHEN (OLD.user_name IS DISTINCT FROM NEW.user_name)
+            EXECUTE FUNCTION kiosk_user_versions()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS users_versions ON users")
+    op.execute("DROP FUNCTION IF EXISTS kiosk_user_versions()")
+    op.execute("DROP TRIGGER IF EXISTS equipment_versions ON equipment")
+    op.execute("DROP FUNCTION IF EXISTS kiosk_equipment_versions()")
+    for table in ('workflow', 'alerts_subscription'):
+        for operation, _ in STATEMENT_TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_versions_{operation.lower()} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS kiosk_subscription_versions()")
+    op.execute("DROP FUNCTION IF EXISTS kiosk_workflow_versions()")
+    op.execute("DROP FUNCTION IF EXISTS kiosk_bump_versions(text, bigint[])")
+    op.drop_table('kiosk_versions')
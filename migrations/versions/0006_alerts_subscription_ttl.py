@@ -0,0 +1,37 @@
+"""Индекс срока истечения активной занятости
+
+Фоновая задача expire_subscriptions (app/scheduler.py) выбирает просроченные подписки
+по этому индексу в порядке истечения. Прежний уникальный индекс без user_id заменён
+индексом alerts_subscription_active_occupancy_uq (ревизия 0003).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 05:09:47.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from migrations.indexes import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS alerts_subscription_active_equipment_uq")
+        create_index_concurrently('alerts_subscription_active_expiry_idx', """
+            ON alerts_subscription ((subscribe_time + minutes_to_live * interval '1 minute'))
+            WHERE active
+        """)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS alerts_subscription_active_expiry_idx")
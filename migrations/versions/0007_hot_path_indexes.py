@@ -0,0 +1,45 @@
+"""Индексы основных маршрутов киоска
+
+- equipment (group_id, equipment_id): страница оборудования группы отбирается и
+  сортируется по индексу (GET /equipment/{group_id}, /bootstrap, /downtimes?group_id=);
+- users_groups (group_id): список операторов смены (GET /select-user) — первичный ключ
+  (user_id, group_id) по группе не используется;
+- users (user_name): проверка табельного номера при входе (POST /login).
+
+Планы этих запросов проверяет benchmarks/plan_check.py.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 05:12:20.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from migrations.indexes import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_equipment_group_id', 'equipment', 'group_id, equipment_id'),
+    ('ix_users_groups_group_id', 'users_groups', 'group_id'),
+    ('ix_users_user_name', 'users', 'user_name'),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            create_index_concurrently(name, f"ON {table} ({columns})")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
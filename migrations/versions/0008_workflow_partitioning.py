@@ -0,0 +1,132 @@
+"""Секционирование workflow по месяцам start_id
+
+Прежняя таблица присоединяется без перезаписи секцией `workflow_legacy` со всеми
+простоями до начала следующего месяца; диапазон проверяется ограничением CHECK
+заранее, не блокируя запись сборщика данных. Секции следующих месяцев создаёт и старые
+архивирует фоновая задача maintain_workflow_partitions (app/partitions.py); строки вне
+секций попадают в `workflow_default`.
+
+Триггеры уровня оператора с таблицами переходов (миграция 0005) на секциях
+запрещены, поэтому триггеры снимаются с прежней таблицы и создаются на новой.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 05:14:40.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Триггеры уровня оператора из миграции 0005: (событие, строки таблицы переходов)
+STATEMENT_TRIGGERS = (
+    ('INSERT', 'NEW'),
+    ('UPDATE', 'NEW'),
+    ('DELETE', 'OLD'),
+)
+TRIGGERS = ('workflow_kiosk_events',) + tuple(
+    f"workflow_versions_{operation.lower()}" for operation, _ in STATEMENT_TRIGGERS
+)
+
+
+def drop_triggers(table: str) -> None:
+    for trigger in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+
+
+def create_triggers() -> None:
+    op.execute("""
+        CREATE TRIGGER workflow_kiosk_events
+            AFTER INSERT OR UPDATE OF stop_id ON workflow
+            FOR EACH ROW EXECUTE FUNCTION kiosk_notify_workflow()
+    """)
+    for operation, transition in STATEMENT_TRIGGERS:
+        op.execute(f"""
+            CREATE TRIGGER workflow_versions_{operation.lower()}
+                AFTER {operation} ON workflow REFERENCING {transition} TABLE AS changed
+                FOR EACH STATEMENT EXECUTE FUNCTION kiosk_workflow_versions()
+        """)
+
+
+def copy_grants(source: str, target: str) -> None:
+    """Выдаёт таблице `target` права, выданные на таблицу `source`."""
+    op.execute(f"""
+        DO $$
+        DECLARE
+            r record;
+        BEGIN
+            FOR r IN
+                SELECT a.privilege_type, a.grantee
+                FROM pg_class c, aclexplode(c.relacl) a
+                WHERE c.oid = '{source}'::regclass AND a.grantee <> c.relowner
+            LOOP
+                EXECUTE format('GRANT %s ON {target} TO %s', r.privilege_type,
+                    CASE WHEN r.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(r.grantee)) END);
+            END LOOP;
+        END
+        $$
+    """)
+
+
+def create_indexes() -> None:
+    op.execute("ALTER TABLE workflow ADD CONSTRAINT workflow_pkey PRIMARY KEY (equipment_id, start_id)")
+    op.execute("""
+        CREATE INDEX workflow_unanswered_equipment_idx ON workflow (equipment_id, start_id)
+            WHERE answer_id IS NULL OR answer_id = 0
+    """)
+
+
+def upgrade() -> None:
+    # Граница секции workflow_legacy — начало следующего месяца UTC
+    boundary = op.get_bind().execute(text("""
+        SELECT extract(epoch FROM date_trunc('month', timezone('utc', now())) + interval '1 month')::bigint
+    """)).scalar()
+
+    # Проверка диапазона читает всю таблицу, но блокирует только изменение её структуры
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE workflow DROP CONSTRAINT IF EXISTS workflow_legacy_range")
+        op.execute(f"""
+            ALTER TABLE workflow ADD CONSTRAINT workflow_legacy_range
+                CHECK (start_id IS NOT NULL AND start_id < {boundary}) NOT VALID
+        """)
+        op.execute("ALTER TABLE workflow VALIDATE CONSTRAINT workflow_legacy_range")
+
+    drop_triggers('workflow')
+    op.execute("ALTER TABLE workflow RENAME TO workflow_legacy")
+    op.execute("ALTER TABLE workflow_legacy RENAME CONSTRAINT workflow_pkey TO workflow_legacy_pkey")
+    op.execute(
+        "ALTER INDEX workflow_unanswered_equipment_idx RENAME TO workflow_legacy_unanswered_equipment_idx"
+    )
+
+    op.execute("""
+        CREATE TABLE workflow (LIKE workflow_legacy INCLUDING DEFAULTS)
+            PARTITION BY RANGE (start_id)
+    """)
+    create_indexes()
+    # Индексы прежней таблицы совпадают с индексами workflow и присоединяются без перестроения
+    op.execute(f"ALTER TABLE workflow ATTACH PARTITION workflow_legacy FOR VALUES FROM (MINVALUE) TO ({boundary})")
+    op.execute("ALTER TABLE workflow_legacy DROP CONSTRAINT workflow_legacy_range")
+    op.execute("CREATE TABLE workflow_default PARTITION OF workflow DEFAULT")
+    op.execute("CREATE SCHEMA IF NOT EXISTS workflow_archive")
+    copy_grants('workflow_legacy', 'workflow')
+    create_triggers()
+
+
+def downgrade() -> None:
+    # Простои всех присоединённых секций копируются в обычную таблицу; отсоединённые
+    # секции схемы workflow_archive остаются как есть
+    op.execute("CREATE TABLE workflow_plain (LIKE workflow INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO workflow_plain SELECT * FROM workflow")
+    copy_grants('workflow', 'workflow_plain')
+    op.execute("DROP TABLE workflow")
+    op.execute("ALTER TABLE workflow_plain RENAME TO workflow")
+    create_indexes()
+    create_triggers()
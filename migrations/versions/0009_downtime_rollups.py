@@ -0,0 +1,119 @@
+"""Часовые и месячные сводки простоев для аналитики
+
+Сводки заполняет фоновая задача advance_downtime_rollup (app/analytics.py) до отметки
+в rollup_watermarks. Изменения workflow ниже отметки триггер переносит в сводки сразу:
+вычитает старые строки и добавляет новые. Триггер берёт рекомендательную блокировку
+ROLLUP_LOCK_CLASS (app/locks.py) разделяемо, задача — монопольно.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 05:16:05.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Класс и ключ блокировки — ROLLUP_LOCK_CLASS (app/locks.py) и ROLLUP_LOCK_KEY (app/analytics.py)
+ROLLUP_LOCK = "3, 0"
+
+# Сводка: (таблица, столбец начала периода, выражение начала периода от start_id)
+ROLLUPS = (
+    ('downtime_rollup_hourly', 'hour_start', "d.start_id - d.start_id % 3600"),
+    ('downtime_rollup_monthly', 'month_start',
+     "extract(epoch FROM date_trunc('month', to_timestamp(d.start_id) AT TIME ZONE 'UTC'))::bigint"),
+)
+
+# Строки таблиц переходов со знаком: +1 — строка появилась, -1 — исчезла
+TRANSITION_ROWS = {
+    'INSERT': "SELECT n.*, 1 AS sign FROM new_rows n",
+    'UPDATE': "SELECT n.*, 1 AS sign FROM new_rows n UNION ALL SELECT o.*, -1 FROM old_rows o",
+    'DELETE': "SELECT o.*, -1 AS sign FROM old_rows o",
+}
+TRANSITION_TABLES = {
+    'INSERT': "NEW TABLE AS new_rows",
+    'UPDATE': "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    'DELETE': "OLD TABLE AS old_rows",
+}
+
+ROLLUP_DELTA = """
+            INSERT INTO {table} AS r (equipment_id, {column}, answer_id, downtimes, downtime_seconds)
+            SELECT d.equipment_id, {bucket}, COALESCE(d.answer_id, 0),
+                   SUM(d.sign), SUM(d.sign * (d.stop_id - d.start_id))
+            FROM ({rows}) d
+            WHERE d.stop_id IS NOT NULL AND d.start_id < v_watermark
+            GROUP BY 1, 2, 3
+            HAVING SUM(d.sign) <> 0 OR SUM(d.sign * (d.stop_id - d.start_id)) <> 0
+            ORDER BY 1, 2, 3
+            ON CONFLICT (equipment_id, {column}, answer_id) DO UPDATE
+                SET downtimes = r.downtimes + EXCLUDED.downtimes,
+                    downtime_seconds = r.downtime_seconds + EXCLUDED.downtime_seconds;
+"""
+
+
+def create_rollup_table(table: str, column: str) -> None:
+    op.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            equipment_id bigint NOT NULL,
+            {column} bigint NOT NULL,
+            answer_id integer NOT NULL,
+            downtimes integer NOT NULL DEFAULT 0,
+            downtime_seconds bigint NOT NULL DEFAULT 0,
+            PRIMARY KEY (equipment_id, {column}, answer_id)
+        )
+    """)
+
+
+def upgrade() -> None:
+    for table, column, _ in ROLLUPS:
+        create_rollup_table(table, column)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_watermarks (
+            name text PRIMARY KEY,
+            watermark bigint NOT NULL
+        )
+    """)
+
+    for operation, rows in TRANSITION_ROWS.items():
+        deltas = "".join(
+            ROLLUP_DELTA.format(table=table, column=column, bucket=bucket, rows=rows)
+            for table, column, bucket in ROLLUPS
+        )
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION downtime_rollup_{operation.lower()}() RETURNS trigger AS $$
+            DECLARE
+                v_watermark bigint;
+            BEGIN
+                PERFORM pg_advisory_xact_lock_shared({ROLLUP_LOCK});
+                SELECT watermark INTO v_watermark FROM rollup_watermarks WHERE name = 'downtime_rollup';
+                IF v_watermark IS NULL THEN
+                    RETURN NULL;
+                END IF;
+                {deltas}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        trigger = f"workflow_rollup_{operation.lower()}"
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON workflow")
+        op.execute(f"""
+            CREATE TRIGGER {trigger}
+                AFTER {operation} ON workflow REFERENCING {TRANSITION_TABLES[operation]}
+                FOR EACH STATEMENT EXECUTE FUNCTION downtime_rollup_{operation.lower()}()
+        """)
+
+
+def downgrade() -> None:
+    for operation in TRANSITION_ROWS:
+        op.execute(f"DROP TRIGGER IF EXISTS workflow_rollup_{operation.lower()} ON workflow")
+        op.execute(f"DROP FUNCTION IF EXISTS downtime_rollup_{operation.lower()}()")
+    op.execute("DROP TABLE IF EXISTS rollup_watermarks")
+    for table, _, _ in ROLLUPS:
+        op.execute(f"DROP TABLE IF EXISTS {table}")
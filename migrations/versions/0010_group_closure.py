@@ -0,0 +1,189 @@
+"""Замыкание иерархии групп для сводных панелей цехов и заводов
+
+group_closure хранит все пары (предок, потомок) дерева groups.parent_id, включая саму
+группу с depth = 0, поэтому оборудование группы вместе с подгруппами выбирается одним
+поиском по первичному ключу замыкания (app/groups.py). Замыкание поддерживает триггер
+на groups: после каждого оператора вычисляется новое замыкание и в таблицу вносится
+только разница. Изменившиеся группы и их предки получают новые версии kiosk_versions,
+а рабочие процессы — событие groups_changed.
+
+kiosk_bump_versions (миграция 0005) теперь увеличивает версию группы вместе с версиями
+всех её предков: изменение занятости на участке меняет и сводную панель цеха.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 05:31:40.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Замыкание по текущему содержимому groups; путь исключает зацикливание
+GROUP_TREE = """
+    WITH RECURSIVE tree AS (
+        SELECT g.group_id AS ancestor_id, g.group_id AS descendant_id, 0 AS depth,
+               ARRAY[g.group_id] AS path
+        FROM groups g
+        UNION ALL
+        SELECT t.ancestor_id, g.group_id, t.depth + 1, t.path || g.group_id
+        FROM tree t
+        JOIN groups g ON g.parent_id = t.descendant_id
+        WHERE g.group_id <> ALL(t.path)
+    )
+    SELECT ancestor_id, descendant_id, depth FROM tree
+"""
+
+# Определение kiosk_bump_versions из миграции 0005
+BUMP_VERSIONS_0005 = """
+    CREATE OR REPLACE FUNCTION kiosk_bump_versions(p_scope text, p_ids bigint[]) RETURNS void AS $$
+        INSERT INTO kiosk_versions AS v (scope, scope_id, version)
+        SELECT p_scope, ids.id, 1
+        FROM (SELECT DISTINCT unnest(p_ids) AS id) ids
+        WHERE ids.id IS NOT NULL
+        ORDER BY ids.id
+        ON CONFLICT (scope, scope_id) DO UPDATE SET version = v.version + 1;
+    $$ LANGUAGE sql
+"""
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS group_closure (
+            ancestor_id integer NOT NULL,
+            descendant_id integer NOT NULL,
+            depth integer NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        )
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS group_closure_descendant_idx
+            ON group_closure (descendant_id, ancestor_id)
+    """)
+
+    # Вносит в замыкание разницу с деревом groups и возвращает группы, у которых
+    # изменился состав подгрупп; вызывается триггером и после загрузки данных в обход триггеров
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION refresh_group_closure() RETURNS integer[] AS $$
+        DECLARE
+            v_changed integer[];
+        BEGIN
+            WITH tree AS ({GROUP_TREE}),
+            removed AS (
+                DELETE FROM group_closure c
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM tree t
+                    WHERE t.ancestor_id = c.ancestor_id AND t.descendant_id = c.descendant_id
+                )
+                RETURNING c.ancestor_id
+            ),
+            added AS (
+                INSERT INTO group_closure (ancestor_id, descendant_id, depth)
+                SELECT t.ancestor_id, t.descendant_id, t.depth
+                FROM tree t
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM group_closure c
+                    WHERE c.ancestor_id = t.ancestor_id AND c.descendant_id = t.descendant_id
+                )
+                ON CONFLICT (ancestor_id, descendant_id) DO NOTHING
+                RETURNING ancestor_id
+            ),
+            moved AS (
+                UPDATE group_closure c
+                SET depth = t.depth
+                FROM tree t
+                WHERE t.ancestor_id = c.ancestor_id AND t.descendant_id = c.descendant_id
+                  AND t.depth <> c.depth
+                RETURNING c.ancestor_id
+            )
+            SELECT ARRAY(
+                SELECT ancestor_id FROM removed
+                UNION SELECT ancestor_id FROM added
+                UNION SELECT ancestor_id FROM moved
+            ) INTO v_changed;
+            RETURN v_changed;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION group_closure_changed() RETURNS trigger AS $$
+        DECLARE
+            v_changed integer[];
+        BEGIN
+            v_changed := refresh_group_closure();
+            IF cardinality(v_changed) > 0 THEN
+                PERFORM kiosk_bump_versions('group', v_changed::bigint[]);
+                PERFORM pg_notify('kiosk_events', json_build_object('type', 'groups_changed')::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS groups_closure ON groups")
+    op.execute("""
+        CREATE TRIGGER groups_closure
+            AFTER INSERT OR UPDATE OF group_id, parent_id OR DELETE OR TRUNCATE ON groups
+            FOR EACH STATEMENT EXECUTE FUNCTION group_closure_changed()
+    """)
+
+    # Группа не может стать подгруппой самой себя или своей подгруппы
+    op.execute("""
+        CREATE OR REPLACE FUNCTION groups_check_parent() RETURNS trigger AS $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM group_closure
+                WHERE ancestor_id = NEW.group_id AND descendant_id = NEW.parent_id
+            ) THEN
+                RAISE EXCEPTION 'Группа % не может входить в свою подгруппу %', NEW.group_id, NEW.parent_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS groups_check_parent ON groups")
+    op.execute("""
+        CREATE TRIGGER groups_check_parent
+            BEFORE UPDATE OF parent_id ON groups
+            FOR EACH ROW WHEN (NEW.parent_id IS DISTINCT FROM OLD.parent_id)
+            EXECUTE FUNCTION groups_check_parent()
+    """)
+
+    # Версия группы меняется вместе с версиями её предков
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_bump_versions(p_scope text, p_ids bigint[]) RETURNS void AS $$
+            INSERT INTO kiosk_versions AS v (scope, scope_id, version)
+            SELECT p_scope, ids.id, 1
+            FROM (
+                SELECT unnest(p_ids) AS id
+                UNION
+                SELECT c.ancestor_id
+                FROM group_closure c
+                WHERE p_scope = 'group' AND c.descendant_id = ANY(p_ids)
+            ) ids
+            WHERE ids.id IS NOT NULL
+            ORDER BY ids.id
+            ON CONFLICT (scope, scope_id) DO UPDATE SET version = v.version + 1;
+        $$ LANGUAGE sql
+    """)
+
+    op.execute("SELECT refresh_group_closure()")
+    # Без статистики планировщик не знает размер поддерева и перебирает всё оборудование
+    op.execute("ANALYZE group_closure")
+
+
+def downgrade() -> None:
+    op.execute(BUMP_VERSIONS_0005)
+    op.execute("DROP TRIGGER IF EXISTS groups_check_parent ON groups")
+    op.execute("DROP FUNCTION IF EXISTS groups_check_parent()")
+    op.execute("DROP TRIGGER IF EXISTS groups_closure ON groups")
+    op.execute("DROP FUNCTION IF EXISTS group_closure_changed()")
+    op.execute("DROP FUNCTION IF EXISTS refresh_group_closure()")
+    op.execute("DROP TABLE IF EXISTS group_closure")
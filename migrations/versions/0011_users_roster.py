@@ -0,0 +1,105 @@
+"""Уведомления об изменении списков операторов групп
+
+Рабочие процессы хранят списки операторов групп в памяти (app/roster.py). Триггеры на
+users_groups и users публикуют событие roster_changed для каждой группы, у которой
+изменился состав операторов, их табельные номера или Ф.И.О.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 06:12:25.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Триггеры уровня оператора на users_groups: (событие, таблицы переходов)
+STATEMENT_TRIGGERS = (
+    ('INSERT', 'NEW TABLE AS changed'),
+    ('UPDATE', 'OLD TABLE AS changed_old NEW TABLE AS changed'),
+    ('DELETE', 'OLD TABLE AS changed'),
+)
+
+
+def upgrade() -> None:
+    # Одно уведомление на группу, а не на строку: пакетная загрузка операторов
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_notify_roster(p_group_ids integer[]) RETURNS void AS $$
+            SELECT pg_notify('kiosk_events', json_build_object(
+                'type', 'roster_changed',
+                'group_id', ids.group_id
+            )::text)
+            FROM (SELECT DISTINCT unnest(p_group_ids) AS group_id) ids
+            WHERE ids.group_id IS NOT NULL;
+        $$ LANGUAGE sql
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_users_groups_roster() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                -- Без группы: рабочие процессы сбрасывают все списки
+                PERFORM pg_notify('kiosk_events', json_build_object('type', 'roster_changed')::text);
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM kiosk_notify_roster(ARRAY(
+                    SELECT group_id FROM changed UNION SELECT group_id FROM changed_old
+                ));
+            ELSE
+                PERFORM kiosk_notify_roster(ARRAY(SELECT group_id FROM changed));
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for operation, transition in STATEMENT_TRIGGERS:
+        trigger = f"users_groups_roster_{operation.lower()}"
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON users_groups")
+        op.execute(f"""
+            CREATE TRIGGER {trigger}
+                AFTER {operation} ON users_groups REFERENCING {transition}
+                FOR EACH STATEMENT EXECUTE FUNCTION kiosk_users_groups_roster()
+        """)
+    op.execute("DROP TRIGGER IF EXISTS users_groups_roster_truncate ON users_groups")
+    op.execute("""
+        CREATE TRIGGER users_groups_roster_truncate
+            AFTER TRUNCATE ON users_groups
+            FOR EACH STATEMENT EXECUTE FUNCTION kiosk_users_groups_roster()
+    """)
+
+    # Табельный номер и Ф.И.О. показываются в списке выбора и участвуют в поиске
+    op.execute("""
+        CREATE OR REPLACE FUNCTION kiosk_users_roster() RETURNS trigger AS $$
+        BEGIN
+            PERFORM kiosk_notify_roster(ARRAY(
+                SELECT group_id FROM users_groups WHERE user_id = NEW.user_id
+            ));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS users_roster ON users")
+    op.execute("""
+        CREATE TRIGGER users_roster
+            AFTER UPDATE OF user_name, user_full_name ON users
+            FOR EACH ROW WHEN (
+                OLD.user_name IS DISTINCT FROM NEW.user_name
+                OR OLD.user_full_name IS DISTINCT FROM NEW.user_full_name
+            )
+            EXECUTE FUNCTION kiosk_users_roster()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS users_roster ON users")
+    op.execute("DROP FUNCTION IF EXISTS kiosk_users_roster()")
+    for operation in ('INSERT', 'UPDATE', 'DELETE', 'TRUNCATE'):
+        op.execute(f"DROP TRIGGER IF EXISTS users_groups_roster_{operation.lower()} ON users_groups")
+    op.execute("DROP FUNCTION IF EXISTS kiosk_users_groups_roster()")
+    op.execute("DROP FUNCTION IF EXISTS kiosk_notify_roster(integer[])")
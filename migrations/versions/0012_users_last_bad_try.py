@@ -0,0 +1,31 @@
+"""Время последней неудачной попытки входа
+
+Блокировка пользователя после LOGIN_MAX_BAD_TRIES неудачных попыток отсчитывается от
+users.last_bad_try_at, а не от users.update_time: время изменения данных пользователя
+не меняется при неудачном входе, а его правка администратором не продлевает блокировку.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 07:02:40.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS last_bad_try_at timestamp without time zone")
+    # Незавершённые блокировки отсчитывались от update_time
+    op.execute("UPDATE users SET last_bad_try_at = update_time WHERE bad_tries > 0")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE users DROP COLUMN IF EXISTS last_bad_try_at")
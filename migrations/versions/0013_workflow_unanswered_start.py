@@ -0,0 +1,84 @@
+"""start_id в частичном индексе простоев без причины
+
+Подсчёт неотмеченных простоев (GET /downtimes, app/main.py) всегда ограничен периодом
+просмотра журнала `start_id >= :since`. Индекс только по equipment_id заставлял читать
+все неотмеченные простои станка за всю историю; индекс (equipment_id, start_id) отдаёт
+только строки периода. Миграции 0004 и 0008 уже создают индекс в новом виде, здесь он
+перестраивается в базах, обновлённых раньше.
+
+workflow секционирована, а `CREATE INDEX CONCURRENTLY` для секционированной таблицы
+не поддерживается: индекс создаётся на самой таблице без секций (`ON ONLY`), на каждой
+секции — без блокировки записи, и индексы секций присоединяются к нему. Прежний индекс
+удаляется, новый получает его имя.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18 07:40:12.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import text
+
+from migrations.indexes import create_index_concurrently, drop_invalid_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0013'
+down_revision: Union[str, None] = '0012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = 'workflow_unanswered_equipment_idx'
+PREDICATE = 'answer_id IS NULL OR answer_id = 0'
+
+# Столбцы индекса в порядке ключа
+INDEX_COLUMNS_QUERY = text("""
+    SELECT array_agg(a.attname::text ORDER BY k.ord)
+    FROM pg_index i
+    CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+    WHERE i.indexrelid = to_regclass(:name)
+""")
+
+# Присоединённые секции workflow и их табличные пространства
+PARTITIONS_QUERY = text("""
+    SELECT c.relname AS name, COALESCE(ts.spcname, '') AS tablespace
+    FROM pg_inherits inh
+    JOIN pg_class c ON c.oid = inh.inhrelid
+    LEFT JOIN pg_tablespace ts ON ts.oid = c.reltablespace
+    WHERE inh.inhparent = 'workflow'::regclass
+    ORDER BY c.relname
+""")
+
+
+def rebuild_index(columns: str) -> None:
+    """Перестраивает индекс `INDEX` по столбцам `columns`, если он построен по другим."""
+    bind = op.get_bind()
+    names = [column.strip() for column in columns.split(',')]
+    if bind.execute(INDEX_COLUMNS_QUERY, {'name': INDEX}).scalar() == names:
+        return
+
+    building = f"{INDEX}_new"
+    with op.get_context().autocommit_block():
+        drop_invalid_index(building)
+        op.execute(f"CREATE INDEX IF NOT EXISTS {building} ON ONLY workflow ({columns}) WHERE {PREDICATE}")
+        for partition in bind.execute(PARTITIONS_QUERY).all():
+            # Имя по столбцам: индекс секции с прежними столбцами ещё существует
+            name = f"{partition.name}_{'_'.join(names)}_unanswered_idx"
+            tablespace = f' TABLESPACE "{partition.tablespace}"' if partition.tablespace else ""
+            create_index_concurrently(name, f"ON {partition.name} ({columns}){tablespace} WHERE {PREDICATE}")
+            op.execute(f"ALTER INDEX {building} ATTACH PARTITION {name}")
+
+    # Индекс становится действительным, когда присоединены индексы всех секций
+    op.execute(f"DROP INDEX IF EXISTS {INDEX}")
+    op.execute(f"ALTER INDEX {building} RENAME TO {INDEX}")
+
+
+def upgrade() -> None:
+    rebuild_index('equipment_id, start_id')
+
+
+def downgrade() -> None:
+    rebuild_index('equipment_id')